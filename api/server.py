@@ -9,13 +9,23 @@ from flask_cors import CORS
 from functools import wraps
 import base64
 import hashlib
+import hmac
 import secrets
 import json
 import os
 import re
+import sys
+import threading
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import quote
+
+try:
+    from .storage import CachedJsonFile, SqliteCollection, TokenStore, open_collection
+except ImportError:
+    # Running as a script or via `gunicorn --chdir api server:app`
+    from storage import CachedJsonFile, SqliteCollection, TokenStore, open_collection
 
 # License v2 signing (requires cryptography on the server)
 try:
@@ -91,6 +101,64 @@ DOWNLOAD_TOKENS_FILE = DATA_DIR / "download_tokens.json"
 PURCHASES_FILE = DATA_DIR / "purchases.json"
 
 DOWNLOAD_TOKEN_TTL_SECONDS = 60 * 30  # 30 minutes
+DOWNLOAD_TOKEN_MAX_ENTRIES = int(os.environ.get('DOWNLOAD_TOKEN_MAX_ENTRIES', '10000'))
+
+# Optional stateless download links: when set (same value on every instance), download
+# tokens are HMAC-signed blobs verified in memory instead of rows in download_tokens.json.
+DOWNLOAD_SIGNING_SECRET = os.environ.get('DOWNLOAD_SIGNING_SECRET', '').encode('utf-8')
+
+# Optional nginx offload: when set (e.g. "/_protected_downloads/", an `internal` location
+# aliased to DOWNLOAD_FILES_DIR), Flask only authorises and nginx streams the file.
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = os.environ.get('DOWNLOAD_ACCEL_REDIRECT_PREFIX', '').strip()
+
+# Data collections. Backend is selected with ODOOMASTER_STORAGE=json|sqlite;
+# JSON files are parsed once and reloaded when they change on disk.
+# `counters` keep dashboard totals up to date on every write (see admin_stats).
+# Sort keys for the admin listings; every record gets a value so pages cover all rows.
+USER_SORT_KEYS = {
+    'created_at': lambda u: u.get('created_at') or '0',
+    'email': lambda u: (u.get('email') or '').lower() or '0',
+}
+LICENSE_SORT_KEYS = {
+    'created_at': lambda l: l.get('created_at') or '0',
+    'expires_at': lambda l: l.get('expires_at') or '9999',  # unlimited licenses sort last
+}
+USERS = open_collection(USERS_FILE, indexes={
+    'token': lambda u: [(u.get('token') or '').strip()],
+    'id': lambda u: [u.get('id')],
+    'xp': lambda u: [int(u.get('xp') or 0)],  # leaderboard: top N is the tail of this index
+    **{f'sort:{name}': (lambda fn: lambda u: [fn(u)])(fn) for name, fn in USER_SORT_KEYS.items()},
+}, ordered=('xp',) + tuple(f'sort:{name}' for name in USER_SORT_KEYS),
+    counters=lambda u: {'users': 1, 'downloads': int(u.get('downloads') or 0)})
+LICENSES = open_collection(LICENSES_FILE, indexes={
+    'user_id': lambda l: [l.get('user_id')],
+    'hardware_id': lambda l: l.get('hardware_ids') or [],
+    'status': lambda l: [l.get('status')],
+    'plan': lambda l: [l.get('plan')],
+    'email': lambda l: [(l.get('user_email') or l.get('customer_email') or '').lower()],
+    # Expiry of active licenses only, so due ones are a range query
+    'active_expiry': lambda l: [l.get('expires_at')] if l.get('status') == 'active' and isinstance(l.get('expires_at'), str) else [],
+    **{f'sort:{name}': (lambda fn: lambda l: [fn(l)])(fn) for name, fn in LICENSE_SORT_KEYS.items()},
+}, ordered=('active_expiry', 'email') + tuple(f'sort:{name}' for name in LICENSE_SORT_KEYS),
+    counters=lambda l: {'licenses': 1, f"status:{l.get('status')}": 1})
+TICKETS = open_collection(TICKETS_FILE, list_key='id', indexes={
+    'user_id': lambda t: [t.get('user_id')],
+})
+PLANS = open_collection(PLANS_FILE)
+DOWNLOAD_TOKENS = open_collection(DOWNLOAD_TOKENS_FILE, indent=None,
+                                  indexes=TokenStore.INDEXES, ordered=TokenStore.ORDERED)
+PURCHASES = open_collection(PURCHASES_FILE, indexes={
+    'user_id': lambda p: [p.get('user_id')],
+    'license_key': lambda p: [p.get('license_key')],
+}, counters=lambda p: {'purchases': 1, 'revenue': int(p.get('amount') or 0)})
+COLLECTIONS = (USERS, LICENSES, TICKETS, PLANS, DOWNLOAD_TOKENS, PURCHASES)
+
+# Expiring download tokens: O(1) lookup, expiry-ordered sweep and eviction, bounded size
+DOWNLOAD_TOKEN_STORE = TokenStore(
+    DOWNLOAD_TOKENS,
+    ttl_seconds=DOWNLOAD_TOKEN_TTL_SECONDS,
+    max_entries=DOWNLOAD_TOKEN_MAX_ENTRIES,
+)
 
 # Frontend files (single-port mode): serve from website/ while protecting private data
 FRONTEND_DIR = BASE_DIR
@@ -105,42 +173,47 @@ FRONTEND_DENY_PREFIXES = (
 # Database Helpers
 # ============================================
 
-def load_json(filepath):
-    """Load JSON file or return empty dict/list"""
-    if filepath.exists():
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            # If file is empty/corrupted, fall back to sane defaults.
-            pass
-    return {} if 'users' in str(filepath) or 'licenses' in str(filepath) else []
+class DownloadCatalog(CachedJsonFile):
+    """downloads.json parsed once (reloaded when its mtime changes).
+
+    Keeps an id -> item index and the pre-serialised /api/downloads body with its ETag.
+    """
 
+    def _reloaded(self):
+        catalog = self._data if isinstance(self._data, dict) else {}
+        items = []
+        by_id = {}
+        for v in (catalog.get('versions') or []):
+            for item in (v.get('items') or []):
+                items.append(item)
+                by_id.setdefault(item.get('id'), item)
+        listing = {'downloads': items, 'generated_at': catalog.get('generated_at')} if catalog else {'downloads': []}
+        self._by_id = by_id
+        self._listing_body = json.dumps(listing, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._listing_etag = hashlib.sha256(self._listing_body).hexdigest()[:32]
 
-def load_json_default(filepath: Path, default):
-    """Load JSON file or return provided default."""
-    try:
-        if filepath.exists():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return default
+    def find(self, download_id: str) -> dict | None:
+        with self._lock:
+            self.load()
+            return self._by_id.get(download_id)
+
+    def listing(self) -> tuple[bytes, str]:
+        """Return (JSON body, ETag) for /api/downloads."""
+        with self._lock:
+            self.load()
+            return self._listing_body, self._listing_etag
+
+
+DOWNLOAD_CATALOG = DownloadCatalog(DOWNLOAD_CATALOG_FILE)
 
 
 def load_download_catalog() -> dict:
     """Load the public downloads catalog (website/downloads.json)."""
-    return load_json_default(DOWNLOAD_CATALOG_FILE, {})
+    return DOWNLOAD_CATALOG.load()
 
 
 def find_catalog_item(download_id: str) -> dict | None:
-    catalog = load_download_catalog()
-    versions = catalog.get('versions') or []
-    for v in versions:
-        for item in (v.get('items') or []):
-            if item.get('id') == download_id:
-                return item
-    return None
+    return DOWNLOAD_CATALOG.find(download_id)
 
 
 def get_optional_user():
@@ -148,59 +221,124 @@ def get_optional_user():
     token = request.headers.get('Authorization', '').replace('Bearer ', '').strip()
     if not token:
         return None
-    users = load_json(USERS_FILE)
-    for u in users.values():
-        if u.get('token') == token:
-            return u
-    return None
+    return find_user_by_token(token)
 
 
-def user_has_paid_license(user_id: str) -> bool:
-    """Check if user has an active non-trial license."""
+def find_user_by_token(token: str) -> dict | None:
+    """Return the user owning a bearer token (token index lookup), else None."""
+    if not token:
+        return None
+    return USERS.find_one('token', token)
+
+
+def user_licenses_of(user_id: str) -> list:
+    """Licenses owned by `user_id` (user_id index lookup), oldest first."""
     if not user_id:
-        return False
-    licenses = load_json(LICENSES_FILE)
-    now = datetime.now()
-    for lic in licenses.values():
-        if lic.get('user_id') != user_id:
-            continue
-        if lic.get('status') != 'active':
-            continue
-        if (lic.get('plan') or '').strip().lower() == 'trial':
-            continue
-        exp = lic.get('expires_at')
-        try:
-            if exp and datetime.fromisoformat(exp) < now:
-                continue
-        except Exception:
-            continue
-        return True
-    return False
+        return []
+    return sorted(LICENSES.find('user_id', user_id), key=lambda l: l.get('created_at') or '')
+
 
-def save_json(filepath, data):
-    """Save data to JSON file"""
+def is_paid_license_active(lic: dict, now: datetime) -> bool:
+    """True for an active, non-trial, unexpired license."""
+    if lic.get('status') != 'active':
+        return False
+    if (lic.get('plan') or '').strip().lower() == 'trial':
+        return False
+    exp = lic.get('expires_at')
     try:
-        # Ensure parent directory exists
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
-        return True
-    except OSError as e:
-        # Read-only filesystem (e.g., Liara without disk)
-        print(f"[WARNING] Cannot save to {filepath}: {e}")
+        if exp and datetime.fromisoformat(exp) < now:
+            return False
+    except Exception:
         return False
+    return True
+
 
+def user_has_paid_license(user_id: str) -> bool:
+    """Check if user has an active non-trial license."""
+    if not user_id:
+        return False
+    now = datetime.now()
+    return any(is_paid_license_active(lic, now) for lic in LICENSES.find('user_id', user_id))
 
 class StorageError(Exception):
     """Raised when storage is unavailable (read-only filesystem)"""
     pass
 
 
-def save_json_or_raise(filepath, data):
-    """Save data to JSON file or raise StorageError if filesystem is read-only"""
-    if not save_json(filepath, data):
+def put_or_raise(collection, key, record):
+    """Write one record to a collection or raise StorageError if filesystem is read-only"""
+    if not collection.put(key, record):
         raise StorageError("فایل سیستم فقط‌خواندنی است. لطفاً دیسک فعال کنید.")
 
+def bind_hardware_id(lic: dict, hardware_id: str):
+    """Record a hardware binding on a license (for LICENSES.update); False if already bound."""
+    lic.setdefault('hardware_ids', [])
+    if hardware_id in lic['hardware_ids']:
+        return False
+    lic['hardware_ids'].append(hardware_id)
+
+
+def add_user_xp(email: str, xp: int, downloads: int = 0):
+    """Atomically add XP (and download count) to a user (best-effort)."""
+    def _add(u):
+        u['xp'] = u.get('xp', 0) + xp
+        if downloads:
+            u['downloads'] = u.get('downloads', 0) + downloads
+    return USERS.update(email, _add)
+
+# Expired licenses are flipped by a background sweeper thread (and by the
+# admin stats view), never by public requests
+EXPIRY_SWEEP_INTERVAL = 60
+_last_expiry_sweep = 0.0
+_expiry_sweep_lock = threading.Lock()
+
+
+def expire_due_licenses(min_interval: float = EXPIRY_SWEEP_INTERVAL) -> int:
+    """Mark active licenses whose expires_at has passed as 'expired'.
+
+    Uses the ordered 'active_expiry' index, so only due licenses are touched,
+    runs at most once per `min_interval` seconds and writes all due licenses
+    back in one batch. Concurrent callers skip instead of sweeping twice.
+    """
+    global _last_expiry_sweep
+    if not _expiry_sweep_lock.acquire(blocking=False):
+        return 0
+    try:
+        if time.time() - _last_expiry_sweep < min_interval:
+            return 0
+        _last_expiry_sweep = time.time()
+        now = datetime.now()
+        due = list(LICENSES.range('active_expiry', hi=now.isoformat()))
+        return LICENSES.update_many(due, lambda lic: _expire_license(lic, now)) if due else 0
+    finally:
+        _expiry_sweep_lock.release()
+
+
+def _expire_license(lic: dict, now: datetime):
+    """`update` callback: flip an active license past its expiry to 'expired'."""
+    exp = lic.get('expires_at')
+    try:
+        if lic.get('status') != 'active' or not exp or datetime.fromisoformat(exp) >= now:
+            return False
+    except ValueError:
+        return False
+    lic['status'] = 'expired'
+
+
+def _expiry_sweeper():
+    while True:
+        try:
+            expire_due_licenses()
+        except Exception as e:
+            print(f"[WARNING] License expiry sweep failed: {e}")
+        time.sleep(EXPIRY_SWEEP_INTERVAL)
+
+
+def start_expiry_sweeper():
+    """Run expire_due_licenses every EXPIRY_SWEEP_INTERVAL seconds in a daemon thread."""
+    threading.Thread(target=_expiry_sweeper, name='license-expiry', daemon=True).start()
+
+
 def hash_password(password):
     """Hash password with SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -210,12 +348,11 @@ def hash_password(password):
 # ============================================
 def ensure_default_admin():
     """Create default admin user if no users exist"""
-    users = load_json(USERS_FILE)
     admin_id = 'admin@odoomaster.ir'
     
     # Always ensure admin exists
-    if admin_id not in users:
-        users[admin_id] = {
+    if admin_id not in USERS:
+        admin = {
             'id': admin_id,
             'name': 'مدیر سیستم',
             'email': admin_id,
@@ -227,11 +364,10 @@ def ensure_default_admin():
             'xp': 0,
             'level': 999
         }
-        try:
-            save_json(USERS_FILE, users)
+        if USERS.put(admin_id, admin):
             print(f"[INFO] Admin user created: {admin_id}")
-        except OSError as e:
-            print(f"[ERROR] Could not save admin user: {e}")
+        else:
+            print(f"[ERROR] Could not save admin user: {admin_id}")
 
 # Run on startup
 ensure_default_admin()
@@ -240,9 +376,8 @@ ensure_default_admin()
 @app.route('/api/reset-admin', methods=['GET'])
 def reset_admin():
     """Reset admin user - TEMPORARY ENDPOINT"""
-    users = load_json(USERS_FILE)
     admin_id = 'admin@odoomaster.ir'
-    users[admin_id] = {
+    admin = {
         'id': admin_id,
         'name': 'مدیر سیستم',
         'email': admin_id,
@@ -255,7 +390,7 @@ def reset_admin():
         'level': 999
     }
     try:
-        save_json(USERS_FILE, users)
+        put_or_raise(USERS, admin_id, admin)
         return jsonify({'success': True, 'message': 'Admin reset successfully', 'email': admin_id, 'password': 'Admin@123'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -301,12 +436,7 @@ def login_required(f):
         if not token:
             return jsonify({'error': 'توکن احراز هویت یافت نشد'}), 401
         
-        users = load_json(USERS_FILE)
-        user = None
-        for u in users.values():
-            if (u.get('token') or '').strip() == token:
-                user = u
-                break
+        user = find_user_by_token(token)
         
         if not user:
             return jsonify({'error': 'توکن نامعتبر است'}), 401
@@ -324,12 +454,7 @@ def admin_required(f):
         if not token:
             return jsonify({'error': 'توکن احراز هویت یافت نشد'}), 401
         
-        users = load_json(USERS_FILE)
-        user = None
-        for u in users.values():
-            if (u.get('token') or '').strip() == token:
-                user = u
-                break
+        user = find_user_by_token(token)
         
         if not user:
             return jsonify({'error': 'توکن نامعتبر است'}), 401
@@ -365,8 +490,7 @@ def register():
         return jsonify({'error': 'شماره موبایل نامعتبر است'}), 400
     
     # Check if email exists
-    users = load_json(USERS_FILE)
-    if data['email'] in users:
+    if data['email'] in USERS:
         return jsonify({'error': 'این ایمیل قبلاً ثبت شده است'}), 400
     
     # Create user
@@ -388,16 +512,13 @@ def register():
         'is_verified': False
     }
     
-    users[data['email']] = user
-    
     # Try to save - handle read-only filesystem
     try:
-        save_json_or_raise(USERS_FILE, users)
+        put_or_raise(USERS, data['email'], user)
     except StorageError as e:
         return jsonify({'error': str(e)}), 503
     
     # Create welcome license (trial)
-    licenses = load_json(LICENSES_FILE)
     trial_license = {
         'key': generate_license_key(),
         'user_id': user_id,
@@ -409,10 +530,8 @@ def register():
         'max_activations': 1,
         'activations': 0
     }
-    licenses[trial_license['key']] = trial_license
-    
     try:
-        save_json_or_raise(LICENSES_FILE, licenses)
+        put_or_raise(LICENSES, trial_license['key'], trial_license)
     except StorageError as e:
         return jsonify({'error': str(e)}), 503
     
@@ -442,15 +561,15 @@ def login():
     if not identifier or not password:
         return jsonify({'error': 'ایمیل/موبایل و رمز عبور الزامی است'}), 400
 
-    users = load_json(USERS_FILE)
-
     # Support login by email or phone (identifier may be either).
-    user = users.get(identifier)
+    user_key = identifier
+    user = USERS.get(identifier)
     if not user:
         normalized_phone = re.sub(r'\s+', '', identifier)
-        for u in users.values():
+        for key, u in USERS.items():
             if re.sub(r'\s+', '', str(u.get('phone') or '')) == normalized_phone:
-                user = u
+                user_key = key
+                user = USERS.get(key)
                 break
 
     if not user or user.get('password') != hash_password(password):
@@ -458,13 +577,14 @@ def login():
     
     # Generate new token
     token = secrets.token_hex(32)
-    user['token'] = token
-    user['last_login'] = datetime.now().isoformat()
-    
-    # Add login XP
-    user['xp'] = user.get('xp', 0) + 10
-    
-    save_json(USERS_FILE, users)
+
+    def _login(u):
+        u['token'] = token
+        u['last_login'] = datetime.now().isoformat()
+        # Add login XP
+        u['xp'] = u.get('xp', 0) + 10
+
+    user = USERS.update(user_key, _login) or user
     
     return jsonify({
         'success': True,
@@ -506,12 +626,12 @@ def admin_login():
     token = secrets.token_hex(32)
     
     # Find or create admin user in database
-    users = load_json(USERS_FILE)
     admin_email = "admin@odoomaster.com"
+    admin = USERS.get(admin_email)
     
-    if admin_email not in users:
+    if not admin:
         # Create admin user
-        users[admin_email] = {
+        admin = {
             'id': 'admin',
             'name': 'مدیر سیستم',
             'email': admin_email,
@@ -528,11 +648,11 @@ def admin_login():
         }
     else:
         # Update token and last login
-        users[admin_email]['token'] = token
-        users[admin_email]['last_login'] = datetime.now().isoformat()
-        users[admin_email]['is_admin'] = True
+        admin['token'] = token
+        admin['last_login'] = datetime.now().isoformat()
+        admin['is_admin'] = True
     
-    save_json(USERS_FILE, users)
+    USERS.put(admin_email, admin)
     
     return jsonify({
         'success': True,
@@ -550,10 +670,7 @@ def admin_login():
 @login_required
 def logout():
     """Logout user"""
-    users = load_json(USERS_FILE)
-    if request.current_user['email'] in users:
-        users[request.current_user['email']]['token'] = None
-        save_json(USERS_FILE, users)
+    USERS.update(request.current_user['email'], lambda u: u.update(token=None))
     
     return jsonify({'success': True, 'message': 'خروج موفقیت‌آمیز'})
 
@@ -564,8 +681,7 @@ def get_current_user():
     user = request.current_user
     
     # Get user's licenses
-    licenses = load_json(LICENSES_FILE)
-    user_licenses = [l for l in licenses.values() if l.get('user_id') == user['id']]
+    user_licenses = user_licenses_of(user['id'])
     
     return jsonify({
         'user': {
@@ -596,8 +712,7 @@ def get_current_user():
 @login_required
 def get_licenses():
     """Get user's licenses"""
-    licenses = load_json(LICENSES_FILE)
-    user_licenses = [l for l in licenses.values() if l.get('user_id') == request.current_user['id']]
+    user_licenses = user_licenses_of(request.current_user['id'])
     
     return jsonify({'licenses': user_licenses})
 
@@ -612,8 +727,7 @@ def activate_license():
     if not license_key or not hardware_id:
         return jsonify({'error': 'کلید لایسنس و شناسه سخت‌افزار الزامی است'}), 400
     
-    licenses = load_json(LICENSES_FILE)
-    license_data = licenses.get(license_key)
+    license_data = LICENSES.get(license_key)
     
     if not license_data:
         return jsonify({'error': 'لایسنس یافت نشد'}), 404
@@ -628,27 +742,27 @@ def activate_license():
     exp = license_data.get('expires_at')
     if exp and datetime.fromisoformat(exp) < datetime.now():
         license_data['status'] = 'expired'
-        save_json(LICENSES_FILE, licenses)
+        LICENSES.put(license_key, license_data)
         return jsonify({'error': 'این لایسنس منقضی شده است'}), 400
     
     # Check activations
     if license_data['activations'] >= license_data['max_activations']:
         return jsonify({'error': 'تعداد فعال‌سازی به حداکثر رسیده است'}), 400
     
-    # Activate
-    license_data['activations'] += 1
-    license_data['hardware_ids'] = license_data.get('hardware_ids', [])
-    if hardware_id not in license_data['hardware_ids']:
-        license_data['hardware_ids'].append(hardware_id)
-    license_data['last_activated'] = datetime.now().isoformat()
-    
-    save_json(LICENSES_FILE, licenses)
+    # Activate (limit re-checked under the storage lock so parallel requests cannot exceed it)
+    def _activate(lic):
+        if lic['activations'] >= lic['max_activations']:
+            return False
+        lic['activations'] += 1
+        bind_hardware_id(lic, hardware_id)
+        lic['last_activated'] = datetime.now().isoformat()
+
+    license_data = LICENSES.update(license_key, _activate)
+    if not license_data:
+        return jsonify({'error': 'تعداد فعال‌سازی به حداکثر رسیده است'}), 400
     
     # Add XP for activation
-    users = load_json(USERS_FILE)
-    if request.current_user['email'] in users:
-        users[request.current_user['email']]['xp'] += 50
-        save_json(USERS_FILE, users)
+    add_user_xp(request.current_user['email'], 50)
     
     return jsonify({
         'success': True,
@@ -666,8 +780,7 @@ def verify_license():
     if not license_key:
         return jsonify({'valid': False, 'error': 'کلید لایسنس الزامی است'}), 400
     
-    licenses = load_json(LICENSES_FILE)
-    license_data = licenses.get(license_key)
+    license_data = LICENSES.get(license_key)
     
     if not license_data:
         return jsonify({'valid': False, 'error': 'لایسنس یافت نشد'}), 404
@@ -691,6 +804,45 @@ def verify_license():
         'expires_at': license_data['expires_at']
     })
 
+_revocation_cache = {'keys': None, 'body': b'', 'etag': ''}
+_revocation_lock = threading.Lock()
+
+
+def revocation_list() -> tuple[bytes, str] | None:
+    """Signed list of revoked license key hashes for offline clients.
+
+    Hashes match license_manager's blacklist (sha256(key)[:32]), sorted. Re-signed
+    only when the set of revoked licenses changes. None if signing is unavailable.
+    """
+    keys = sorted(LICENSES.find_keys('status', 'revoked'))
+    with _revocation_lock:
+        cache = _revocation_cache
+        if cache['keys'] != keys:
+            bundle = _sign_license_v2({
+                'v': 1,
+                'issued_at': datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+                'key_hashes': sorted(hashlib.sha256(k.encode()).hexdigest()[:32] for k in keys),
+            })
+            if bundle is None:
+                return None
+            cache['body'] = json.dumps(bundle, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cache['etag'] = hashlib.sha256(cache['body']).hexdigest()[:32]
+            cache['keys'] = keys
+        return cache['body'], cache['etag']
+
+
+@app.route('/api/licenses/revocations', methods=['GET'])
+def get_revocation_list():
+    """Signed revocation list (public, verified by the installer with the license public key)."""
+    listing = revocation_list()
+    if listing is None:
+        return jsonify({'error': 'امضای لیست ابطال در دسترس نیست'}), 503
+    body, etag = listing
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'public, max-age=300'
+    return resp.make_conditional(request)
+
 # ============================================
 # Download Endpoints
 # ============================================
@@ -698,16 +850,51 @@ def verify_license():
 @app.route('/api/downloads', methods=['GET'])
 def get_downloads():
     """Get available downloads (from public catalog)."""
-    catalog = load_download_catalog()
-    if not catalog:
-        return jsonify({'downloads': []})
+    # Flattened for API clients (website UI reads downloads.json directly); the body is
+    # serialised once per catalog change and revalidated with If-None-Match.
+    body, etag = DOWNLOAD_CATALOG.listing()
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'public, no-cache'
+    return resp.make_conditional(request)
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64url_decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def sign_download_token(download_id: str, user_id: str) -> str:
+    """Create a self-describing download token: base64url(payload).base64url(HMAC-SHA256)."""
+    payload = {
+        'd': download_id,
+        'u': user_id,
+        'e': int(time.time()) + DOWNLOAD_TOKEN_TTL_SECONDS,
+    }
+    body = _b64url(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    sig = hmac.new(DOWNLOAD_SIGNING_SECRET, body.encode('ascii'), hashlib.sha256).digest()
+    return f'{body}.{_b64url(sig)}'
+
+
+def verify_download_token(token: str) -> dict | None:
+    """Return the token entry ({download_id, user_id, exp}) if the signature is valid, else None.
+
+    Expiry is not checked here so the caller can report it separately.
+    """
+    body, _, sig = token.partition('.')
+    if not body or not sig:
+        return None
+    expected = hmac.new(DOWNLOAD_SIGNING_SECRET, body.encode('ascii', 'replace'), hashlib.sha256).digest()
+    try:
+        if not hmac.compare_digest(expected, _b64url_decode(sig)):
+            return None
+        payload = json.loads(_b64url_decode(body))
+        return {'download_id': payload['d'], 'user_id': payload['u'], 'exp': int(payload['e'])}
+    except (ValueError, KeyError, TypeError):
+        return None
 
-    # Flatten for API clients; website UI reads downloads.json directly.
-    items = []
-    for v in (catalog.get('versions') or []):
-        for item in (v.get('items') or []):
-            items.append(item)
-    return jsonify({'downloads': items, 'generated_at': catalog.get('generated_at')})
 
 @app.route('/api/downloads/<download_id>', methods=['POST'])
 def request_download(download_id):
@@ -734,22 +921,17 @@ def request_download(download_id):
             return jsonify({'error': 'برای دانلود این فایل، خرید/لایسنس معتبر لازم است'}), 403
 
     # Log download request (best-effort)
-    if user:
-        users = load_json(USERS_FILE)
-        if user.get('email') in users:
-            users[user['email']]['downloads'] = users[user['email']].get('downloads', 0) + 1
-            users[user['email']]['xp'] = users[user['email']].get('xp', 0) + 25
-            save_json(USERS_FILE, users)
-
-    token = secrets.token_hex(16)
-    tokens = load_json_default(DOWNLOAD_TOKENS_FILE, {})
-    expires_at = (datetime.now() + timedelta(seconds=DOWNLOAD_TOKEN_TTL_SECONDS)).isoformat()
-    tokens[token] = {
-        'download_id': download_id,
-        'user_id': user_id,
-        'expires_at': expires_at,
-    }
-    save_json(DOWNLOAD_TOKENS_FILE, tokens)
+    if user and user.get('email'):
+        add_user_xp(user['email'], 25, downloads=1)
+
+    if DOWNLOAD_SIGNING_SECRET:
+        token = sign_download_token(download_id, user_id)
+    else:
+        token = secrets.token_hex(16)
+        DOWNLOAD_TOKEN_STORE.issue(token, {
+            'download_id': download_id,
+            'user_id': user_id,
+        })
 
     return jsonify({
         'success': True,
@@ -769,19 +951,19 @@ def download_file(download_id):
     if not item:
         return jsonify({'error': 'دانلود یافت نشد'}), 404
 
-    tokens = load_json_default(DOWNLOAD_TOKENS_FILE, {})
-    entry = tokens.get(token)
+    # Signed tokens are verified in memory; login/purchase were checked when the
+    # link was issued, so this path does no storage I/O at all.
+    signed = bool(DOWNLOAD_SIGNING_SECRET) and '.' in token
+    if signed:
+        entry = verify_download_token(token)
+    else:
+        entry = DOWNLOAD_TOKEN_STORE.get(token)
     if not entry or entry.get('download_id') != download_id:
         return jsonify({'error': 'توکن دانلود نامعتبر است'}), 403
 
-    # expiry
-    try:
-        if datetime.fromisoformat(entry.get('expires_at', '')) < datetime.now():
-            tokens.pop(token, None)
-            save_json(DOWNLOAD_TOKENS_FILE, tokens)
-            return jsonify({'error': 'توکن دانلود منقضی شده است'}), 403
-    except Exception:
-        return jsonify({'error': 'توکن دانلود نامعتبر است'}), 403
+    # expiry (expired stored entries are removed by the store's periodic sweep)
+    if DOWNLOAD_TOKEN_STORE.is_expired(entry):
+        return jsonify({'error': 'توکن دانلود منقضی شده است'}), 403
 
     requires_login = bool(item.get('requires_login'))
     requires_purchase = bool(item.get('requires_purchase'))
@@ -790,7 +972,7 @@ def download_file(download_id):
     if requires_login and not user_id:
         return jsonify({'error': 'این فایل نیازمند ورود است'}), 403
 
-    if requires_purchase and not user_has_paid_license(user_id):
+    if requires_purchase and not signed and not user_has_paid_license(user_id):
         return jsonify({'error': 'لایسنس معتبر برای دانلود لازم است'}), 403
 
     file_name = (item.get('file_name') or '').strip()
@@ -805,13 +987,35 @@ def download_file(download_id):
     # parallel connections). Treat the token as reusable until it expires.
     # This avoids 403s after an initial successful probe request.
 
+    # A strong ETag from the catalog sha256 lets resumed downloads validate the partial file.
+    sha256 = (item.get('sha256') or '').strip().lower()
+
+    if DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        # nginx serves the bytes (sendfile, Range/If-Range) without holding a Python worker.
+        # Same validators as the send_file branch; a matching If-None-Match is answered here.
+        resp = Response(status=200, mimetype='application/zip')
+        if sha256:
+            resp.set_etag(sha256)
+        resp.last_modified = file_path.stat().st_mtime
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        resp.make_conditional(request)
+        if resp.status_code == 304:
+            return resp
+        resp.headers['X-Accel-Redirect'] = DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(file_name)
+        resp.headers.set('Content-Disposition', 'attachment', filename=file_name)
+        return resp
+
+    # conditional=True answers Range / If-Range / If-None-Match (206/304/416); the body is
+    # streamed through wsgi.file_wrapper, which gunicorn turns into sendfile().
     resp = send_file(
         str(file_path),
         as_attachment=True,
         download_name=file_name,
-        mimetype='application/zip'
+        mimetype='application/zip',
+        conditional=True,
+        etag=sha256 or True,
     )
-    resp.headers['Cache-Control'] = 'no-store'
+    resp.headers['Cache-Control'] = 'private, no-cache'
     return resp
 
 
@@ -863,8 +1067,8 @@ def serve_frontend_file(path: str):
 @login_required
 def get_tickets():
     """Get user's tickets"""
-    tickets = load_json(TICKETS_FILE)
-    user_tickets = [t for t in tickets if t.get('user_id') == request.current_user['id']]
+    # user_id index lookup; the index is unordered, so restore creation order
+    user_tickets = sorted(TICKETS.find('user_id', request.current_user['id']), key=lambda t: t.get('created_at') or '')
     
     return jsonify({'tickets': user_tickets})
 
@@ -877,8 +1081,6 @@ def create_ticket():
     if not data.get('subject') or not data.get('message'):
         return jsonify({'error': 'موضوع و پیام الزامی است'}), 400
     
-    tickets = load_json(TICKETS_FILE)
-    
     ticket = {
         'id': secrets.token_hex(8),
         'user_id': request.current_user['id'],
@@ -899,8 +1101,7 @@ def create_ticket():
         'updated_at': datetime.now().isoformat()
     }
     
-    tickets.append(ticket)
-    save_json(TICKETS_FILE, tickets)
+    TICKETS.put(ticket['id'], ticket)
     
     return jsonify({
         'success': True,
@@ -928,22 +1129,45 @@ def get_achievements():
     
     return jsonify({'achievements': achievements})
 
+LEADERBOARD_SIZE = 10
+LEADERBOARD_TTL_SECONDS = 30
+_leaderboard_cache = {'expires': 0.0, 'body': b'', 'etag': ''}
+_leaderboard_lock = threading.Lock()
+
+
+def leaderboard_listing() -> tuple[bytes, str]:
+    """Return (JSON body, ETag) for /api/leaderboard, rebuilt at most every TTL seconds.
+
+    The top entries are read from the tail of the ordered 'xp' index, which
+    add_user_xp and every other user write keep current.
+    """
+    with _leaderboard_lock:
+        cache = _leaderboard_cache
+        if time.time() >= cache['expires']:
+            leaderboard = []
+            for email in USERS.range('xp', reverse=True, limit=LEADERBOARD_SIZE):
+                user = USERS.get(email)
+                if user is None:
+                    continue
+                leaderboard.append({
+                    'name': user['name'],
+                    'xp': user.get('xp', 0),
+                    'level': user.get('level', 1)
+                })
+            cache['body'] = json.dumps({'leaderboard': leaderboard}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cache['etag'] = hashlib.sha256(cache['body']).hexdigest()[:32]
+            cache['expires'] = time.time() + LEADERBOARD_TTL_SECONDS
+        return cache['body'], cache['etag']
+
+
 @app.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
     """Get top users by XP"""
-    users = load_json(USERS_FILE)
-    
-    leaderboard = []
-    for user in users.values():
-        leaderboard.append({
-            'name': user['name'],
-            'xp': user.get('xp', 0),
-            'level': user.get('level', 1)
-        })
-    
-    leaderboard.sort(key=lambda x: x['xp'], reverse=True)
-    
-    return jsonify({'leaderboard': leaderboard[:10]})
+    body, etag = leaderboard_listing()
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = f'public, max-age={LEADERBOARD_TTL_SECONDS}'
+    return resp.make_conditional(request)
 
 # ============================================
 # Stats Endpoints
@@ -951,15 +1175,14 @@ def get_leaderboard():
 
 @app.route('/api/stats', methods=['GET'])
 def get_public_stats():
-    """Get public statistics"""
-    users = load_json(USERS_FILE)
-    licenses = load_json(LICENSES_FILE)
-    
+    """Get public statistics (maintained counters only; no writes)"""
+    user_totals = USERS.totals()
+    license_totals = LICENSES.totals()
     return jsonify({
-        'total_users': len(users),
-        'total_licenses': len(licenses),
-        'total_downloads': sum(u.get('downloads', 0) for u in users.values()),
-        'active_licenses': len([l for l in licenses.values() if l['status'] == 'active'])
+        'total_users': user_totals.get('users', 0),
+        'total_licenses': license_totals.get('licenses', 0),
+        'total_downloads': user_totals.get('downloads', 0),
+        'active_licenses': license_totals.get('status:active', 0)
     })
 
 # ============================================
@@ -1059,16 +1282,13 @@ def _plan_duration_delta(plan: dict) -> timedelta | None:
 
 def load_plans():
     """Load plans from JSON file or return defaults"""
-    if PLANS_FILE.exists():
-        try:
-            plans = load_json(PLANS_FILE)
-            if plans:
-                return plans
-        except Exception:
-            pass
+    plans = PLANS.all()
+    if plans:
+        return plans
     # Create default plans file
     default_plans = get_default_plans()
-    save_json(PLANS_FILE, default_plans)
+    for plan_id, plan in default_plans.items():
+        PLANS.put(plan_id, plan)
     return default_plans
 
 @app.route('/api/plans', methods=['GET'])
@@ -1138,8 +1358,7 @@ def admin_create_plan():
         'sort_order': int(data.get('sort_order', len(plans) + 1))
     }
     
-    plans[plan_id] = new_plan
-    save_json(PLANS_FILE, plans)
+    PLANS.put(plan_id, new_plan)
     
     return jsonify({'success': True, 'plan': new_plan})
 
@@ -1156,7 +1375,7 @@ def admin_update_plan(plan_id):
         return jsonify({'error': 'پلن یافت نشد'}), 404
     
     data = request.json or {}
-    plan = plans[plan_id]
+    plan = PLANS.get(plan_id)
     
     # Update fields
     if 'name' in data:
@@ -1195,8 +1414,7 @@ def admin_update_plan(plan_id):
     if 'sort_order' in data:
         plan['sort_order'] = int(data['sort_order'])
     
-    plans[plan_id] = plan
-    save_json(PLANS_FILE, plans)
+    PLANS.put(plan_id, plan)
     
     return jsonify({'success': True, 'plan': plan})
 
@@ -1212,8 +1430,7 @@ def admin_delete_plan(plan_id):
     if plan_id not in plans:
         return jsonify({'error': 'پلن یافت نشد'}), 404
     
-    del plans[plan_id]
-    save_json(PLANS_FILE, plans)
+    PLANS.delete(plan_id)
     
     return jsonify({'success': True})
 
@@ -1270,28 +1487,15 @@ def purchase_plan():
     # === END VALIDATION ===
 
     user_id = request.current_user['id']
-    licenses = load_json(LICENSES_FILE)
     now = datetime.now()
 
-    # Check for duplicate active license for the same hardware_id (prevent abuse)
-    for lic in licenses.values():
+    # Check for duplicate active license for the same hardware_id (prevent abuse);
+    # the hardware_id index yields only licenses already bound to this device
+    for lic in LICENSES.find('hardware_id', hardware_id):
         if lic.get('user_id') != user_id:
             continue
-        if lic.get('status') != 'active':
-            continue
-        # Skip trial licenses
-        if (lic.get('plan') or '').strip().lower() == 'trial':
-            continue
-        # Check if not expired
-        exp = lic.get('expires_at')
-        try:
-            if exp and datetime.fromisoformat(exp) < now:
-                continue
-        except Exception:
-            continue
-        # Check if same hardware_id already bound
-        lic_hwids = lic.get('hardware_ids') or []
-        if hardware_id in lic_hwids:
+        # Skip trial, revoked and expired licenses
+        if is_paid_license_active(lic, now):
             return jsonify({
                 'error': 'شما در حال حاضر یک لایسنس فعال برای این دستگاه دارید',
                 'existing_license_key': lic.get('key'),
@@ -1304,7 +1508,7 @@ def purchase_plan():
 
     key = generate_license_key()
     # Ensure uniqueness
-    while key in licenses:
+    while key in LICENSES:
         key = generate_license_key()
 
     delta = _plan_duration_delta(plan)
@@ -1329,8 +1533,19 @@ def purchase_plan():
         'customer_phone': clean_phone  # Already validated and cleaned
     }
 
-    licenses[key] = paid_license
-    save_json(LICENSES_FILE, licenses)
+    LICENSES.put(key, paid_license)
+
+    # Record what was actually charged; admin revenue is the sum of these amounts
+    amount = plan.get('price_yearly') if payment_type == 'yearly' else plan.get('price')
+    PURCHASES.put(payment_id, {
+        'id': payment_id,
+        'user_id': user_id,
+        'license_key': key,
+        'plan': plan.get('id'),
+        'payment_type': payment_type,
+        'amount': int(amount or 0),
+        'created_at': now.isoformat(),
+    })
     
     # Generate signed license file immediately
     payload = {
@@ -1355,6 +1570,46 @@ def purchase_plan():
         'can_download_license_file': license_file_bundle is not None
     })
 
+
+def backfill_purchases() -> int:
+    """Record a purchase for every paid license issued before purchases were tracked.
+
+    Admin revenue is the sum of purchase amounts; older licenses are priced
+    from their plan (price or price_yearly by payment_type). Idempotent: the
+    purchase id is derived from the license key and licenses that already
+    have a purchase are skipped. Returns the number of purchases added.
+    """
+    plans = load_plans()
+    missing = []
+    for key, lic in LICENSES.items():
+        if PURCHASES.find_keys('license_key', key):
+            continue
+        plan = plans.get(lic.get('plan') or '')
+        if not plan:
+            continue
+        payment_type = lic.get('payment_type') or 'monthly'
+        amount = int((plan.get('price_yearly') if payment_type == 'yearly' else plan.get('price')) or 0)
+        if amount <= 0:
+            continue
+        purchase_id = f'legacy-{key}'
+        missing.append((purchase_id, {
+            'id': purchase_id,
+            'user_id': lic.get('user_id'),
+            'license_key': key,
+            'plan': plan.get('id') or lic.get('plan'),
+            'payment_type': payment_type,
+            'amount': amount,
+            'created_at': lic.get('created_at'),
+        }))
+    if missing and PURCHASES.put_many(missing):
+        print(f"[INFO] Backfilled {len(missing)} purchases from existing licenses")
+        return len(missing)
+    return 0
+
+# Run on startup
+backfill_purchases()
+start_expiry_sweeper()
+
 # ============================================
 # Signed License File (v2) Generation
 # ============================================
@@ -1364,26 +1619,47 @@ def _canonical_json_bytes(payload: dict) -> bytes:
     return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
 
 
-def _sign_license_v2(payload: dict) -> dict | None:
-    """Sign a license payload using RSA-PSS(SHA256).
+_license_key_cache = {'source': None, 'key': None}
+_license_key_lock = threading.Lock()
 
-    Returns the full bundle (payload + sig) or None if signing is unavailable.
+
+def _load_license_private_key():
+    """Return the parsed license signing key, loaded once per process.
+
+    The env var takes precedence over the key file; the file is re-read only
+    when its mtime/size changes (key rotation). Returns None if unavailable.
     """
     if not CRYPTO_AVAILABLE:
         return None
-    
-    # Try to load private key from env var first, then from file
-    private_key_pem = None
     if LICENSE_PRIVATE_KEY_PEM:
-        private_key_pem = LICENSE_PRIVATE_KEY_PEM.encode('utf-8')
-    elif LICENSE_PRIVATE_KEY_FILE and LICENSE_PRIVATE_KEY_FILE.exists():
-        private_key_pem = LICENSE_PRIVATE_KEY_FILE.read_bytes()
-    
-    if not private_key_pem:
+        source = ('env',)
+    else:
+        try:
+            st = LICENSE_PRIVATE_KEY_FILE.stat()
+        except (AttributeError, OSError):
+            return None
+        source = ('file', str(LICENSE_PRIVATE_KEY_FILE), st.st_mtime_ns, st.st_size)
+    with _license_key_lock:
+        if _license_key_cache['source'] != source:
+            try:
+                pem = LICENSE_PRIVATE_KEY_PEM.encode('utf-8') if LICENSE_PRIVATE_KEY_PEM else LICENSE_PRIVATE_KEY_FILE.read_bytes()
+                _license_key_cache['key'] = load_pem_private_key(pem, password=None)
+            except Exception:
+                _license_key_cache['key'] = None
+            _license_key_cache['source'] = source
+        return _license_key_cache['key']
+
+
+def _sign_license_v2(payload: dict) -> dict | None:
+    """Sign a license payload using RSA-PSS(SHA256).
+
+    Returns the full bundle (payload + sig) or None if signing is unavailable.
+    """
+    private_key = _load_license_private_key()
+    if private_key is None:
         return None
     
     try:
-        private_key = load_pem_private_key(private_key_pem, password=None)
         message = _canonical_json_bytes(payload)
         sig = private_key.sign(
             message,
@@ -1407,8 +1683,7 @@ def generate_license_file(license_key):
 
     Returns the license bundle JSON, or a .oml file download if `?download=1`.
     """
-    licenses = load_json(LICENSES_FILE)
-    lic = licenses.get(license_key)
+    lic = LICENSES.get(license_key)
     if not lic:
         return jsonify({'error': 'لایسنس یافت نشد'}), 404
 
@@ -1439,10 +1714,7 @@ def generate_license_file(license_key):
 
     # Track hardware binding
     if hardware_id:
-        lic.setdefault('hardware_ids', [])
-        if hardware_id not in lic['hardware_ids']:
-            lic['hardware_ids'].append(hardware_id)
-        save_json(LICENSES_FILE, licenses)
+        LICENSES.update(license_key, lambda l: bind_hardware_id(l, hardware_id))
 
     # Return as downloadable file?
     if request.args.get('download') == '1':
@@ -1464,48 +1736,115 @@ def generate_license_file(license_key):
 @app.route('/api/admin/stats', methods=['GET'])
 @admin_required
 def admin_stats():
-    """Get admin dashboard statistics."""
-    users = load_json(USERS_FILE)
-    licenses = load_json(LICENSES_FILE)
-    
-    total_revenue = 0
-    for lic in licenses.values():
-        plan = lic.get('plan', '')
-        if plan == 'starter':
-            total_revenue += 490000
-        elif plan == 'professional':
-            total_revenue += 990000
-        elif plan == 'enterprise':
-            total_revenue += 2490000
-    
-    active_licenses = len([l for l in licenses.values() if l.get('status') == 'active'])
+    """Get admin dashboard statistics (maintained counters, no scans)."""
+    expire_due_licenses()
+    license_totals = LICENSES.totals()
     
     return jsonify({
-        'users': len(users),
-        'total_licenses': len(licenses),
-        'active_licenses': active_licenses,
-        'revoked_licenses': len([l for l in licenses.values() if l.get('status') == 'revoked']),
-        'total_revenue': total_revenue,
-        'hardware_ids': len(set(
-            h for l in licenses.values() 
-            for h in (l.get('hardware_ids') or [])
-        ))
+        'users': USERS.totals().get('users', 0),
+        'total_licenses': license_totals.get('licenses', 0),
+        'active_licenses': license_totals.get('status:active', 0),
+        'revoked_licenses': license_totals.get('status:revoked', 0),
+        'expired_licenses': license_totals.get('status:expired', 0),
+        'total_revenue': PURCHASES.totals().get('revenue', 0),
+        'hardware_ids': LICENSES.count_distinct('hardware_id')
+    })
+
+
+ADMIN_PAGE_DEFAULT = 100
+ADMIN_PAGE_MAX = 500
+
+
+def parse_page_args(sort_keys: dict, default_sort: str = '-created_at'):
+    """Read offset/limit/sort query args. Returns (offset, limit, sort_name, reverse).
+
+    `sort` is a key of `sort_keys`, prefixed with '-' for descending order.
+    Without offset/limit the whole listing is returned (limit None), as the
+    admin pages expect.
+    """
+    if request.args.get('offset') is None and request.args.get('limit') is None:
+        offset, limit = 0, None
+    else:
+        try:
+            offset = max(0, int(request.args.get('offset') or 0))
+            limit = int(request.args.get('limit') or ADMIN_PAGE_DEFAULT)
+        except ValueError:
+            offset, limit = 0, ADMIN_PAGE_DEFAULT
+        limit = min(max(1, limit), ADMIN_PAGE_MAX)
+    sort = (request.args.get('sort') or default_sort).strip()
+    reverse = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in sort_keys:
+        name, reverse = default_sort.lstrip('-'), default_sort.startswith('-')
+    return offset, limit, name, reverse
+
+
+def prefix_keys(collection, index: str, prefix: str) -> set:
+    """Keys whose ordered `index` value starts with `prefix`."""
+    return set(collection.range(index, lo=prefix, hi=prefix + '\uffff'))
+
+
+def paginate(collection, candidates, offset: int, limit, sort_name: str, reverse: bool):
+    """Return (keys for the requested page, total matches).
+
+    Keys come in order from the ordered sort index. A selective filter sorts
+    its matching keys by their index values instead; a broad one picks them out
+    of the index in order. Only the page itself is ever loaded.
+    """
+    index = f'sort:{sort_name}'
+    if candidates is None:
+        keys = collection.range(index, reverse=reverse, offset=offset, limit=limit)
+        return keys, len(collection)
+    if len(candidates) * 4 < len(collection):
+        values = collection.index_values(index, candidates)
+        matches = sorted(values, key=lambda k: (values[k], k), reverse=reverse)
+    else:
+        matches = [k for k in collection.range(index, reverse=reverse) if k in candidates]
+    end = None if limit is None else offset + limit
+    return matches[offset:end], len(matches)
+
+
+def page_response(items_name: str, items: list, total: int, offset: int, limit):
+    next_offset = offset + len(items)
+    return jsonify({
+        items_name: items,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': next_offset if limit is not None and next_offset < total else None,
     })
 
 
 @app.route('/api/admin/licenses', methods=['GET'])
 @admin_required
 def admin_list_licenses():
-    """List all licenses with pagination."""
-    licenses = load_json(LICENSES_FILE)
-    users = load_json(USERS_FILE)
+    """List licenses with pagination.
+
+    Query: offset, limit (max 500; all rows when neither is given), sort (created_at|expires_at, '-' for
+    descending; default -created_at) and filters status, plan, hardware_id,
+    email (prefix of user/customer email).
+    """
+    offset, limit, sort_name, reverse = parse_page_args(LICENSE_SORT_KEYS)
+    
+    # Each filter is an index lookup; the page is cut from their intersection
+    filters = []
+    for index in ('status', 'plan', 'hardware_id'):
+        value = (request.args.get(index) or '').strip()
+        if value:
+            filters.append(LICENSES.find_keys(index, value))
+    email = (request.args.get('email') or '').strip().lower()
+    if email:
+        filters.append(prefix_keys(LICENSES, 'email', email))
+    candidates = set.intersection(*sorted(filters, key=len)) if filters else None
     
-    # Build user lookup by id
-    user_by_id = {u['id']: u for u in users.values()}
+    keys, total = paginate(LICENSES, candidates, offset, limit, sort_name, reverse)
     
     result = []
-    for key, lic in licenses.items():
-        user = user_by_id.get(lic.get('user_id'))
+    for key in keys:
+        lic = LICENSES.get(key)
+        if lic is None:
+            continue
+        user = USERS.find_one('id', lic.get('user_id')) if lic.get('user_id') else None
         result.append({
             'key': key,
             'plan': lic.get('plan'),
@@ -1520,13 +1859,7 @@ def admin_list_licenses():
             'user_name': user.get('name') if user else '',
         })
     
-    # Sort by created_at desc
-    result.sort(key=lambda x: x.get('created_at') or '', reverse=True)
-    
-    return jsonify({
-        'licenses': result,
-        'total': len(result)
-    })
+    return page_response('licenses', result, total, offset, limit)
 
 
 @app.route('/api/admin/licenses', methods=['POST'])
@@ -1541,9 +1874,8 @@ def admin_create_license():
     validity_days = int(data.get('validity_days') or 180)
     notes = (data.get('notes') or '').strip()
     
-    licenses = load_json(LICENSES_FILE)
     key = generate_license_key()
-    while key in licenses:
+    while key in LICENSES:
         key = generate_license_key()
     
     now = datetime.now()
@@ -1580,12 +1912,11 @@ def admin_create_license():
         'created_by_admin': request.current_user.get('email'),
     }
     
-    licenses[key] = new_license
-    save_json(LICENSES_FILE, licenses)
+    LICENSES.put(key, new_license)
     
     # Generate signed license file if possible
     license_file = None
-    if hardware_id and CRYPTO_AVAILABLE and LICENSE_PRIVATE_KEY_FILE.exists():
+    if hardware_id and _load_license_private_key() is not None:
         payload = {
             'v': 2,
             'license_id': key,
@@ -1609,24 +1940,27 @@ def admin_create_license():
 @admin_required
 def admin_update_license(license_key):
     """Update a license (status, expiry, etc.)."""
-    licenses = load_json(LICENSES_FILE)
-    
-    if license_key not in licenses:
+    if license_key not in LICENSES:
         return jsonify({'error': 'لایسنس یافت نشد'}), 404
     
     data = request.json or {}
-    lic = licenses[license_key]
-    
-    if 'status' in data:
-        lic['status'] = data['status']
-    if 'expires_at' in data:
-        lic['expires_at'] = data['expires_at']
-    if 'notes' in data:
-        lic['notes'] = data['notes']
-    if 'max_activations' in data:
-        lic['max_activations'] = int(data['max_activations'])
     
-    save_json(LICENSES_FILE, licenses)
+    def _apply(lic):
+        if 'status' in data:
+            lic['status'] = data['status']
+        if 'expires_at' in data:
+            lic['expires_at'] = data['expires_at']
+        if 'notes' in data:
+            lic['notes'] = data['notes']
+        if 'max_activations' in data:
+            lic['max_activations'] = int(data['max_activations'])
+    
+    lic = LICENSES.update(license_key, _apply)
+    if lic is None:
+        # Deleted meanwhile, or the write failed (read-only storage)
+        if license_key not in LICENSES:
+            return jsonify({'error': 'لایسنس یافت نشد'}), 404
+        return jsonify({'error': 'فایل سیستم فقط‌خواندنی است. لطفاً دیسک فعال کنید.'}), 503
     
     return jsonify({'success': True, 'license': lic})
 
@@ -1635,16 +1969,14 @@ def admin_update_license(license_key):
 @admin_required
 def admin_revoke_license(license_key):
     """Revoke a license."""
-    licenses = load_json(LICENSES_FILE)
-    
-    if license_key not in licenses:
+    if license_key not in LICENSES:
         return jsonify({'error': 'لایسنس یافت نشد'}), 404
     
-    licenses[license_key]['status'] = 'revoked'
-    licenses[license_key]['revoked_at'] = datetime.now().isoformat()
-    licenses[license_key]['revoked_by'] = request.current_user.get('email')
-    
-    save_json(LICENSES_FILE, licenses)
+    LICENSES.update(license_key, lambda lic: lic.update(
+        status='revoked',
+        revoked_at=datetime.now().isoformat(),
+        revoked_by=request.current_user.get('email'),
+    ))
     
     return jsonify({'success': True, 'message': 'لایسنس لغو شد'})
 
@@ -1653,8 +1985,7 @@ def admin_revoke_license(license_key):
 @admin_required
 def admin_generate_license_file(license_key):
     """Generate a signed license file for any license (admin)."""
-    licenses = load_json(LICENSES_FILE)
-    lic = licenses.get(license_key)
+    lic = LICENSES.get(license_key)
     
     if not lic:
         return jsonify({'error': 'لایسنس یافت نشد'}), 404
@@ -1685,10 +2016,7 @@ def admin_generate_license_file(license_key):
     
     # Track hardware binding
     if hardware_id:
-        lic.setdefault('hardware_ids', [])
-        if hardware_id not in lic['hardware_ids']:
-            lic['hardware_ids'].append(hardware_id)
-        save_json(LICENSES_FILE, licenses)
+        LICENSES.update(license_key, lambda l: bind_hardware_id(l, hardware_id))
     
     return jsonify({'success': True, 'license_file': bundle})
 
@@ -1696,19 +2024,22 @@ def admin_generate_license_file(license_key):
 @app.route('/api/admin/users', methods=['GET'])
 @admin_required
 def admin_list_users():
-    """List all users."""
-    users = load_json(USERS_FILE)
-    licenses = load_json(LICENSES_FILE)
+    """List users with pagination.
+
+    Query: offset, limit (max 500; all rows when neither is given), sort (created_at|email, '-' for
+    descending; default -created_at) and email (prefix filter).
+    """
+    offset, limit, sort_name, reverse = parse_page_args(USER_SORT_KEYS)
     
-    # Count licenses per user
-    license_count = {}
-    for lic in licenses.values():
-        uid = lic.get('user_id')
-        if uid:
-            license_count[uid] = license_count.get(uid, 0) + 1
+    email = (request.args.get('email') or '').strip().lower()
+    candidates = prefix_keys(USERS, 'sort:email', email) if email else None
+    keys, total = paginate(USERS, candidates, offset, limit, sort_name, reverse)
     
     result = []
-    for email, user in users.items():
+    for email in keys:
+        user = USERS.get(email)
+        if user is None:
+            continue
         result.append({
             'id': user.get('id'),
             'name': user.get('name'),
@@ -1717,16 +2048,11 @@ def admin_list_users():
             'is_admin': user.get('is_admin', False),
             'created_at': user.get('created_at'),
             'last_login': user.get('last_login'),
-            'license_count': license_count.get(user.get('id'), 0),
+            'license_count': len(LICENSES.find_keys('user_id', user.get('id'))) if user.get('id') else 0,
             'downloads': user.get('downloads', 0),
         })
     
-    result.sort(key=lambda x: x.get('created_at') or '', reverse=True)
-    
-    return jsonify({
-        'users': result,
-        'total': len(result)
-    })
+    return page_response('users', result, total, offset, limit)
 
 
 @app.route('/api/admin/users/admin-status', methods=['PATCH'])
@@ -1747,27 +2073,50 @@ def admin_set_user_admin_status():
     if not isinstance(desired, bool):
         return jsonify({'error': 'مقدار is_admin نامعتبر است'}), 400
 
-    users = load_json(USERS_FILE)
-    if email not in users:
+    user = USERS.get(email)
+    if not user:
         return jsonify({'error': 'کاربر یافت نشد'}), 404
 
     # Prevent removing the last admin
     if desired is False:
-        admin_emails = [e for e, u in users.items() if u.get('is_admin')]
+        admin_emails = [e for e, u in USERS.items() if u.get('is_admin')]
         if email in admin_emails and len(admin_emails) <= 1:
             return jsonify({'error': 'حداقل یک مدیر باید باقی بماند'}), 400
 
-    users[email]['is_admin'] = desired
-    save_json(USERS_FILE, users)
+    user['is_admin'] = desired
+    USERS.put(email, user)
 
     return jsonify({'success': True, 'email': email, 'is_admin': desired})
 
 
+# ============================================
+# Storage Migration
+# ============================================
+
+def migrate_storage():
+    """Copy the JSON data files into the SQLite backend (one-shot, idempotent).
+
+    Usage: ODOOMASTER_STORAGE=sqlite python api/server.py migrate-storage
+    """
+    if not all(isinstance(c, SqliteCollection) for c in COLLECTIONS):
+        print("[ERROR] Set ODOOMASTER_STORAGE=sqlite to migrate JSON data into SQLite")
+        return 1
+    for collection in COLLECTIONS:
+        count = collection.import_json()
+        print(f"[INFO] {collection.json_path.name} -> {collection.table}: {count} records")
+    backfill_purchases()
+    print(f"[INFO] Migration complete: {COLLECTIONS[0].db_path}")
+    return 0
+
+
 # ============================================
 # Run Server
 # ============================================
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrate-storage':
+        raise SystemExit(migrate_storage())
+
     port = int(os.environ.get('PORT', '5001'))
     debug = os.environ.get('DEBUG', '0') == '1'
 
@@ -0,0 +1,791 @@
+# -*- coding: utf-8 -*-
+"""
+OdooMaster Website API - Storage layer
+
+Two interchangeable backends, selected with ODOOMASTER_STORAGE:
+
+- json (default): JSON files are parsed once and kept in memory. A file is
+  re-read only when its signature (inode, mtime, size) changes on disk, e.g.
+  because another gunicorn worker wrote it. Writes go to a temp file that is
+  fsync'ed and renamed into place, under an exclusive fcntl lock on
+  `<file>.lock` so read-modify-write cycles from several workers serialise.
+- sqlite: one SQLite database in WAL mode (ODOOMASTER_SQLITE_PATH, default
+  <data dir>/odoomaster.sqlite3) with one table per collection. Writes update
+  single rows, so concurrent workers no longer overwrite each other.
+"""
+
+import bisect
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Cross-process file locks (POSIX only; Windows dev servers run single-process)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+STORAGE_BACKEND = (os.environ.get('ODOOMASTER_STORAGE') or 'json').strip().lower()
+SQLITE_PATH = os.environ.get('ODOOMASTER_SQLITE_PATH')
+
+
+@contextmanager
+def file_lock(filepath: Path):
+    """Hold an exclusive cross-process lock on `<filepath>.lock`.
+
+    Degrades to a no-op where fcntl is unavailable or the lock file cannot be
+    created (read-only filesystem - the write itself will then fail).
+    """
+    fd = None
+    if FCNTL_AVAILABLE:
+        lock_path = Path(filepath).with_name(Path(filepath).name + '.lock')
+        try:
+            lock_path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except OSError:
+            if fd is not None:
+                os.close(fd)
+            fd = None
+    try:
+        yield
+    finally:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _fsync_dir(dirpath: Path):
+    """Persist a rename by fsync'ing the containing directory (best-effort)."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    try:
+        fd = os.open(str(dirpath), os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(filepath: Path, data, indent=2):
+    """Write JSON next to `filepath`, fsync it and atomically rename it into place.
+
+    A crash leaves either the old or the new file, never a truncated one.
+    Raises OSError if the filesystem is not writable.
+    """
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{filepath.name}.', suffix='.tmp', dir=str(filepath.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(filepath.parent)
+
+
+def _file_signature(filepath: Path):
+    """Return a cheap fingerprint of the file on disk, or None if missing."""
+    try:
+        st = filepath.stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class CachedJsonFile:
+    """A JSON document parsed once and re-read only when the file changes.
+
+    If the file exists but cannot be parsed, the last good copy (or the
+    default) is served and `corrupt` is set; writers must not overwrite the
+    file in that state, otherwise the unreadable data would be lost for good.
+    """
+
+    def __init__(self, path, default=dict):
+        self.path = Path(path)
+        self._default = default
+        self._data = None
+        self._signature = None
+        self._lock = threading.RLock()
+        self.corrupt = False
+
+    def _read(self):
+        """Parse the file; returns None if it exists but is unreadable."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self._default()
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Cannot parse {self.path}: {e}")
+            return None
+
+    def _decode(self, raw):
+        """Convert the on-disk document to its in-memory form."""
+        return raw
+
+    def _reloaded(self):
+        """Hook called after the document was (re)loaded from disk."""
+
+    def load(self):
+        """Return the cached document, re-reading the file if it changed."""
+        signature = _file_signature(self.path)
+        with self._lock:
+            if self._data is None or signature != self._signature:
+                raw = self._read()
+                self.corrupt = raw is None
+                self._signature = signature
+                if raw is not None or self._data is None:
+                    self._data = self._decode(raw if raw is not None else self._default())
+                    self._reloaded()
+            return self._data
+
+    def invalidate(self):
+        """Drop the cached copy so the next load re-reads the file."""
+        with self._lock:
+            self._data = None
+            self._signature = None
+
+
+class JsonCollection(CachedJsonFile):
+    """Keyed records stored in a single JSON file.
+
+    On disk the file is either an object ({key: record}) or, when `list_key`
+    is given, a list of records identified by that field (e.g. tickets.json).
+
+    Records returned by `get` are private copies; records yielded by
+    `values`/`items`/`find` are the cached objects and must be treated as
+    read-only. Mutations go through `put`/`delete`/`update`, which reload the
+    file under the cross-process lock, apply the change and write the file
+    through; they return False/None if the filesystem is read-only.
+
+    `indexes` maps an index name to a function returning the values a record
+    should be found under (e.g. ``{'token': lambda u: [u.get('token')]}``).
+    Indexes are rebuilt when the file is reloaded and updated in place by
+    `put`/`delete`, so `find` is a dict lookup. Indexes listed in `ordered`
+    also keep a sorted (value, key) list for `range` queries; their values
+    must be mutually comparable (e.g. all ISO strings).
+
+    `counters` is a function returning ``{name: amount}`` for a record; the
+    sums over all records are maintained on every write and read with
+    `totals()` in O(1).
+    """
+
+    def __init__(self, path, list_key=None, indexes=None, indent=2, ordered=(), counters=None):
+        super().__init__(path, default=list if list_key else dict)
+        self.list_key = list_key
+        self.indent = indent
+        self._indexers = dict(indexes or {})
+        self._index = {name: {} for name in self._indexers}      # name -> value -> {keys}
+        self._indexed = {name: {} for name in self._indexers}    # name -> key -> values
+        self._ordered = {name: [] for name in ordered}           # name -> sorted [(value, key)]
+        self._counter = counters
+        self._totals = {}
+        self._contrib = {}                                       # key -> counter contribution
+
+    def _decode(self, raw):
+        if self.list_key:
+            if not isinstance(raw, list):
+                return {}
+            return {r.get(self.list_key): r for r in raw if isinstance(r, dict)}
+        return raw if isinstance(raw, dict) else {}
+
+    def _reloaded(self):
+        for name in self._indexers:
+            self._index[name] = {}
+            self._indexed[name] = {}
+        self._totals = {}
+        self._contrib = {}
+        for key, record in self._data.items():
+            self._index_record(key, record, keep_sorted=False)
+        for name in self._ordered:
+            self._ordered[name] = sorted(
+                (value, key) for key, values in self._indexed[name].items() for value in values
+            )
+
+    def _add_totals(self, contrib, sign):
+        for name, amount in contrib.items():
+            self._totals[name] = self._totals.get(name, 0) + sign * amount
+
+    def _index_record(self, key, record, keep_sorted=True):
+        for name, indexer in self._indexers.items():
+            values = tuple(dict.fromkeys(v for v in (indexer(record) or ()) if v not in (None, '')))
+            if not values:
+                continue
+            self._indexed[name][key] = values
+            for value in values:
+                self._index[name].setdefault(value, set()).add(key)
+                if keep_sorted and name in self._ordered:
+                    bisect.insort(self._ordered[name], (value, key))
+        if self._counter:
+            contrib = self._counter(record) or {}
+            self._contrib[key] = contrib
+            self._add_totals(contrib, 1)
+
+    def _unindex_record(self, key):
+        for name in self._indexers:
+            for value in self._indexed[name].pop(key, ()):
+                keys = self._index[name].get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._index[name][value]
+                if name in self._ordered:
+                    lst = self._ordered[name]
+                    i = bisect.bisect_left(lst, (value, key))
+                    if i < len(lst) and lst[i] == (value, key):
+                        del lst[i]
+        self._add_totals(self._contrib.pop(key, {}), -1)
+
+    def _encode(self, data):
+        return list(data.values()) if self.list_key else data
+
+    def _writable(self) -> bool:
+        if self.corrupt:
+            print(f"[ERROR] Refusing to overwrite unreadable {self.path}; fix or restore it first")
+            return False
+        return True
+
+    def _write(self, data) -> bool:
+        try:
+            write_json_atomic(self.path, self._encode(data), indent=self.indent)
+        except OSError as e:
+            # Read-only filesystem (e.g., Liara without disk): keep memory in sync with disk
+            print(f"[WARNING] Cannot save to {self.path}: {e}")
+            self.invalidate()
+            return False
+        self._signature = _file_signature(self.path)
+        return True
+
+    # ---- reads ----
+
+    def get(self, key, default=None):
+        record = self.load().get(key)
+        return copy.deepcopy(record) if record is not None else default
+
+    def all(self) -> dict:
+        """Return the cached mapping (read-only)."""
+        return self.load()
+
+    def keys(self):
+        return self.load().keys()
+
+    def values(self):
+        return self.load().values()
+
+    def items(self):
+        return self.load().items()
+
+    def find(self, index, value) -> list:
+        """Return cached records whose `index` contains `value` (read-only)."""
+        with self._lock:
+            data = self.load()
+            return [data[k] for k in self._index[index].get(value, ()) if k in data]
+
+    def find_one(self, index, value):
+        """Return the first cached record found under `value`, or None."""
+        found = self.find(index, value)
+        return found[0] if found else None
+
+    def find_keys(self, index, value) -> set:
+        """Return the keys whose `index` contains `value`."""
+        with self._lock:
+            self.load()
+            return set(self._index[index].get(value, ()))
+
+    def range(self, index, lo=None, hi=None, reverse=False, offset=0, limit=None) -> list:
+        """Keys whose ordered `index` value v satisfies lo <= v < hi, in value order.
+
+        `offset`/`limit` slice the result after ordering, so a page costs
+        O(log n + limit).
+        """
+        with self._lock:
+            self.load()
+            lst = self._ordered[index]
+            start = 0 if lo is None else bisect.bisect_left(lst, (lo,))
+            end = len(lst) if hi is None else bisect.bisect_left(lst, (hi,))
+            if reverse:
+                end = max(start, end - offset)
+                if limit is not None:
+                    start = max(start, end - limit)
+                return [key for _value, key in reversed(lst[start:end])]
+            start = min(end, start + offset)
+            if limit is not None:
+                end = min(end, start + limit)
+            return [key for _value, key in lst[start:end]]
+
+    def index_values(self, index, keys) -> dict:
+        """Map each of `keys` to its first value in `index` (keys without one are omitted)."""
+        with self._lock:
+            self.load()
+            indexed = self._indexed[index]
+            return {k: indexed[k][0] for k in keys if k in indexed}
+
+    def count_distinct(self, index) -> int:
+        """Number of distinct values in `index`."""
+        with self._lock:
+            self.load()
+            return len(self._index[index])
+
+    def totals(self) -> dict:
+        """Sums of the `counters` contributions over all records."""
+        with self._lock:
+            self.load()
+            return dict(self._totals)
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def __len__(self):
+        return len(self.load())
+
+    # ---- writes ----
+
+    def put(self, key, record) -> bool:
+        """Insert or replace one record and write the file through."""
+        with self._lock, file_lock(self.path):
+            data = self.load()
+            if not self._writable():
+                return False
+            self._unindex_record(key)
+            data[key] = record
+            self._index_record(key, record)
+            return self._write(data)
+
+    def put_many(self, items) -> bool:
+        """Insert or replace several (key, record) pairs with a single write."""
+        with self._lock, file_lock(self.path):
+            data = self.load()
+            if not self._writable():
+                return False
+            for key, record in items:
+                self._unindex_record(key)
+                data[key] = record
+                self._index_record(key, record)
+            return self._write(data)
+
+    def update(self, key, mutate):
+        """Atomically read, modify and write back one record.
+
+        `mutate(record)` changes the freshest copy in place; returning False
+        aborts without writing. Returns the written record, or None if the
+        record is missing, the update was aborted or the write failed.
+        """
+        with self._lock, file_lock(self.path):
+            record = self.get(key)
+            if record is None or not self._writable() or mutate(record) is False:
+                return None
+            data = self.load()
+            self._unindex_record(key)
+            data[key] = record
+            self._index_record(key, record)
+            return record if self._write(data) else None
+
+    def update_many(self, keys, mutate) -> int:
+        """Apply `update`'s `mutate` to several records with a single write.
+
+        Returns the number of records written (0 if the write failed).
+        """
+        with self._lock, file_lock(self.path):
+            data = self.load()
+            if not self._writable():
+                return 0
+            changed = {}
+            for key in keys:
+                record = copy.deepcopy(data.get(key))
+                if record is not None and mutate(record) is not False:
+                    changed[key] = record
+            if not changed:
+                return 0
+            for key, record in changed.items():
+                self._unindex_record(key)
+                data[key] = record
+                self._index_record(key, record)
+            return len(changed) if self._write(data) else 0
+
+    def delete(self, key) -> bool:
+        """Remove one record (no-op if missing) and write the file through."""
+        return self.delete_many([key])
+
+    def delete_many(self, keys) -> bool:
+        """Remove several records with a single write."""
+        with self._lock, file_lock(self.path):
+            data = self.load()
+            if not self._writable():
+                return False
+            keys = [k for k in keys if k in data]
+            if not keys:
+                return True
+            for key in keys:
+                self._unindex_record(key)
+                del data[key]
+            return self._write(data)
+
+
+class SqliteCollection:
+    """Keyed records stored as rows of a SQLite table.
+
+    Same interface as JsonCollection. Each record is a JSON document in
+    `<table>.data`; index values live in `<table>_index` with a B-tree on
+    (name, value), so `find`, `range` and `get` never scan the table.
+    Counter totals are persisted in `<table>_totals` and adjusted in the same
+    transaction as the row they come from.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, db_path, table, list_key=None, indexes=None, json_path=None, ordered=(), counters=None):
+        self.db_path = str(db_path)
+        self.table = table
+        self.list_key = list_key
+        self.json_path = Path(json_path) if json_path else None
+        self._indexers = dict(indexes or {})
+        self._counter = counters
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(self.db_path)
+        if conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conns[self.db_path] = conn
+        return conn
+
+    def _init_schema(self):
+        t = self.table
+        with self._conn() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{t}" (key TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            # `value` has no declared type so numbers keep numeric ordering
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{t}_index" (name TEXT NOT NULL, value NOT NULL, key TEXT NOT NULL)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{t}_index_lookup" ON "{t}_index" (name, value)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{t}_index_key" ON "{t}_index" (key)')
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{t}_totals" (name TEXT PRIMARY KEY, value NOT NULL)')
+            # Indexes added to an existing table: fill them from the stored rows
+            missing = [
+                name for name in self._indexers
+                if not conn.execute(f'SELECT 1 FROM "{t}_index" WHERE name = ? LIMIT 1', (name,)).fetchone()
+            ]
+            if missing:
+                for key, data in conn.execute(f'SELECT key, data FROM "{t}"').fetchall():
+                    record = json.loads(data)
+                    conn.executemany(
+                        f'INSERT INTO "{t}_index" (name, value, key) VALUES (?, ?, ?)',
+                        [row for row in self._index_rows(key, record) if row[0] in missing],
+                    )
+            # Counters added to an existing table: compute them once from the rows
+            if self._counter and not conn.execute(f'SELECT 1 FROM "{t}_totals" LIMIT 1').fetchone():
+                for (data,) in conn.execute(f'SELECT data FROM "{t}"').fetchall():
+                    self._add_totals(conn, self._counter(json.loads(data)) or {}, 1)
+
+    def _add_totals(self, conn, contrib, sign):
+        conn.executemany(
+            f'INSERT INTO "{self.table}_totals" (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            [(name, sign * amount) for name, amount in contrib.items()],
+        )
+
+    def _remove_totals(self, conn, key):
+        if not self._counter:
+            return
+        row = conn.execute(f'SELECT data FROM "{self.table}" WHERE key = ?', (key,)).fetchone()
+        if row:
+            self._add_totals(conn, self._counter(json.loads(row[0])) or {}, -1)
+
+    def _index_rows(self, key, record):
+        rows = []
+        for name, indexer in self._indexers.items():
+            for value in set(indexer(record) or ()):
+                if value not in (None, ''):
+                    rows.append((name, value, key))
+        return rows
+
+    def _upsert(self, conn, key, record):
+        t = self.table
+        if self._counter:
+            self._remove_totals(conn, key)
+            self._add_totals(conn, self._counter(record) or {}, 1)
+        conn.execute(
+            f'INSERT INTO "{t}" (key, data) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET data = excluded.data',
+            (key, json.dumps(record, ensure_ascii=False, default=str)),
+        )
+        conn.execute(f'DELETE FROM "{t}_index" WHERE key = ?', (key,))
+        conn.executemany(f'INSERT INTO "{t}_index" (name, value, key) VALUES (?, ?, ?)', self._index_rows(key, record))
+
+    # ---- reads ----
+
+    def get(self, key, default=None):
+        row = self._conn().execute(f'SELECT data FROM "{self.table}" WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def all(self) -> dict:
+        return dict(self.items())
+
+    def keys(self):
+        return [row[0] for row in self._conn().execute(f'SELECT key FROM "{self.table}" ORDER BY rowid')]
+
+    def values(self):
+        return [v for _k, v in self.items()]
+
+    def items(self):
+        rows = self._conn().execute(f'SELECT key, data FROM "{self.table}" ORDER BY rowid')
+        return [(k, json.loads(d)) for k, d in rows]
+
+    def find(self, index, value) -> list:
+        t = self.table
+        rows = self._conn().execute(
+            f'SELECT t.data FROM "{t}_index" i JOIN "{t}" t ON t.key = i.key WHERE i.name = ? AND i.value = ?',
+            (index, value),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def find_one(self, index, value):
+        found = self.find(index, value)
+        return found[0] if found else None
+
+    def find_keys(self, index, value) -> set:
+        rows = self._conn().execute(
+            f'SELECT key FROM "{self.table}_index" WHERE name = ? AND value = ?', (index, value)
+        )
+        return {row[0] for row in rows}
+
+    def range(self, index, lo=None, hi=None, reverse=False, offset=0, limit=None) -> list:
+        sql = f'SELECT key FROM "{self.table}_index" WHERE name = ?'
+        params = [index]
+        if lo is not None:
+            sql += ' AND value >= ?'
+            params.append(lo)
+        if hi is not None:
+            sql += ' AND value < ?'
+            params.append(hi)
+        sql += ' ORDER BY value DESC, key DESC' if reverse else ' ORDER BY value, key'
+        if limit is not None or offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else limit, offset]
+        return [row[0] for row in self._conn().execute(sql, params)]
+
+    def index_values(self, index, keys) -> dict:
+        keys = list(keys)
+        values = {}
+        conn = self._conn()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = conn.execute(
+                f'SELECT key, MIN(value) FROM "{self.table}_index" WHERE name = ? AND key IN '
+                f'({",".join("?" * len(chunk))}) GROUP BY key',
+                [index, *chunk],
+            )
+            values.update(rows)
+        return values
+
+    def count_distinct(self, index) -> int:
+        return self._conn().execute(
+            f'SELECT COUNT(DISTINCT value) FROM "{self.table}_index" WHERE name = ?', (index,)
+        ).fetchone()[0]
+
+    def totals(self) -> dict:
+        return dict(self._conn().execute(f'SELECT name, value FROM "{self.table}_totals"'))
+
+    def __contains__(self, key):
+        return self._conn().execute(f'SELECT 1 FROM "{self.table}" WHERE key = ?', (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn().execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+
+    def invalidate(self):
+        """No-op: SQLite always reads the committed state."""
+
+    # ---- writes ----
+
+    def put(self, key, record) -> bool:
+        try:
+            with self._conn() as conn:
+                self._upsert(conn, key, record)
+            return True
+        except sqlite3.Error as e:
+            print(f"[WARNING] Cannot save to {self.db_path} ({self.table}): {e}")
+            return False
+
+    def put_many(self, items) -> bool:
+        try:
+            with self._conn() as conn:
+                for key, record in items:
+                    self._upsert(conn, key, record)
+            return True
+        except sqlite3.Error as e:
+            print(f"[WARNING] Cannot save to {self.db_path} ({self.table}): {e}")
+            return False
+
+    def update(self, key, mutate):
+        """Read, modify and write back one record inside one write transaction."""
+        try:
+            with self._conn() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute(f'SELECT data FROM "{self.table}" WHERE key = ?', (key,)).fetchone()
+                if not row:
+                    return None
+                record = json.loads(row[0])
+                if mutate(record) is False:
+                    return None
+                self._upsert(conn, key, record)
+            return record
+        except sqlite3.Error as e:
+            print(f"[WARNING] Cannot save to {self.db_path} ({self.table}): {e}")
+            return None
+
+    def update_many(self, keys, mutate) -> int:
+        """Apply `mutate` to several records inside one write transaction."""
+        changed = 0
+        try:
+            with self._conn() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for key in keys:
+                    row = conn.execute(f'SELECT data FROM "{self.table}" WHERE key = ?', (key,)).fetchone()
+                    if not row:
+                        continue
+                    record = json.loads(row[0])
+                    if mutate(record) is False:
+                        continue
+                    self._upsert(conn, key, record)
+                    changed += 1
+            return changed
+        except sqlite3.Error as e:
+            print(f"[WARNING] Cannot save to {self.db_path} ({self.table}): {e}")
+            return 0
+
+    def delete(self, key) -> bool:
+        return self.delete_many([key])
+
+    def delete_many(self, keys) -> bool:
+        t = self.table
+        params = [(k,) for k in keys]
+        try:
+            with self._conn() as conn:
+                for key in keys:
+                    self._remove_totals(conn, key)
+                conn.executemany(f'DELETE FROM "{t}" WHERE key = ?', params)
+                conn.executemany(f'DELETE FROM "{t}_index" WHERE key = ?', params)
+            return True
+        except sqlite3.Error as e:
+            print(f"[WARNING] Cannot save to {self.db_path} ({self.table}): {e}")
+            return False
+
+    def import_json(self) -> int:
+        """Copy every record of the original JSON file into the table (upsert).
+
+        Returns the number of imported records.
+        """
+        if not self.json_path:
+            return 0
+        source = JsonCollection(self.json_path, list_key=self.list_key)
+        items = list(source.items())
+        with self._conn() as conn:
+            for key, record in items:
+                self._upsert(conn, key, record)
+        return len(items)
+
+
+def open_collection(path, list_key=None, indexes=None, indent=2, ordered=(), counters=None):
+    """Open the collection stored in JSON file `path` with the configured backend.
+
+    `indent` only applies to the JSON backend (None writes compact files).
+    """
+    path = Path(path)
+    if STORAGE_BACKEND == 'sqlite':
+        db_path = Path(SQLITE_PATH) if SQLITE_PATH else path.parent / 'odoomaster.sqlite3'
+        return SqliteCollection(db_path, path.stem, list_key=list_key, indexes=indexes, json_path=path,
+                                ordered=ordered, counters=counters)
+    return JsonCollection(path, list_key=list_key, indexes=indexes, indent=indent,
+                          ordered=ordered, counters=counters)
+
+
+class TokenStore:
+    """Short-lived random tokens with a TTL, kept in a collection.
+
+    Entries carry an integer `exp` (epoch seconds). Lookups are a single key
+    access. The collection must be opened with `TokenStore.INDEXES` and
+    `TokenStore.ORDERED`, which keep the tokens in expiry order (issue order,
+    as the TTL is fixed). `issue` evicts the soonest-expiring entries before
+    the store grows past `max_entries`, and expired entries are swept at most
+    once per `sweep_interval` seconds by a range query over that order, so
+    neither touches the live tokens.
+    """
+
+    INDEXES = {'exp': lambda entry: [TokenStore.expiry(entry)]}
+    ORDERED = ('exp',)
+
+    def __init__(self, collection, ttl_seconds, max_entries=10000, sweep_interval=60):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def expiry(entry) -> float:
+        """Expiry of an entry as epoch seconds (legacy entries use ISO `expires_at`)."""
+        if 'exp' in entry:
+            return entry['exp']
+        try:
+            return datetime.fromisoformat(entry.get('expires_at', '')).timestamp()
+        except (TypeError, ValueError):
+            return 0
+
+    def is_expired(self, entry, now=None) -> bool:
+        return self.expiry(entry) <= (now if now is not None else time.time())
+
+    def issue(self, token, data) -> bool:
+        """Store `data` under `token` for `ttl_seconds`."""
+        entry = dict(data)
+        entry['exp'] = int(time.time()) + self.ttl_seconds
+        self.maybe_sweep()
+        with self._lock:
+            overflow = len(self.collection) - (self.max_entries - 1)
+            if overflow > 0:
+                self.collection.delete_many(self.collection.range('exp', limit=overflow))
+            return self.collection.put(token, entry)
+
+    def get(self, token):
+        """Return the entry for `token` (possibly expired), or None."""
+        return self.collection.get(token)
+
+    def maybe_sweep(self):
+        """Run `sweep` if the previous one is older than `sweep_interval`."""
+        now = time.time()
+        with self._lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        self.sweep(now)
+
+    def sweep(self, now=None) -> int:
+        """Drop entries that expired before `now` (a range on the exp index); returns entries removed."""
+        now = now if now is not None else time.time()
+        doomed = self.collection.range('exp', hi=now)
+        if doomed:
+            self.collection.delete_many(doomed)
+        return len(doomed)
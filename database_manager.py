@@ -1,11 +1,29 @@
 #!/usr/bin/env python3
 """
 Local Database Manager for License System
-Uses JSON file as a simple database - can be migrated to SQL later
+Uses a SQLite file (WAL mode) as the database. Each customer/license is one
+row holding the JSON record plus indexed columns (id, key, email, hardware_id),
+so lookups are index seeks and writes touch only the changed rows.
+A legacy .database.json is imported automatically on first use.
+
+Activation history is an append-only JSON-lines log (.activations.jsonl) rotated
+by size; per-license counts live in indexed columns of the licenses table.
+
+Admin search uses a trigram index (search_grams) over normalised text, kept up
+to date by every customer/license write.
 """
+import bisect
+import gzip
+import io
 import json
 import hashlib
+import heapq
+import os
+import re
+import sqlite3
+import threading
 import uuid
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, List, Dict
@@ -17,72 +35,467 @@ try:
 except ImportError:
     BLACKLIST_ENABLED = False
 
-DB_FILE = Path(__file__).parent / '.database.json'
+# Optional zstd compression for backups
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
 
+DB_FILE = Path(__file__).parent / '.database.sqlite3'
+LEGACY_DB_FILE = Path(__file__).parent / '.database.json'
 
-def _load_db() -> dict:
-    """Load database from file."""
-    default_db = {
-        'version': '1.0',
-        'created_at': datetime.now().isoformat(),
-        'customers': [],  # List of customers
-        'licenses': [],   # List of licenses
-        'activations': [], # License activations history
-        'stats': {
-            'total_customers': 0,
-            'total_licenses': 0,
-            'active_licenses': 0,
-            'expired_licenses': 0,
-            'total_revenue': 0
-        }
-    }
+# Activation log: rotated to .activations.jsonl.1 ... .N when it reaches the size limit
+ACTIVATION_LOG_FILE = Path(__file__).parent / '.activations.jsonl'
+ACTIVATION_LOG_MAX_BYTES = int(os.environ.get('ODOMASTER_ACTIVATION_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+ACTIVATION_LOG_BACKUPS = int(os.environ.get('ODOMASTER_ACTIVATION_LOG_BACKUPS', '5'))
+_activation_log_lock = threading.Lock()
+
+# License JSON with the live activation counters merged in (JSON1 json_set)
+_LICENSE_DATA = "json_set(data, '$.activations', activation_count, '$.last_activation', last_activation)"
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _expiry_ts(lic: dict) -> Optional[int]:
+    """Expiry of a license as epoch seconds (None if unparseable)."""
     try:
-        if DB_FILE.exists():
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
+        return int(datetime.fromisoformat(lic['expiry_iso']).timestamp())
+    except Exception:
+        return None
+
+
+# ============ SEARCH INDEX ============
+
+# Persian/Arabic letter variants, digits and joiners mapped to one form
+_SEARCH_CHARS = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    **{chr(0x06F0 + d): str(d) for d in range(10)},  # Persian digits
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # Arabic-Indic digits
+    '\u200c': ' ', '\u200d': '', 'ـ': '',
+})
+_SEARCH_DROP = re.compile('[\u064b-\u065f\u0670]')  # harakat
+_SEARCH_PAD = '\x01\x01'  # lets every position of a field start a trigram
+SEARCH_LIMIT = 50
+
+
+def _normalize_search(text) -> str:
+    text = _SEARCH_DROP.sub('', str(text or '').translate(_SEARCH_CHARS))
+    return ' '.join(text.casefold().split())
+
+
+def _search_fields(kind: str, record: dict) -> List[str]:
+    """Normalised searchable fields, in ranking order."""
+    if kind == 'customer':
+        phone = _normalize_search(record.get('phone'))
+        values = [record.get('name'), record.get('email'), phone, record.get('company'),
+                  re.sub(r'\D', '', phone)]
+    else:
+        values = [record.get('hardware_id'), record.get('id'), record.get('customer_id')]
+    return [_normalize_search(v) for v in values]
+
+
+def _grams(fields: List[str]) -> set:
+    grams = set()
+    for field in fields:
+        padded = field + _SEARCH_PAD
+        grams.update(padded[i:i + 3] for i in range(len(field)))
+    return grams
+
+
+def _index_search(conn: sqlite3.Connection, kind: str, record: dict):
+    """Update the search index for one record (only changed grams are written)."""
+    fields = _search_fields(kind, record)
+    joined = '\x1f'.join(fields)
+    row = conn.execute('SELECT fields FROM search_docs WHERE kind = ? AND id = ?', (kind, record['id'])).fetchone()
+    if row and row[0] == joined:
+        return
+    old = _grams(row[0].split('\x1f')) if row else set()
+    new = _grams(fields)
+    conn.executemany('DELETE FROM search_grams WHERE kind = ? AND gram = ? AND id = ?',
+                     [(kind, g, record['id']) for g in old - new])
+    conn.executemany('INSERT OR IGNORE INTO search_grams (kind, gram, id) VALUES (?, ?, ?)',
+                     [(kind, g, record['id']) for g in new - old])
+    conn.execute('INSERT OR REPLACE INTO search_docs (kind, id, fields) VALUES (?, ?, ?)',
+                 (kind, record['id'], joined))
+
+
+def _unindex_search(conn: sqlite3.Connection, kind: str, record_id: str):
+    conn.execute('DELETE FROM search_grams WHERE kind = ? AND id = ?', (kind, record_id))
+    conn.execute('DELETE FROM search_docs WHERE kind = ? AND id = ?', (kind, record_id))
+
+
+def _search_rank(query: str, fields: List[str]) -> Optional[tuple]:
+    """Sort key of a match (exact > prefix > word start > substring, then field order), None if no match."""
+    best = None
+    for position, field in enumerate(fields):
+        at = field.find(query)
+        if at < 0:
+            continue
+        if field == query:
+            kind = 0
+        elif at == 0:
+            kind = 1
+        elif re.search(r'(?<!\w)' + re.escape(query), field):
+            kind = 2
+        else:
+            kind = 3
+        key = (kind, position, len(field))
+        if best is None or key < best:
+            best = key
+    return best
+
+
+def _search(kind: str, query: str, limit: int) -> List[str]:
+    """Ids of the best `limit` matches of `query`, best first."""
+    query = _normalize_search(query)
+    conn = _conn()
+    if len(query) >= 3:
+        grams = sorted({query[i:i + 3] for i in range(len(query) - 2)})
+        candidates = conn.execute(
+            'SELECT d.id, d.fields FROM search_docs d WHERE d.kind = ? AND d.id IN ('
+            ' SELECT id FROM search_grams WHERE kind = ? AND gram IN (%s)'
+            ' GROUP BY id HAVING COUNT(*) = ?)' % ','.join('?' * len(grams)),
+            (kind, kind, *grams, len(grams)),
+        )
+    else:
+        candidates = conn.execute(
+            'SELECT d.id, d.fields FROM search_docs d WHERE d.kind = ? AND d.id IN ('
+            ' SELECT id FROM search_grams WHERE kind = ? AND gram >= ? AND gram < ?)',
+            (kind, kind, query, query + '\U0010ffff'),
+        )
+    ranked = []
+    for record_id, fields in candidates:
+        key = _search_rank(query, fields.split('\x1f'))
+        if key is not None:
+            ranked.append((key, record_id))
+    return [record_id for _, record_id in heapq.nsmallest(limit, ranked)]
+
+
+def _rows_by_id(sql: str, ids: List[str]) -> List[dict]:
+    """Records for `ids` (a query with one %s placeholder list), in the order of `ids`."""
+    if not ids:
+        return []
+    rows = {row[0]: json.loads(row[1]) for row in _conn().execute(sql % ','.join('?' * len(ids)), ids)}
+    return [rows[i] for i in ids if i in rows]
+
+
+def _conn() -> sqlite3.Connection:
+    """Per-thread connection to DB_FILE (schema created/migrated on first use)."""
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    path = str(DB_FILE)
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conns[path] = conn
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                _init_db(conn)
+                _schema_ready.add(path)
+    return conn
+
+
+def _init_db(conn: sqlite3.Connection):
+    with conn:
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS customers ('
+            ' id TEXT PRIMARY KEY, email TEXT, status TEXT, created_at TEXT, data TEXT NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS customers_email ON customers (email)')
+        conn.execute('CREATE INDEX IF NOT EXISTS customers_created ON customers (created_at)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS licenses ('
+            ' id TEXT PRIMARY KEY, license_key TEXT, hardware_id TEXT, customer_id TEXT,'
+            ' status TEXT, expiry_ts INTEGER, created_at TEXT,'
+            ' activation_count INTEGER NOT NULL DEFAULT 0, last_activation TEXT, data TEXT NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS licenses_key ON licenses (license_key)')
+        conn.execute('CREATE INDEX IF NOT EXISTS licenses_hardware ON licenses (hardware_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS licenses_customer ON licenses (customer_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS licenses_created ON licenses (created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS licenses_status_expiry ON licenses (status, expiry_ts)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS search_docs ('
+            ' kind TEXT, id TEXT, fields TEXT NOT NULL, PRIMARY KEY (kind, id)) WITHOUT ROWID'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS search_grams ('
+            ' kind TEXT, gram TEXT, id TEXT, PRIMARY KEY (kind, gram, id)) WITHOUT ROWID'
+        )
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'version'").fetchone():
+            return
+        conn.execute("INSERT INTO meta (key, value) VALUES ('version', '2.0')")
+        conn.execute("INSERT INTO meta (key, value) VALUES ('created_at', ?)", (datetime.now().isoformat(),))
+        conn.execute("INSERT INTO meta (key, value) VALUES ('total_revenue', 0)")
+        conn.execute("INSERT INTO meta (key, value) VALUES ('total_activations', 0)")
+        conn.execute("INSERT INTO meta (key, value) VALUES ('stats_version', 0)")
+        # One-time migration from the old single-file JSON database
+        legacy = _read_legacy_db()
+        if legacy:
+            activations = _insert_db(conn, legacy)
+    if legacy:
+        _append_activations(activations)
+        try:
+            LEGACY_DB_FILE.replace(LEGACY_DB_FILE.with_name(LEGACY_DB_FILE.name + '.migrated'))
+        except OSError:
+            pass
+
+
+def _read_legacy_db() -> Optional[dict]:
+    try:
+        if LEGACY_DB_FILE.exists():
+            with open(LEGACY_DB_FILE, 'r', encoding='utf-8') as f:
                 return json.load(f)
     except Exception as e:
         print(f"Error loading database: {e}")
-    return default_db
+    return None
 
 
-def _save_db(db: dict) -> bool:
-    """Save database to file."""
+def _put_customer(conn: sqlite3.Connection, customer: dict):
+    conn.execute(
+        'INSERT INTO customers (id, email, status, created_at, data) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT(id) DO UPDATE SET email = excluded.email, status = excluded.status, '
+        'created_at = excluded.created_at, data = excluded.data',
+        (customer['id'], (customer.get('email') or '').lower(), customer.get('status'),
+         customer.get('created_at'), json.dumps(customer, ensure_ascii=False)),
+    )
+    _index_search(conn, 'customer', customer)
+
+
+def _put_license(conn: sqlite3.Connection, lic: dict):
+    # Activation counters are owned by record_activation: set on insert, never overwritten
+    conn.execute(
+        'INSERT INTO licenses (id, license_key, hardware_id, customer_id, status, expiry_ts, created_at,'
+        ' activation_count, last_activation, data) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT(id) DO UPDATE SET license_key = excluded.license_key, hardware_id = excluded.hardware_id, '
+        'customer_id = excluded.customer_id, status = excluded.status, expiry_ts = excluded.expiry_ts, '
+        'created_at = excluded.created_at, data = excluded.data',
+        (lic['id'], lic.get('license_key'), lic.get('hardware_id'), lic.get('customer_id'), lic.get('status'),
+         _expiry_ts(lic), lic.get('created_at'), int(lic.get('activations') or 0), lic.get('last_activation'),
+         json.dumps(lic, ensure_ascii=False)),
+    )
+    _index_search(conn, 'license', lic)
+
+
+def _rotate_activation_log():
+    for i in range(ACTIVATION_LOG_BACKUPS - 1, 0, -1):
+        older = ACTIVATION_LOG_FILE.with_name(f'{ACTIVATION_LOG_FILE.name}.{i}')
+        if older.exists():
+            older.replace(ACTIVATION_LOG_FILE.with_name(f'{ACTIVATION_LOG_FILE.name}.{i + 1}'))
+    if ACTIVATION_LOG_BACKUPS > 0:
+        ACTIVATION_LOG_FILE.replace(ACTIVATION_LOG_FILE.with_name(f'{ACTIVATION_LOG_FILE.name}.1'))
+    else:
+        ACTIVATION_LOG_FILE.unlink()
+
+
+def _append_activations(activations: List[dict]):
+    """Append activation records to the log (one JSON object per line)."""
+    if not activations:
+        return
+    data = ''.join(json.dumps(a, ensure_ascii=False) + '\n' for a in activations)
+    with _activation_log_lock:
+        with open(ACTIVATION_LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(data)
+            size = f.tell()
+        if size >= ACTIVATION_LOG_MAX_BYTES:
+            _rotate_activation_log()
+
+
+def _activation_log_files() -> List[Path]:
+    """Log segments, oldest first."""
+    files = [ACTIVATION_LOG_FILE.with_name(f'{ACTIVATION_LOG_FILE.name}.{i}')
+             for i in range(ACTIVATION_LOG_BACKUPS, 0, -1)]
+    files.append(ACTIVATION_LOG_FILE)
+    return [p for p in files if p.exists()]
+
+
+def _clear_activation_log():
+    with _activation_log_lock:
+        for path in _activation_log_files():
+            path.unlink()
+
+
+def _insert_db(conn: sqlite3.Connection, db: dict) -> List[dict]:
+    """Insert all records of a JSON-format database dict (replacing the counters).
+
+    Returns the activations; the caller appends them to the log once the transaction commits.
+    """
+    for customer in db.get('customers') or []:
+        _put_customer(conn, customer)
+    for lic in db.get('licenses') or []:
+        _put_license(conn, lic)
+    activations = db.get('activations') or []
+    stats = db.get('stats') or {}
+    conn.execute("UPDATE meta SET value = ? WHERE key = 'total_revenue'", (stats.get('total_revenue', 0),))
+    conn.execute("UPDATE meta SET value = ? WHERE key = 'total_activations'", (len(activations),))
+    if db.get('created_at'):
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'created_at'", (db['created_at'],))
+    return activations
+
+
+def _has_db() -> bool:
+    """Reads on a machine without any database must not create one (installer clients)."""
+    return str(DB_FILE) in _schema_ready or DB_FILE.exists() or LEGACY_DB_FILE.exists()
+
+
+def _rows(sql: str, params=()) -> List[dict]:
+    if not _has_db():
+        return []
+    return [json.loads(row[0]) for row in _conn().execute(sql, params)]
+
+
+def _row(sql: str, params=()) -> Optional[dict]:
+    if not _has_db():
+        return None
+    row = _conn().execute(sql, params).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _mutate_row(conn: sqlite3.Connection, table: str, record_id: str, mutate) -> Optional[dict]:
+    """Read, modify and write back one record (caller holds the write transaction)."""
+    put = _put_customer if table == 'customers' else _put_license
+    data = 'data' if table == 'customers' else _LICENSE_DATA
+    row = conn.execute(f'SELECT {data} FROM {table} WHERE id = ?', (record_id,)).fetchone()
+    if not row:
+        return None
+    record = json.loads(row[0])
+    if mutate(conn, record) is False:
+        return None
+    put(conn, record)
+    return record
+
+
+def _update_record(table: str, record_id: str, mutate) -> Optional[dict]:
+    """Read, modify and write back one record inside one write transaction.
+
+    `mutate` returning False aborts without writing.
+    """
+    conn = _conn()
     try:
-        db['updated_at'] = datetime.now().isoformat()
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(db, f, indent=2, ensure_ascii=False)
-        return True
-    except Exception as e:
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            return _mutate_row(conn, table, record_id, mutate)
+    except sqlite3.Error as e:
         print(f"Error saving database: {e}")
-        return False
+        return None
 
 
-def _update_stats(db: dict):
-    """Update statistics."""
-    now = datetime.now()
-    
-    db['stats']['total_customers'] = len(db['customers'])
-    db['stats']['total_licenses'] = len(db['licenses'])
-    
-    active = 0
-    expired = 0
-    for lic in db['licenses']:
-        if lic.get('validity_hours') == -1:
-            active += 1
-        elif lic.get('status') == 'revoked':
-            expired += 1
-        else:
-            try:
-                expiry = datetime.fromisoformat(lic['expiry_iso'])
-                if now < expiry:
-                    active += 1
-                else:
-                    expired += 1
-            except:
-                pass
-    
-    db['stats']['active_licenses'] = active
-    db['stats']['expired_licenses'] = expired
+def _meta(key: str, default=None):
+    row = _conn().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else default
+
+
+# Statistics are kept in memory: counters plus a sorted list of the expiry epochs of
+# non-revoked licenses, so active/expired is a bisect against "now". The snapshot is
+# tagged with meta.stats_version; writes that change stats bump it and patch the
+# snapshot in place, and a version written by another process forces a rebuild.
+_stats_lock = threading.RLock()
+_stats = {'version': None, 'customers': 0, 'licenses': 0, 'revoked': 0, 'expiries': []}
+
+
+def _stats_version(conn: sqlite3.Connection):
+    return conn.execute("SELECT value FROM meta WHERE key = 'stats_version'").fetchone()[0]
+
+
+def _rebuild_stats(conn: sqlite3.Connection):
+    expiries = []
+    revoked = 0
+    for status, expiry_ts in conn.execute('SELECT status, expiry_ts FROM licenses'):
+        if status == 'revoked':
+            revoked += 1
+        elif expiry_ts is not None:
+            expiries.append(expiry_ts)
+    expiries.sort()
+    _stats.update(
+        version=_stats_version(conn),
+        customers=conn.execute('SELECT COUNT(*) FROM customers').fetchone()[0],
+        licenses=conn.execute('SELECT COUNT(*) FROM licenses').fetchone()[0],
+        revoked=revoked,
+        expiries=expiries,
+    )
+
+
+class _StatsDelta:
+    """Changes a write transaction makes to the statistics."""
+
+    def __init__(self):
+        self.customers = 0
+        self.licenses = 0
+        self.revoked = 0
+        self.added = []     # expiry epochs entering the non-revoked set
+        self.rebuild = False  # set by bulk changes: drop the snapshot instead of patching it
+        self.removed = []   # expiry epochs leaving it
+
+    def add_license(self, lic: dict):
+        self.licenses += 1
+        self.track(None, lic)
+
+    def track(self, before: Optional[dict], after: Optional[dict]):
+        """Record a license going from `before` to `after` (None = absent)."""
+        for lic, sign in ((before, -1), (after, 1)):
+            if lic is None:
+                continue
+            if lic.get('status') == 'revoked':
+                self.revoked += sign
+            else:
+                ts = _expiry_ts(lic)
+                if ts is not None:
+                    (self.added if sign > 0 else self.removed).append(ts)
+
+
+@contextmanager
+def _stats_transaction():
+    """Write transaction yielding (conn, delta); the delta is applied to the stats snapshot on commit."""
+    delta = _StatsDelta()
+    with _stats_lock:
+        conn = _conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            in_sync = _stats['version'] is not None and _stats['version'] == _stats_version(conn)
+            yield conn, delta
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'stats_version'")
+            version = _stats_version(conn)
+        if not in_sync or delta.rebuild:
+            _stats['version'] = None
+            return
+        _stats['customers'] += delta.customers
+        _stats['licenses'] += delta.licenses
+        _stats['revoked'] += delta.revoked
+        expiries = _stats['expiries']
+        for ts in delta.removed:
+            i = bisect.bisect_left(expiries, ts)
+            if i < len(expiries) and expiries[i] == ts:
+                del expiries[i]
+        for ts in delta.added:
+            bisect.insort(expiries, ts)
+        _stats['version'] = version
+
+
+def _update_stats(conn: sqlite3.Connection) -> dict:
+    """Current statistics in O(log n) (rebuilt only if another process changed the data)."""
+    with _stats_lock:
+        if _stats['version'] is None or _stats['version'] != _stats_version(conn):
+            _rebuild_stats(conn)
+        now = int(datetime.now().timestamp())
+        expiries = _stats['expiries']
+        expired = bisect.bisect_right(expiries, now)  # expiry <= now
+        return {
+            'total_customers': _stats['customers'],
+            'total_licenses': _stats['licenses'],
+            'active_licenses': len(expiries) - expired,
+            'expired_licenses': expired + _stats['revoked'],
+            'total_revenue': _meta('total_revenue', 0),
+        }
 
 
 # ============ CUSTOMER MANAGEMENT ============
@@ -90,8 +503,6 @@ def _update_stats(db: dict):
 def create_customer(name: str, email: str = '', phone: str = '', 
                    company: str = '', notes: str = '') -> dict:
     """Create a new customer."""
-    db = _load_db()
-    
     # Generate unique customer ID
     customer_id = f"CUS-{uuid.uuid4().hex[:8].upper()}"
     
@@ -107,35 +518,29 @@ def create_customer(name: str, email: str = '', phone: str = '',
         'status': 'active'  # active, suspended, deleted
     }
     
-    db['customers'].append(customer)
-    _update_stats(db)
-    _save_db(db)
+    with _stats_transaction() as (conn, delta):
+        _put_customer(conn, customer)
+        delta.customers += 1
     
     return customer
 
 
 def get_customer(customer_id: str) -> Optional[dict]:
     """Get customer by ID."""
-    db = _load_db()
-    for customer in db['customers']:
-        if customer['id'] == customer_id:
-            return customer
-    return None
+    return _row('SELECT data FROM customers WHERE id = ?', (customer_id,))
 
 
 def get_customer_by_email(email: str) -> Optional[dict]:
     """Get customer by email."""
-    db = _load_db()
-    for customer in db['customers']:
-        if customer.get('email', '').lower() == email.lower():
-            return customer
-    return None
+    return _row('SELECT data FROM customers WHERE email = ? ORDER BY rowid LIMIT 1', ((email or '').lower(),))
 
 
 def list_customers(include_deleted: bool = False) -> List[dict]:
     """List all customers with license counts."""
-    db = _load_db()
-    customers = db['customers'] if include_deleted else [c for c in db['customers'] if c.get('status') != 'deleted']
+    if include_deleted:
+        customers = _rows('SELECT data FROM customers ORDER BY rowid')
+    else:
+        customers = _rows("SELECT data FROM customers WHERE status IS NOT 'deleted' ORDER BY rowid")
     
     # Add license count for each customer
     for customer in customers:
@@ -146,38 +551,35 @@ def list_customers(include_deleted: bool = False) -> List[dict]:
 
 def update_customer(customer_id: str, updates: dict = None, **kwargs) -> Optional[dict]:
     """Update customer details. Returns updated customer or None if not found."""
-    db = _load_db()
     # Merge updates dict and kwargs
     if updates is None:
         updates = kwargs
     else:
         updates.update(kwargs)
     
-    for customer in db['customers']:
-        if customer['id'] == customer_id:
-            for key, value in updates.items():
-                if key in ['name', 'email', 'phone', 'company', 'notes', 'status']:
-                    customer[key] = value
-            customer['updated_at'] = datetime.now().isoformat()
-            _save_db(db)
-            return customer
-    return None
+    def _apply(_conn, customer):
+        for key, value in updates.items():
+            if key in ['name', 'email', 'phone', 'company', 'notes', 'status']:
+                customer[key] = value
+        customer['updated_at'] = datetime.now().isoformat()
+    
+    return _update_record('customers', customer_id, _apply)
 
 
 def delete_customer(customer_id: str, hard_delete: bool = False) -> bool:
     """Delete a customer (soft delete by default)."""
-    db = _load_db()
-    for i, customer in enumerate(db['customers']):
-        if customer['id'] == customer_id:
-            if hard_delete:
-                db['customers'].pop(i)
-            else:
-                customer['status'] = 'deleted'
-                customer['deleted_at'] = datetime.now().isoformat()
-            _update_stats(db)
-            _save_db(db)
-            return True
-    return False
+    if hard_delete:
+        with _stats_transaction() as (conn, delta):
+            deleted = conn.execute('DELETE FROM customers WHERE id = ?', (customer_id,)).rowcount
+            _unindex_search(conn, 'customer', customer_id)
+            delta.customers -= deleted
+        return deleted > 0
+    
+    def _soft_delete(_conn, customer):
+        customer['status'] = 'deleted'
+        customer['deleted_at'] = datetime.now().isoformat()
+    
+    return _update_record('customers', customer_id, _soft_delete) is not None
 
 
 # ============ LICENSE MANAGEMENT ============
@@ -188,8 +590,6 @@ def create_license(hardware_id: str, validity_hours: int,
                   notes: str = '', customer_name: str = '',
                   user_id: Optional[str] = None) -> dict:
     """Create a new license record."""
-    db = _load_db()
-    
     # Generate unique license ID
     license_id = f"LIC-{uuid.uuid4().hex[:8].upper()}"
     
@@ -237,102 +637,154 @@ def create_license(hardware_id: str, validity_hours: int,
         'last_activation': None
     }
     
-    db['licenses'].append(license_record)
-    
-    # Link to customer if provided
-    if customer_id:
-        for customer in db['customers']:
-            if customer['id'] == customer_id:
+    with _stats_transaction() as (conn, delta):
+        _put_license(conn, license_record)
+        delta.add_license(license_record)
+        
+        # Link to customer if provided
+        if customer_id:
+            row = conn.execute('SELECT data FROM customers WHERE id = ?', (customer_id,)).fetchone()
+            if row:
+                customer = json.loads(row[0])
                 customer['licenses'].append(license_id)
-                break
-    
-    # Update revenue
-    db['stats']['total_revenue'] = db['stats'].get('total_revenue', 0) + price
-    
-    _update_stats(db)
-    _save_db(db)
+                _put_customer(conn, customer)
+        
+        # Update revenue
+        conn.execute("UPDATE meta SET value = value + ? WHERE key = 'total_revenue'", (price,))
+    _schedule_expiry(conn)
     
     return license_record
 
 
 def get_license(license_id: str) -> Optional[dict]:
     """Get license by ID."""
-    db = _load_db()
-    for lic in db['licenses']:
-        if lic['id'] == license_id:
-            return lic
-    return None
+    return _row(f'SELECT {_LICENSE_DATA} FROM licenses WHERE id = ?', (license_id,))
 
 
 def get_license_by_key(license_key: str) -> Optional[dict]:
     """Get license by license key."""
-    db = _load_db()
-    for lic in db['licenses']:
-        if lic.get('license_key') == license_key:
-            return lic
-    return None
+    return _row(f'SELECT {_LICENSE_DATA} FROM licenses WHERE license_key = ? ORDER BY rowid LIMIT 1', (license_key,))
 
 
 def get_licenses_by_hardware(hardware_id: str) -> List[dict]:
     """Get all licenses for a hardware ID."""
-    db = _load_db()
-    return [lic for lic in db['licenses'] if lic['hardware_id'] == hardware_id]
+    return _rows(f'SELECT {_LICENSE_DATA} FROM licenses WHERE hardware_id = ? ORDER BY rowid', (hardware_id,))
 
 
 def get_licenses_by_customer(customer_id: str) -> List[dict]:
     """Get all licenses for a customer."""
-    db = _load_db()
-    return [lic for lic in db['licenses'] if lic.get('customer_id') == customer_id]
+    return _rows(f'SELECT {_LICENSE_DATA} FROM licenses WHERE customer_id = ? ORDER BY rowid', (customer_id,))
+
+
+# Active licenses move to 'expired' once, when they expire: a timer armed for the
+# earliest active expiry (licenses_status_expiry index) runs expire_due_licenses.
+# The wait is capped so licenses written by other processes are picked up too.
+# The timer only runs once a server entry point calls start_expiry_scheduler
+# (ui_server does at startup); plain importers such as license_manager never arm it.
+EXPIRY_CHECK_MAX_INTERVAL = 3600
+_expiry_lock = threading.Lock()
+_expiry_timer = None
+_expiry_due = None
+_expiry_scheduler_started = False
+
+
+def expire_due_licenses(now: Optional[int] = None) -> int:
+    """Mark active licenses whose expiry has passed as expired; returns how many changed.
+
+    Licenses whose expiry cannot be parsed (expiry_ts NULL) count as expired,
+    except lifetime ones (validity_hours -1).
+    """
+    if now is None:
+        now = int(datetime.now().timestamp())
+    conn = _conn()
+    with conn:
+        return conn.execute(
+            "UPDATE licenses SET status = 'expired', data = json_set(data, '$.status', 'expired') "
+            "WHERE status = 'active' AND (expiry_ts <= ? OR (expiry_ts IS NULL"
+            " AND COALESCE(json_extract(data, '$.validity_hours'), 0) != -1))",
+            (now,),
+        ).rowcount
+
+
+def start_expiry_scheduler():
+    """Expire overdue licenses and keep the expiry timer armed from now on (idempotent)."""
+    global _expiry_scheduler_started
+    with _expiry_lock:
+        if _expiry_scheduler_started:
+            return
+        _expiry_scheduler_started = True
+    expire_due_licenses()
+    _schedule_expiry(_conn())
+
+
+def _schedule_expiry(conn: sqlite3.Connection):
+    """Arm the expiry timer for the next active license expiry (if sooner than the armed one)."""
+    global _expiry_timer, _expiry_due
+    if not _expiry_scheduler_started:
+        return
+    next_ts = conn.execute("SELECT MIN(expiry_ts) FROM licenses WHERE status = 'active'").fetchone()[0]
+    now = datetime.now().timestamp()
+    due = now + EXPIRY_CHECK_MAX_INTERVAL
+    if next_ts is not None:
+        due = min(due, next_ts + 1)
+    with _expiry_lock:
+        if _expiry_timer is not None and _expiry_due <= due:
+            return
+        if _expiry_timer is not None:
+            _expiry_timer.cancel()
+        _expiry_timer = threading.Timer(max(0.0, due - now), _expiry_tick)
+        _expiry_timer.daemon = True
+        _expiry_due = due
+        _expiry_timer.start()
+
+
+def _expiry_tick():
+    global _expiry_timer
+    with _expiry_lock:
+        _expiry_timer = None
+    try:
+        expire_due_licenses()
+        _schedule_expiry(_conn())
+    except sqlite3.Error as e:
+        print(f"Error expiring licenses: {e}")
 
 
 def list_licenses(status: Optional[str] = None) -> List[dict]:
-    """List all licenses, optionally filtered by status."""
-    db = _load_db()
-    licenses = db['licenses']
-    
-    # Update status based on expiry
-    now = datetime.now()
-    for lic in licenses:
-        if lic.get('status') != 'revoked':
-            if lic.get('validity_hours') == -1:
-                lic['status'] = 'active'
-            else:
-                try:
-                    expiry = datetime.fromisoformat(lic['expiry_iso'])
-                    lic['status'] = 'active' if now < expiry else 'expired'
-                except:
-                    pass
-    
+    """List all licenses, optionally filtered by status (in expiry order)."""
     if status:
-        return [lic for lic in licenses if lic.get('status') == status]
-    return licenses
+        return _rows(f'SELECT {_LICENSE_DATA} FROM licenses WHERE status = ? ORDER BY expiry_ts', (status,))
+    return _rows(f'SELECT {_LICENSE_DATA} FROM licenses ORDER BY rowid')
 
 
 def revoke_license(license_id: str, reason: str = '') -> bool:
     """Revoke a license and add to blacklist."""
-    db = _load_db()
-    for lic in db['licenses']:
-        if lic['id'] == license_id:
-            lic['status'] = 'revoked'
-            lic['revoked_at'] = datetime.now().isoformat()
-            lic['revoke_reason'] = reason
-            _update_stats(db)
-            _save_db(db)
-            
-            # Add to blacklist so client-side check also fails
-            if BLACKLIST_ENABLED:
-                license_key = lic.get('license_key', '')
-                hardware_id = lic.get('hardware_id', '')
-                add_to_blacklist(license_key, hardware_id, reason)
-            
-            return True
-    return False
+    def _revoke(_conn, lic):
+        before = dict(lic)
+        lic['status'] = 'revoked'
+        lic['revoked_at'] = datetime.now().isoformat()
+        lic['revoke_reason'] = reason
+        delta.track(before, lic)
+    
+    try:
+        with _stats_transaction() as (conn, delta):
+            lic = _mutate_row(conn, 'licenses', license_id, _revoke)
+    except sqlite3.Error as e:
+        print(f"Error saving database: {e}")
+        return False
+    if lic is None:
+        return False
+    
+    # Add to blacklist so client-side check also fails
+    if BLACKLIST_ENABLED:
+        license_key = lic.get('license_key', '')
+        hardware_id = lic.get('hardware_id', '')
+        add_to_blacklist(license_key, hardware_id, reason)
+    
+    return True
 
 
 def record_activation(license_id: str, hardware_id: str, ip_address: str = '') -> bool:
     """Record a license activation."""
-    db = _load_db()
-    
     activation = {
         'license_id': license_id,
         'hardware_id': hardware_id,
@@ -340,16 +792,15 @@ def record_activation(license_id: str, hardware_id: str, ip_address: str = '') -
         'activated_at': datetime.now().isoformat()
     }
     
-    db['activations'].append(activation)
-    
-    # Update license activation count
-    for lic in db['licenses']:
-        if lic['id'] == license_id:
-            lic['activations'] = lic.get('activations', 0) + 1
-            lic['last_activation'] = datetime.now().isoformat()
-            break
-    
-    _save_db(db)
+    # O(1): one log append plus in-place counter updates (no record rewrite)
+    _append_activations([activation])
+    conn = _conn()
+    with conn:
+        conn.execute(
+            'UPDATE licenses SET activation_count = activation_count + 1, last_activation = ? WHERE id = ?',
+            (activation['activated_at'], license_id),
+        )
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'total_activations'")
     return True
 
 
@@ -357,99 +808,238 @@ def record_activation(license_id: str, hardware_id: str, ip_address: str = '') -
 
 def get_stats() -> dict:
     """Get database statistics."""
-    db = _load_db()
-    _update_stats(db)
-    return db['stats']
+    return _update_stats(_conn())
 
 
 def get_dashboard_data() -> dict:
     """Get data for admin dashboard."""
-    db = _load_db()
-    _update_stats(db)
+    conn = _conn()
     
     # Recent licenses (last 10)
-    recent_licenses = sorted(
-        db['licenses'], 
-        key=lambda x: x.get('created_at', ''), 
-        reverse=True
-    )[:10]
+    recent_licenses = _rows(f'SELECT {_LICENSE_DATA} FROM licenses ORDER BY created_at DESC LIMIT 10')
     
     # Recent customers (last 10)
-    recent_customers = sorted(
-        db['customers'], 
-        key=lambda x: x.get('created_at', ''), 
-        reverse=True
-    )[:10]
+    recent_customers = _rows('SELECT data FROM customers ORDER BY created_at DESC LIMIT 10')
     
     return {
-        'stats': db['stats'],
+        'stats': _update_stats(conn),
         'recent_licenses': recent_licenses,
         'recent_customers': recent_customers,
-        'total_activations': len(db['activations'])
+        'total_activations': _meta('total_activations', 0)
     }
 
 
 # ============ SEARCH ============
 
-def search_customers(query: str) -> List[dict]:
-    """Search customers by name, email, phone, or company."""
-    db = _load_db()
-    query = query.lower()
-    results = []
-    
-    for customer in db['customers']:
-        if customer.get('status') == 'deleted':
-            continue
-        if (query in customer.get('name', '').lower() or
-            query in customer.get('email', '').lower() or
-            query in customer.get('phone', '').lower() or
-            query in customer.get('company', '').lower()):
-            results.append(customer)
-    
-    return results
+def search_customers(query: str, limit: int = SEARCH_LIMIT) -> List[dict]:
+    """Search customers by name, email, phone, or company (best matches first)."""
+    if not _has_db():
+        return []
+    if not _normalize_search(query):
+        return _rows("SELECT data FROM customers WHERE status IS NOT 'deleted' ORDER BY rowid LIMIT ?", (limit,))
+    # Over-fetch so soft-deleted customers don't eat into the limit
+    ids = _search('customer', query, limit * 2)
+    customers = _rows_by_id('SELECT id, data FROM customers WHERE id IN (%s)', ids)
+    return [c for c in customers if c.get('status') != 'deleted'][:limit]
 
 
-def search_licenses(query: str) -> List[dict]:
-    """Search licenses by hardware ID, customer ID, or license ID."""
-    db = _load_db()
-    query = query.lower()
-    results = []
-    
-    for lic in db['licenses']:
-        if (query in lic.get('hardware_id', '').lower() or
-            query in lic.get('id', '').lower() or
-            query in lic.get('customer_id', '').lower() if lic.get('customer_id') else False):
-            results.append(lic)
-    
-    return results
+def search_licenses(query: str, limit: int = SEARCH_LIMIT) -> List[dict]:
+    """Search licenses by hardware ID, customer ID, or license ID (best matches first)."""
+    if not _has_db():
+        return []
+    if not _normalize_search(query):
+        return _rows(f'SELECT {_LICENSE_DATA} FROM licenses ORDER BY rowid LIMIT ?', (limit,))
+    ids = _search('license', query, limit)
+    return _rows_by_id(f'SELECT id, {_LICENSE_DATA} FROM licenses WHERE id IN (%s)', ids)
 
 
 # ============ EXPORT/BACKUP ============
+#
+# Backups are NDJSON: a header line, then one line per record
+# ({"type": "customer" | "license" | "activation", "data": {...}}), written and
+# read in batches so memory stays bounded. ".gz" / ".zst" paths are compressed.
+# Imports commit batch by batch and keep a checkpoint in the meta table, so an
+# interrupted import of the same file resumes after the last committed batch.
 
-def export_database(filepath: str = None) -> str:
-    """Export database to JSON file."""
-    db = _load_db()
-    
+BACKUP_FORMAT = 'odoomaster-ndjson'
+BACKUP_BATCH_SIZE = 1000
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _backup_compression(filepath: str) -> str:
+    suffix = Path(filepath).suffix.lower()
+    return 'gz' if suffix == '.gz' else 'zst' if suffix in ('.zst', '.zstd') else ''
+
+
+def _open_backup(filepath: str, mode: str, compression: str = ''):
+    """Text stream for a backup file (when reading, compression is detected from the content)."""
+    if mode == 'r':
+        with open(filepath, 'rb') as f:
+            magic = f.read(4)
+        compression = 'gz' if magic.startswith(_GZIP_MAGIC) else 'zst' if magic == _ZSTD_MAGIC else ''
+    if compression == 'gz':
+        return gzip.open(filepath, mode + 't', encoding='utf-8', compresslevel=6)
+    if compression == 'zst':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError('zstandard is required for .zst backups. Install with: pip install zstandard')
+        raw = open(filepath, mode + 'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=3).stream_writer(raw)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(filepath, mode, encoding='utf-8')
+
+
+def _iter_batches(cursor, size: int):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def export_database(filepath: str = None, batch_size: int = BACKUP_BATCH_SIZE) -> str:
+    """Export database to an NDJSON backup file (gzip/zstd by suffix)."""
     if filepath is None:
-        filepath = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filepath = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson.gz"
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(db, f, indent=2, ensure_ascii=False)
+    part = f'{filepath}.part'
+    conn = _conn()
+    # One read transaction: a consistent snapshot even while writers continue (WAL)
+    conn.execute('BEGIN')
+    try:
+        with _open_backup(part, 'w', _backup_compression(filepath)) as out:
+            header = {
+                'type': 'header',
+                'format': BACKUP_FORMAT,
+                'version': _meta('version'),
+                'created_at': _meta('created_at'),
+                'exported_at': datetime.now().isoformat(),
+                'stats': get_stats(),
+            }
+            out.write(json.dumps(header, ensure_ascii=False) + '\n')
+            for kind, sql in (('customer', 'SELECT data FROM customers ORDER BY rowid'),
+                              ('license', f'SELECT {_LICENSE_DATA} FROM licenses ORDER BY rowid')):
+                for rows in _iter_batches(conn.execute(sql), batch_size):
+                    out.write(''.join(f'{{"type":"{kind}","data":{row[0]}}}\n' for row in rows))
+            with _activation_log_lock:
+                for path in _activation_log_files():
+                    with open(path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            if line.strip():
+                                out.write(f'{{"type":"activation","data":{line.strip()}}}\n')
+    except BaseException:
+        Path(part).unlink(missing_ok=True)
+        raise
+    finally:
+        conn.rollback()
     
+    os.replace(part, filepath)
     return filepath
 
 
-def import_database(filepath: str) -> bool:
-    """Import database from JSON file."""
+def _backup_signature(filepath: str) -> str:
+    st = os.stat(filepath)
+    return f'{os.path.abspath(filepath)}:{st.st_size}:{st.st_mtime_ns}'
+
+
+def _import_batch(records: List[tuple], header: Optional[dict], signature: str, line_no: int):
+    """Write one batch and its checkpoint in one transaction (header: first batch, replaces everything).
+
+    Activation log lines are only written after the transaction commits, so a
+    failed batch that is retried on resume does not log them twice.
+    """
+    activations = [data for kind, data in records if kind == 'activation']
+    with _stats_transaction() as (conn, delta):
+        delta.rebuild = True
+        if header is not None:
+            for table in ('customers', 'licenses', 'search_docs', 'search_grams'):
+                conn.execute(f'DELETE FROM {table}')
+            conn.execute("UPDATE meta SET value = 0 WHERE key = 'total_activations'")
+            stats = header.get('stats') or {}
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'total_revenue'", (stats.get('total_revenue', 0),))
+            if header.get('created_at'):
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'created_at'", (header['created_at'],))
+        for kind, data in records:
+            if kind == 'customer':
+                _put_customer(conn, data)
+            elif kind == 'license':
+                _put_license(conn, data)
+        conn.execute("UPDATE meta SET value = value + ? WHERE key = 'total_activations'", (len(activations),))
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('import_checkpoint', ?)",
+            (json.dumps({'source': signature, 'line': line_no}),),
+        )
+    if header is not None:
+        _clear_activation_log()
+    _append_activations(activations)
+
+
+def import_database(filepath: str, resume: bool = True, batch_size: int = BACKUP_BATCH_SIZE) -> bool:
+    """Import database from a backup file (replaces the current contents).
+    
+    Reads NDJSON backups (plain, gzip or zstd) in batches; an interrupted import
+    of the same file resumes from its last committed batch unless resume=False.
+    Legacy single-document JSON backups are still accepted.
+    """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            db = json.load(f)
-        return _save_db(db)
+        signature = _backup_signature(filepath)
+        checkpoint = json.loads(_meta('import_checkpoint') or 'null') if resume else None
+        done = checkpoint['line'] if checkpoint and checkpoint.get('source') == signature else 0
+        
+        with _open_backup(filepath, 'r') as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:  # an indented legacy document starts with a bare "{"
+                header = None
+            if not isinstance(header, dict) or header.get('type') != 'header':
+                f.seek(0)
+                return _import_legacy(json.load(f))
+            if header.get('format') != BACKUP_FORMAT:
+                raise ValueError(f"unknown backup format: {header.get('format')}")
+            
+            pending_header = header if done == 0 else None
+            records = []
+            line_no = 1
+            for line in f:
+                line_no += 1
+                if line_no <= done or not line.strip():
+                    continue
+                item = json.loads(line)
+                records.append((item['type'], item['data']))
+                if len(records) >= batch_size:
+                    _import_batch(records, pending_header, signature, line_no)
+                    pending_header = None
+                    records = []
+            if records or pending_header is not None:
+                _import_batch(records, pending_header, signature, line_no)
+        
+        with _conn() as conn:
+            conn.execute("DELETE FROM meta WHERE key = 'import_checkpoint'")
+        expire_due_licenses()
+        _schedule_expiry(conn)
+        return True
     except Exception as e:
         print(f"Error importing database: {e}")
         return False
 
 
+def _import_legacy(db: dict) -> bool:
+    """Import a pre-NDJSON backup (one JSON document)."""
+    with _stats_transaction() as (conn, delta):
+        delta.rebuild = True
+        for table in ('customers', 'licenses', 'search_docs', 'search_grams'):
+            conn.execute(f'DELETE FROM {table}')
+        activations = _insert_db(conn, db)
+    _clear_activation_log()
+    _append_activations(activations)
+    expire_due_licenses()
+    _schedule_expiry(conn)
+    return True
+
+
 # Test/Demo
 if __name__ == '__main__':
     print("=" * 60)
@@ -15,6 +15,10 @@ import json
 import os
 import platform
 import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -38,6 +42,42 @@ SECRET_KEY = b'OdooInstallerSecretKey2025'
 # If a public key is configured, legacy keys are disabled by default.
 ALLOW_LEGACY_HMAC_LICENSES = os.environ.get('ODOMASTER_ALLOW_LEGACY_LICENSE', '').strip() in ('1', 'true', 'True')
 
+# Memoised file reads and signature checks (license status is polled by the UI).
+# Files are keyed by (mtime, size) so an edited or replaced file is re-read.
+_file_cache = {}  # (path, parser) -> ((mtime_ns, size), value)
+_v2_validation_cache = {}  # (bundle hash, hardware_id, public key fingerprint) -> (ok, msg, expires_at)
+_V2_VALIDATION_CACHE_MAX = 64
+_cache_lock = threading.Lock()
+
+
+def _read_cached(path: Path, parse):
+    """Return parse(bytes) for `path`, re-reading only when the file changes.
+
+    Returns None if the file does not exist; parse errors propagate.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _file_cache.get((path, parse))
+        if cached and cached[0] == signature:
+            return cached[1]
+    value = parse(path.read_bytes())
+    with _cache_lock:
+        _file_cache[(path, parse)] = (signature, value)
+    return value
+
+
+def _parse_json(data: bytes):
+    return json.loads(data.decode('utf-8'))
+
+
+def _load_bundle_file(path: Path) -> Optional[dict]:
+    """Parsed license bundle JSON from `path` (shared, do not mutate)."""
+    return _read_cached(path, _parse_json)
+
 
 def _load_public_key_pem() -> Optional[bytes]:
     """Load PEM public key for verifying v2 license files.
@@ -50,8 +90,7 @@ def _load_public_key_pem() -> Optional[bytes]:
     if env_pem and env_pem.strip():
         return env_pem.strip().encode('utf-8')
     try:
-        if LICENSE_PUBLIC_KEY_FILE.exists():
-            return LICENSE_PUBLIC_KEY_FILE.read_bytes()
+        return _read_cached(LICENSE_PUBLIC_KEY_FILE, bytes)
     except Exception:
         pass
     return None
@@ -140,18 +179,26 @@ def _validate_v2_license_bundle(bundle: dict, hardware_id: str) -> Tuple[bool, s
     payload = dict(bundle)
     payload.pop('sig', None)
     message = _canonical_json_bytes(payload)
-    ok, msg = _verify_signature_rsa_pss_sha256(public_key_pem, message, str(signature))
+
+    # Signature, hardware binding and expiry parsing depend only on these three
+    # inputs, so they are verified once; expiry and revocation are checked every call.
+    cache_key = (
+        hashlib.sha256(message + b'\0' + str(signature).encode('utf-8')).hexdigest(),
+        hardware_id,
+        hashlib.sha256(public_key_pem).hexdigest(),
+    )
+    with _cache_lock:
+        cached = _v2_validation_cache.get(cache_key)
+    if cached is None:
+        cached = _verify_v2_payload(public_key_pem, message, str(signature), payload, hardware_id)
+        with _cache_lock:
+            if len(_v2_validation_cache) >= _V2_VALIDATION_CACHE_MAX:
+                _v2_validation_cache.clear()
+            _v2_validation_cache[cache_key] = cached
+    ok, msg, expires_at = cached
     if not ok:
         return False, msg, None
 
-    # Optional hardware binding
-    lic_hwid = (payload.get('hardware_id') or '').strip()
-    if lic_hwid and lic_hwid != hardware_id:
-        return False, 'این لایسنس برای این دستگاه معتبر نیست', None
-
-    expires_at = _parse_iso_datetime(payload.get('expires_at') or '')
-    if not expires_at:
-        return False, 'تاریخ انقضای لایسنس نامعتبر است', None
     if datetime.now() > expires_at:
         return False, f"لایسنس منقضی شده است (تاریخ انقضا: {payload.get('expires_at')})", None
 
@@ -164,22 +211,63 @@ def _validate_v2_license_bundle(bundle: dict, hardware_id: str) -> Tuple[bool, s
     return True, f'لایسنس معتبر است (باقیمانده: {days_left} روز)', payload
 
 
-def load_blacklist() -> list:
-    """Load the list of revoked license keys."""
+def _verify_v2_payload(public_key_pem: bytes, message: bytes, signature: str,
+                       payload: dict, hardware_id: str) -> Tuple[bool, str, Optional[datetime]]:
+    """Time-independent part of v2 validation: (ok, message, expires_at)."""
+    ok, msg = _verify_signature_rsa_pss_sha256(public_key_pem, message, signature)
+    if not ok:
+        return False, msg, None
+
+    # Optional hardware binding
+    lic_hwid = (payload.get('hardware_id') or '').strip()
+    if lic_hwid and lic_hwid != hardware_id:
+        return False, 'این لایسنس برای این دستگاه معتبر نیست', None
+
+    expires_at = _parse_iso_datetime(payload.get('expires_at') or '')
+    if not expires_at:
+        return False, 'تاریخ انقضای لایسنس نامعتبر است', None
+    return True, 'ok', expires_at
+
+
+def _key_hash(license_key: str) -> str:
+    """Hash under which a license key is stored in the blacklist/revocation list."""
+    return hashlib.sha256(license_key.encode()).hexdigest()[:32] if license_key else ''
+
+
+def _parse_blacklist(data: bytes) -> dict:
+    entries = json.loads(data.decode('utf-8'))
+    if not isinstance(entries, list):
+        entries = []
+    return {
+        'entries': entries,
+        'key_hashes': {e.get('key_hash') for e in entries if e.get('key_hash')},
+        'hardware_ids': {e.get('hardware_id') for e in entries if e.get('hardware_id')},
+    }
+
+
+_EMPTY_BLACKLIST = {'entries': [], 'key_hashes': set(), 'hardware_ids': set()}
+
+
+def _blacklist_sets() -> dict:
+    """In-memory blacklist (entries + lookup sets), reloaded when the file changes."""
     try:
-        if BLACKLIST_FILE.exists():
-            with open(BLACKLIST_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        return _read_cached(BLACKLIST_FILE, _parse_blacklist) or _EMPTY_BLACKLIST
     except Exception:
-        pass
-    return []
+        return _EMPTY_BLACKLIST
+
+
+def load_blacklist() -> list:
+    """Load the list of revoked license keys."""
+    return list(_blacklist_sets()['entries'])
 
 
 def save_blacklist(blacklist: list) -> bool:
-    """Save the blacklist to file."""
+    """Save the blacklist to file (temp file + rename, so readers never see half a file)."""
+    tmp = BLACKLIST_FILE.with_name(BLACKLIST_FILE.name + '.tmp')
     try:
-        with open(BLACKLIST_FILE, 'w', encoding='utf-8') as f:
+        with open(tmp, 'w', encoding='utf-8') as f:
             json.dump(blacklist, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, BLACKLIST_FILE)
         return True
     except Exception:
         return False
@@ -187,16 +275,15 @@ def save_blacklist(blacklist: list) -> bool:
 
 def add_to_blacklist(license_key: str, hardware_id: str = '', reason: str = '') -> bool:
     """Add a license key to the blacklist."""
-    blacklist = load_blacklist()
-    
     # Create a hash of the license key for comparison
-    key_hash = hashlib.sha256(license_key.encode()).hexdigest()[:32] if license_key else ''
+    key_hash = _key_hash(license_key)
     
     # Check if already in blacklist
-    for entry in blacklist:
-        if entry.get('key_hash') == key_hash or entry.get('hardware_id') == hardware_id:
-            return True  # Already blacklisted
+    sets = _blacklist_sets()
+    if (key_hash and key_hash in sets['key_hashes']) or (hardware_id and hardware_id in sets['hardware_ids']):
+        return True  # Already blacklisted
     
+    blacklist = load_blacklist()
     blacklist.append({
         'key_hash': key_hash,
         'hardware_id': hardware_id,
@@ -208,48 +295,296 @@ def add_to_blacklist(license_key: str, hardware_id: str = '', reason: str = '')
 
 
 def is_blacklisted(license_key: str = '', hardware_id: str = '') -> bool:
-    """Check if a license key or hardware ID is blacklisted."""
-    blacklist = load_blacklist()
-    key_hash = hashlib.sha256(license_key.encode()).hexdigest()[:32] if license_key else ''
+    """Check if a license key or hardware ID is blacklisted (local list or signed revocation list)."""
+    sets = _blacklist_sets()
+    key_hash = _key_hash(license_key)
     
-    for entry in blacklist:
-        if key_hash and entry.get('key_hash') == key_hash:
-            return True
-        if hardware_id and entry.get('hardware_id') == hardware_id:
-            return True
+    if key_hash and key_hash in sets['key_hashes']:
+        return True
+    if hardware_id and hardware_id in sets['hardware_ids']:
+        return True
     
-    return False
+    return is_revoked(license_key)
 
 
-def get_hardware_id() -> str:
-    """Generate a unique hardware ID based on machine characteristics."""
+# Signed revocation list published by the license server
+# (GET /api/licenses/revocations): {"v": 1, "issued_at": ..., "key_hashes": [sorted], "sig": ...},
+# signed with the same RSA-PSS key as v2 licenses.
+REVOCATION_LIST_FILE = Path(__file__).parent / '.license_revocations.json'
+
+
+def _verify_revocation_list(bundle: dict) -> Optional[dict]:
+    """Return the revocation payload if its signature checks out, else None."""
+    if not isinstance(bundle, dict) or int(bundle.get('v') or 0) != 1 or not bundle.get('sig'):
+        return None
+    public_key_pem = _load_public_key_pem()
+    if not public_key_pem:
+        return None
+    payload = dict(bundle)
+    signature = str(payload.pop('sig'))
+    ok, _msg = _verify_signature_rsa_pss_sha256(public_key_pem, _canonical_json_bytes(payload), signature)
+    return payload if ok else None
+
+
+def _parse_revocation_list(data: bytes) -> frozenset:
+    payload = _verify_revocation_list(json.loads(data.decode('utf-8')))
+    return frozenset(payload.get('key_hashes') or ()) if payload else frozenset()
+
+
+def is_revoked(license_key: str) -> bool:
+    """O(1) lookup in the signed revocation list (signature verified once per file change)."""
+    if not license_key:
+        return False
     try:
-        # Try to get motherboard serial (most reliable on Windows)
-        result = subprocess.run(
-            ['wmic', 'baseboard', 'get', 'serialnumber'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            if len(lines) > 1:
-                serial = lines[1].strip()
-                if serial and serial != 'SerialNumber':
-                    return hashlib.sha256(serial.encode()).hexdigest()[:16]
+        revoked = _read_cached(REVOCATION_LIST_FILE, _parse_revocation_list)
     except Exception:
-        pass
-    
-    # Fallback to MAC address + Computer name
+        return False
+    return bool(revoked) and _key_hash(license_key) in revoked
+
+
+def import_revocation_list(text: str) -> Tuple[bool, str]:
+    """Verify and store a revocation list downloaded from the server.
+
+    Lists older than the one already installed are rejected (no rollback).
+    """
+    try:
+        bundle = json.loads(text)
+    except Exception:
+        return False, 'فرمت لیست ابطال نامعتبر است'
+    payload = _verify_revocation_list(bundle)
+    if payload is None:
+        return False, 'امضای لیست ابطال نامعتبر است'
+    try:
+        current = _verify_revocation_list(_load_bundle_file(REVOCATION_LIST_FILE) or {})
+    except Exception:
+        current = None
+    if current and str(payload.get('issued_at') or '') < str(current.get('issued_at') or ''):
+        return False, 'لیست ابطال قدیمی‌تر از نسخه فعلی است'
     try:
-        mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff)
-                       for elements in range(0, 2*6, 2)][::-1])
-        computer_name = platform.node()
-        combined = f"{mac}-{computer_name}"
-        return hashlib.sha256(combined.encode()).hexdigest()[:16]
+        REVOCATION_LIST_FILE.write_text(json.dumps(bundle, ensure_ascii=False), encoding='utf-8')
     except Exception:
-        # Last resort: just use a fixed string (not recommended)
-        return hashlib.sha256(b'fallback-hardware-id').hexdigest()[:16]
+        return False, 'خطا در ذخیره لیست ابطال'
+    return True, f"{len(payload.get('key_hashes') or [])} لایسنس ابطال‌شده"
+
+
+# License server the revocation list is fetched from; refreshing is off when unset.
+LICENSE_SERVER_URL = os.environ.get('ODOMASTER_LICENSE_SERVER_URL', '').strip().rstrip('/')
+REVOCATION_REFRESH_INTERVAL = 6 * 3600  # seconds
+_revocation_refresh = {'next': 0.0, 'etag': ''}
+_revocation_refresh_lock = threading.Lock()
+
+
+def _fetch_revocation_list():
+    """Download the signed revocation list and import it (conditional on the last ETag)."""
+    headers = {'Accept': 'application/json'}
+    if _revocation_refresh['etag']:
+        headers['If-None-Match'] = f'"{_revocation_refresh["etag"]}"'
+    req = urllib.request.Request(f'{LICENSE_SERVER_URL}/api/licenses/revocations', headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            text = resp.read().decode('utf-8')
+            etag = (resp.headers.get('ETag') or '').strip('"')
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            print(f"[WARNING] Revocation list refresh failed: HTTP {e.code}")
+        return
+    except Exception as e:
+        print(f"[WARNING] Revocation list refresh failed: {e}")
+        return
+    ok, msg = import_revocation_list(text)
+    if ok:
+        _revocation_refresh['etag'] = etag
+    else:
+        print(f"[WARNING] Revocation list rejected: {msg}")
+
+
+def refresh_revocation_list(force: bool = False) -> bool:
+    """Fetch the server's revocation list in the background, at most once per
+    REVOCATION_REFRESH_INTERVAL. Returns True if a refresh was started.
+    """
+    if not LICENSE_SERVER_URL:
+        return False
+    now = time.time()
+    with _revocation_refresh_lock:
+        if not force and now < _revocation_refresh['next']:
+            return False
+        _revocation_refresh['next'] = now + REVOCATION_REFRESH_INTERVAL
+    threading.Thread(target=_fetch_revocation_list, name='revocation-refresh', daemon=True).start()
+    return True
+
+
+def _probe_windows_baseboard() -> Optional[str]:
+    """Motherboard serial via wmic (most reliable on Windows)."""
+    if platform.system() != 'Windows':
+        return None
+    result = subprocess.run(
+        ['wmic', 'baseboard', 'get', 'serialnumber'],
+        capture_output=True,
+        text=True,
+        timeout=5
+    )
+    if result.returncode == 0:
+        lines = result.stdout.strip().split('\n')
+        if len(lines) > 1:
+            serial = lines[1].strip()
+            if serial and serial != 'SerialNumber':
+                return serial
+    return None
+
+
+def _read_first_line(*paths: str) -> Optional[str]:
+    for path in paths:
+        try:
+            value = Path(path).read_text(encoding='utf-8', errors='ignore').strip()
+        except OSError:
+            continue
+        if value:
+            return value
+    return None
+
+
+def _probe_linux_machine_id() -> Optional[str]:
+    """systemd/dbus machine id (stable across NIC and hostname changes)."""
+    if platform.system() != 'Linux':
+        return None
+    return _read_first_line('/etc/machine-id', '/var/lib/dbus/machine-id')
+
+
+def _probe_linux_dmi() -> Optional[str]:
+    """Board serial / product UUID from DMI (usually root-readable only)."""
+    if platform.system() != 'Linux':
+        return None
+    return _read_first_line('/sys/class/dmi/id/board_serial', '/sys/class/dmi/id/product_uuid')
+
+
+def _probe_mac_hostname() -> Optional[str]:
+    """MAC address + computer name (fallback, changes with either)."""
+    mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff)
+                   for elements in range(0, 2*6, 2)][::-1])
+    computer_name = platform.node()
+    return f"{mac}-{computer_name}"
+
+
+# Tried in order; the first probe returning a non-empty value defines the
+# hardware ID. Use register_hardware_probe() to add platform-specific sources.
+HARDWARE_ID_PROBES = [
+    ('windows_baseboard', _probe_windows_baseboard),
+    ('linux_machine_id', _probe_linux_machine_id),
+    ('linux_dmi', _probe_linux_dmi),
+    ('mac_hostname', _probe_mac_hostname),
+]
+
+# The probe chain of earlier installers. Licenses bound to the ID it produced
+# (MAC + hostname on Linux) are still accepted, see _machine_hardware_ids().
+LEGACY_HARDWARE_ID_PROBES = (
+    ('windows_baseboard', _probe_windows_baseboard),
+    ('mac_hostname', _probe_mac_hostname),
+)
+
+# Opt-in: remember the ID across runs so process start does not spawn wmic either
+HARDWARE_ID_CACHE_FILE = Path(__file__).parent / '.hardware_id.json'
+PERSIST_HARDWARE_ID = os.environ.get('ODOMASTER_PERSIST_HARDWARE_ID', '').strip() in ('1', 'true', 'True')
+
+_hardware_id = None
+_legacy_hardware_id = None
+_hardware_id_lock = threading.Lock()
+
+
+def register_hardware_probe(name: str, probe, position: Optional[int] = None) -> None:
+    """Add a hardware ID probe (callable returning a raw identifier or None).
+
+    Probes are inserted before the MAC/hostname fallback unless `position` is given.
+    """
+    global _hardware_id
+    if position is None:
+        position = len(HARDWARE_ID_PROBES) - 1
+    HARDWARE_ID_PROBES.insert(position, (name, probe))
+    _hardware_id = None
+
+
+def _machine_signature() -> str:
+    """Cheap host fingerprint used to check that a persisted ID still belongs here."""
+    raw = '|'.join([platform.system(), platform.node(), str(uuid.getnode()), _read_first_line('/etc/machine-id') or ''])
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def _compute_hardware_id(probes=None) -> str:
+    for _name, probe in (HARDWARE_ID_PROBES if probes is None else probes):
+        try:
+            raw = probe()
+        except Exception:
+            continue
+        if raw:
+            return hashlib.sha256(raw.encode()).hexdigest()[:16]
+    # Last resort: just use a fixed string (not recommended)
+    return hashlib.sha256(b'fallback-hardware-id').hexdigest()[:16]
+
+
+def get_hardware_id() -> str:
+    """Generate a unique hardware ID based on machine characteristics.
+
+    Computed once per process (probes may spawn a subprocess).
+    """
+    global _hardware_id
+    if _hardware_id:
+        return _hardware_id
+    with _hardware_id_lock:
+        if _hardware_id:
+            return _hardware_id
+        signature = _machine_signature() if PERSIST_HARDWARE_ID else None
+        if signature:
+            try:
+                cached = json.loads(HARDWARE_ID_CACHE_FILE.read_text(encoding='utf-8'))
+                if cached.get('machine') == signature and cached.get('hardware_id'):
+                    _hardware_id = cached['hardware_id']
+                    return _hardware_id
+            except Exception:
+                pass
+        hardware_id = _compute_hardware_id()
+        if signature:
+            try:
+                HARDWARE_ID_CACHE_FILE.write_text(
+                    json.dumps({'hardware_id': hardware_id, 'machine': signature}), encoding='utf-8'
+                )
+            except Exception:
+                pass
+        _hardware_id = hardware_id
+        return _hardware_id
+
+
+def get_legacy_hardware_id() -> str:
+    """Hardware ID as computed by earlier installers (LEGACY_HARDWARE_ID_PROBES)."""
+    global _legacy_hardware_id
+    if _legacy_hardware_id:
+        return _legacy_hardware_id
+    with _hardware_id_lock:
+        if not _legacy_hardware_id:
+            _legacy_hardware_id = _compute_hardware_id(LEGACY_HARDWARE_ID_PROBES)
+        return _legacy_hardware_id
+
+
+def _machine_hardware_ids():
+    """Yield the hardware ID, then the legacy one if it differs.
+
+    The legacy ID is only computed when the caller asks for it, i.e. when a
+    license did not match the current ID.
+    """
+    current = get_hardware_id()
+    yield current
+    legacy = get_legacy_hardware_id()
+    if legacy != current:
+        yield legacy
+
+
+def _validate_v2_on_this_machine(bundle: dict) -> Tuple[bool, str, Optional[dict]]:
+    """Validate a v2 bundle against this machine (current or legacy hardware ID)."""
+    result = None
+    for hardware_id in _machine_hardware_ids():
+        attempt = _validate_v2_license_bundle(bundle, hardware_id)
+        if attempt[0]:
+            return attempt
+        result = result or attempt
+    return result
 
 
 def generate_license_key(hardware_id: str, expiry_days: int = 365) -> str:
@@ -362,8 +697,8 @@ def load_license() -> Tuple[bool, Optional[str], str]:
         # Prefer v2 cache
         if LICENSE_V2_FILE.exists():
             try:
-                bundle = json.loads(LICENSE_V2_FILE.read_text(encoding='utf-8'))
-                ok, msg, _payload = _validate_v2_license_bundle(bundle, get_hardware_id())
+                bundle = _load_bundle_file(LICENSE_V2_FILE)
+                ok, msg, _payload = _validate_v2_on_this_machine(bundle)
                 if ok:
                     return True, 'v2', msg
                 # If cache invalid, fall through and require re-activation.
@@ -379,7 +714,7 @@ def load_license() -> Tuple[bool, Optional[str], str]:
             try:
                 maybe = _try_load_license_bundle_from_text(p.read_text(encoding='utf-8'))
                 if maybe:
-                    ok, msg, payload = _validate_v2_license_bundle(maybe, get_hardware_id())
+                    ok, msg, payload = _validate_v2_on_this_machine(maybe)
                     if ok:
                         try:
                             LICENSE_V2_FILE.write_text(json.dumps(maybe, ensure_ascii=False, indent=2), encoding='utf-8')
@@ -398,7 +733,7 @@ def load_license() -> Tuple[bool, Optional[str], str]:
                 try:
                     maybe = _try_load_license_bundle_from_text(p.read_text(encoding='utf-8'))
                     if maybe:
-                        ok, msg, payload = _validate_v2_license_bundle(maybe, get_hardware_id())
+                        ok, msg, payload = _validate_v2_on_this_machine(maybe)
                         if ok:
                             try:
                                 LICENSE_V2_FILE.write_text(json.dumps(maybe, ensure_ascii=False, indent=2), encoding='utf-8')
@@ -411,22 +746,23 @@ def load_license() -> Tuple[bool, Optional[str], str]:
         if not LICENSE_FILE.exists():
             return False, None, 'لایسنس یافت نشد - لطفاً فعال‌سازی کنید'
         
-        # Read and decrypt
+        # Read and decrypt (the file is keyed with the hardware ID it was saved under)
         encrypted = base64.b64decode(LICENSE_FILE.read_bytes())
-        hardware_id = get_hardware_id()
-        
-        decrypted = ''.join([
-            chr(b ^ ord(hardware_id[i % len(hardware_id)]))
-            for i, b in enumerate(encrypted)
-        ])
-        
-        license_data = json.loads(decrypted)
-        license_key = license_data['key']
-        stored_hw_id = license_data['hardware_id']
-        
-        # Verify hardware ID hasn't changed
-        if stored_hw_id != hardware_id:
+        for hardware_id in _machine_hardware_ids():
+            decrypted = ''.join([
+                chr(b ^ ord(hardware_id[i % len(hardware_id)]))
+                for i, b in enumerate(encrypted)
+            ])
+            try:
+                license_data = json.loads(decrypted)
+            except ValueError:
+                continue
+            # Verify hardware ID hasn't changed
+            if isinstance(license_data, dict) and license_data.get('hardware_id') == hardware_id:
+                break
+        else:
             return False, None, 'تغییر سخت‌افزار تشخیص داده شد - لایسنس نامعتبر است'
+        license_key = license_data['key']
         
         # Validate license
         is_valid, message = validate_license_key(license_key, hardware_id)
@@ -454,7 +790,7 @@ def check_license() -> Tuple[bool, str]:
             return False, 'این لایسنس توسط مدیر سیستم لغو شده است'
 
         # Backward compatibility: if admin revoked the license before blacklist support
-        # existed, it may only be marked in the local database.
+        # existed, it may only be marked in the local database (indexed key lookup).
         try:
             from database_manager import get_license_by_key  # type: ignore
 
@@ -477,7 +813,7 @@ def activate_license(license_key: str) -> Tuple[bool, str]:
     # v2 JSON (license bundle pasted as text)
     bundle = _try_load_license_bundle_from_text(license_key)
     if bundle is not None:
-        ok, message, _payload = _validate_v2_license_bundle(bundle, hardware_id)
+        ok, message, _payload = _validate_v2_on_this_machine(bundle)
         if not ok:
             return False, message
         try:
@@ -505,6 +841,13 @@ def activate_license(license_key: str) -> Tuple[bool, str]:
     
     # Validate the license key cryptographically
     is_valid, message = validate_license_key(license_key, hardware_id)
+    if not is_valid:
+        # Keys issued for the legacy hardware ID of this machine still activate
+        legacy_id = get_legacy_hardware_id()
+        if legacy_id != hardware_id:
+            legacy_valid, legacy_message = validate_license_key(license_key, legacy_id)
+            if legacy_valid:
+                is_valid, message, hardware_id = True, legacy_message, legacy_id
     
     if is_valid:
         if save_license(license_key, hardware_id):
@@ -548,8 +891,8 @@ def get_license_info() -> dict:
     # v2 signed license
     if LICENSE_V2_FILE.exists():
         try:
-            bundle = json.loads(LICENSE_V2_FILE.read_text(encoding='utf-8'))
-            ok, _msg, payload = _validate_v2_license_bundle(bundle, hardware_id)
+            bundle = _load_bundle_file(LICENSE_V2_FILE)
+            ok, _msg, payload = _validate_v2_on_this_machine(bundle)
             if ok and payload:
                 info['format'] = 'v2'
                 info['plan'] = payload.get('plan')
@@ -97,6 +97,7 @@ def main() -> int:
         ".license_v2.json",
         ".license_db.json",
         ".license_blacklist.json",
+        ".license_revocations.json",
     }
 
     files_to_add: list[tuple[Path, str]] = []
@@ -13,6 +13,18 @@ Usage:
     --issued-to user@example.com \
     --plan professional
 
+Batch mode (bulk orders / renewals) signs one bundle per line of a JSON-lines
+file (keys: hardware_id, issued_to, plan, expires_at, license_id - all optional
+except expires_at, which may also come from --expires-at) into a directory,
+using a process pool across cores. license_id names the output file, so it
+must be unique and use only letters, digits, '_' and '-'; existing files are
+never overwritten:
+  python tools/issue_license.py \
+    --private-key ./license_private_key.pem \
+    --batch ./orders.jsonl \
+    --out ./licenses/ \
+    --workers 8
+
 The installer can validate this offline using license_public_key.pem.
 """
 
@@ -21,63 +33,170 @@ from __future__ import annotations
 import argparse
 import base64
 import json
+import os
+import re
 import secrets
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+try:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+    CRYPTO_AVAILABLE = True
+except ImportError:
+    CRYPTO_AVAILABLE = False
+
 
 def canonical_json_bytes(payload: dict) -> bytes:
     return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
 
 
+def build_payload(expires_at: str, hardware_id: str = '', issued_to: str = '',
+                  plan: str = 'professional', license_id: str = '') -> dict:
+    return {
+        'v': 2,
+        'license_id': (license_id or '').strip() or secrets.token_hex(12),
+        'plan': (plan or '').strip(),
+        'issued_to': (issued_to or '').strip(),
+        'hardware_id': (hardware_id or '').strip(),
+        'expires_at': (expires_at or '').strip(),
+        'issued_at': datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+        'nonce': secrets.token_hex(8),
+    }
+
+
+def sign_bundle(private_key, payload: dict) -> dict:
+    """Return `payload` plus its RSA-PSS(SHA256) signature."""
+    sig = private_key.sign(
+        canonical_json_bytes(payload),
+        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+        hashes.SHA256(),
+    )
+    bundle = dict(payload)
+    bundle['sig'] = base64.b64encode(sig).decode('utf-8')
+    return bundle
+
+
+# Each pool worker parses the key once, not once per bundle
+_worker_key = None
+
+
+def _init_worker(private_key_pem: bytes):
+    global _worker_key
+    _worker_key = load_pem_private_key(private_key_pem, password=None)
+
+
+def _sign_in_worker(payload: dict) -> dict:
+    return sign_bundle(_worker_key, payload)
+
+
+def sign_bundles(private_key_pem: bytes, payloads: list[dict], workers: int | None = None) -> list[dict]:
+    """Sign many payloads, in input order, spreading the RSA work over `workers` processes.
+
+    `workers` defaults to the CPU count; 1 (or a single payload) signs in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(payloads) <= 1:
+        private_key = load_pem_private_key(private_key_pem, password=None)
+        return [sign_bundle(private_key, p) for p in payloads]
+    chunksize = max(1, len(payloads) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(private_key_pem,)) as pool:
+        return list(pool.map(_sign_in_worker, payloads, chunksize=chunksize))
+
+
+# Batch license ids become file names in --out
+BATCH_LICENSE_ID_RE = re.compile(r'[A-Za-z0-9_-]+')
+
+
+def write_bundle(path: Path, bundle: dict, exclusive: bool = False):
+    """Write a bundle as JSON; with `exclusive`, fail if `path` already exists."""
+    with open(path, 'x' if exclusive else 'w', encoding='utf-8') as f:
+        f.write(json.dumps(bundle, ensure_ascii=False, indent=2))
+
+
+def load_batch(path: Path, default_expires_at: str, default_plan: str) -> list[dict]:
+    """Read a JSON-lines batch; license ids must be unique and safe as file names."""
+    payloads = []
+    seen = set()
+    for n, line in enumerate(path.read_text(encoding='utf-8').splitlines(), 1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        expires_at = row.get('expires_at') or default_expires_at
+        if not expires_at:
+            raise ValueError(f'{path}:{n}: expires_at is required')
+        payloads.append(build_payload(
+            expires_at,
+            hardware_id=row.get('hardware_id', ''),
+            issued_to=row.get('issued_to', ''),
+            plan=row.get('plan') or default_plan,
+            license_id=row.get('license_id', ''),
+        ))
+        license_id = payloads[-1]['license_id']
+        if not BATCH_LICENSE_ID_RE.fullmatch(license_id):
+            raise ValueError(f'{path}:{n}: license_id must match [A-Za-z0-9_-]+: {license_id!r}')
+        if license_id in seen:
+            raise ValueError(f'{path}:{n}: duplicate license_id {license_id!r}')
+        seen.add(license_id)
+    return payloads
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument('--private-key', required=True, help='Path to RSA private key PEM')
-    ap.add_argument('--out', required=True, help='Output license file path')
-    ap.add_argument('--expires-at', required=True, help='ISO datetime, e.g. 2026-12-26T00:00:00')
+    ap.add_argument('--out', required=True, help='Output license file path (directory in --batch mode)')
+    ap.add_argument('--expires-at', default='', help='ISO datetime, e.g. 2026-12-26T00:00:00')
     ap.add_argument('--hardware-id', default='', help='Optional HWID binding (recommended)')
     ap.add_argument('--issued-to', default='', help='Email/phone/customer id')
     ap.add_argument('--plan', default='professional', help='Plan id/name')
     ap.add_argument('--license-id', default='', help='Optional license id (defaults to random)')
+    ap.add_argument('--batch', default='', help='JSON-lines file with one license per line')
+    ap.add_argument('--workers', type=int, default=0, help='Signing processes for --batch (default: CPU count)')
     args = ap.parse_args()
 
-    try:
-        from cryptography.hazmat.primitives import hashes
-        from cryptography.hazmat.primitives.asymmetric import padding
-        from cryptography.hazmat.primitives.serialization import load_pem_private_key
-    except Exception:
+    if not CRYPTO_AVAILABLE:
         print('ERROR: cryptography is required. Install with: pip install cryptography')
         return 2
 
     priv_path = Path(args.private_key)
     out_path = Path(args.out)
-
-    private_key = load_pem_private_key(priv_path.read_bytes(), password=None)
-
-    license_id = args.license_id.strip() or secrets.token_hex(12)
-
-    payload = {
-        'v': 2,
-        'license_id': license_id,
-        'plan': args.plan.strip(),
-        'issued_to': args.issued_to.strip(),
-        'hardware_id': args.hardware_id.strip(),
-        'expires_at': args.expires_at.strip(),
-        'issued_at': datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
-        'nonce': secrets.token_hex(8),
-    }
-
-    message = canonical_json_bytes(payload)
-    sig = private_key.sign(
-        message,
-        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
-        hashes.SHA256(),
+    private_key_pem = priv_path.read_bytes()
+
+    if args.batch:
+        try:
+            payloads = load_batch(Path(args.batch), args.expires_at.strip(), args.plan.strip())
+        except ValueError as e:
+            print(f'ERROR: {e}')
+            return 2
+        out_path.mkdir(parents=True, exist_ok=True)
+        existing = [p['license_id'] for p in payloads if (out_path / f"{p['license_id']}.oml").exists()]
+        if existing:
+            print(f'ERROR: license files already exist in {out_path}: {", ".join(existing[:10])}')
+            return 2
+        bundles = sign_bundles(private_key_pem, payloads, workers=args.workers or None)
+        try:
+            for bundle in bundles:
+                write_bundle(out_path / f"{bundle['license_id']}.oml", bundle, exclusive=True)
+        except FileExistsError as e:
+            print(f'ERROR: license file already exists: {e.filename}')
+            return 2
+        print(f'Wrote {len(bundles)} license files to: {out_path}')
+        return 0
+
+    if not args.expires_at.strip():
+        ap.error('--expires-at is required')
+
+    private_key = load_pem_private_key(private_key_pem, password=None)
+    payload = build_payload(
+        args.expires_at,
+        hardware_id=args.hardware_id,
+        issued_to=args.issued_to,
+        plan=args.plan,
+        license_id=args.license_id,
     )
-
-    bundle = dict(payload)
-    bundle['sig'] = base64.b64encode(sig).decode('utf-8')
-
-    out_path.write_text(json.dumps(bundle, ensure_ascii=False, indent=2), encoding='utf-8')
+    write_bundle(out_path, sign_bundle(private_key, payload))
     print(f'Wrote license file: {out_path}')
     return 0
 
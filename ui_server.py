@@ -4,12 +4,14 @@ Lightweight local web UI for Odoo offline installer status and controls.
 No external Python packages required.
 """
 import http.server
-import socketserver
 import os
+import io
+import gzip
 import json
 import urllib.parse
 import subprocess
 import threading
+import select
 import socket
 import time
 import winreg
@@ -25,11 +27,12 @@ import webbrowser
 from pathlib import Path
 from typing import Optional
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 import json
 
 # Import license manager
 try:
-    from license_manager import check_license, activate_license, deactivate_license, get_license_info, get_hardware_id, generate_license_key
+    from license_manager import check_license, activate_license, deactivate_license, get_license_info, get_hardware_id, generate_license_key, refresh_revocation_list
     LICENSE_ENABLED = True
 except ImportError:
     LICENSE_ENABLED = False
@@ -78,6 +81,15 @@ CONFIG_FILE = BASE / 'installer_config.json'
 LICENSE_DB_FILE = BASE / '.license_db.json'
 
 PORT = int(os.environ.get('PORT', 5000))
+# HTTP worker threads; more connections than this wait in the queue
+UI_WORKERS = int(os.environ.get('ODOMASTER_UI_WORKERS', 16))
+# Idle keep-alive connections are closed after this many seconds, or at once
+# when connections are queued for a worker
+KEEPALIVE_TIMEOUT = float(os.environ.get('ODOMASTER_UI_KEEPALIVE', 5))
+KEEPALIVE_POLL_INTERVAL = 0.25
+# Static files worth compressing (web/ is served from disk)
+GZIP_TYPES = {'.html', '.js', '.css', '.json', '.svg', '.txt', '.map'}
+GZIP_MIN_SIZE = 1024
 
 
 # ============ ADMIN AUTH ============
@@ -321,7 +333,8 @@ try:
         create_customer, get_customer, list_customers, update_customer, delete_customer,
         create_license as db_create_license, get_license, list_licenses as db_list_licenses,
         get_licenses_by_customer, revoke_license, record_activation,
-        get_stats as db_get_stats, get_dashboard_data, search_customers, search_licenses
+        get_stats as db_get_stats, get_dashboard_data, search_customers, search_licenses,
+        start_expiry_scheduler
     )
     DATABASE_ENABLED = True
 except ImportError:
@@ -333,18 +346,36 @@ def _get_private_key_path() -> Path:
     """Get the path to the private key for license signing."""
     return _get_base_dir() / 'license_private_key.pem'
 
+_private_key_cache = {'signature': None, 'key': None}
+_private_key_lock = threading.Lock()
+
+
+def _load_private_key():
+    """Load the signing key once; re-read only when the PEM file changes."""
+    from cryptography.hazmat.primitives import serialization
+    
+    private_key_path = _get_private_key_path()
+    try:
+        st = private_key_path.stat()
+    except OSError:
+        raise FileNotFoundError(f"Private key not found: {private_key_path}")
+    signature = (str(private_key_path), st.st_mtime_ns, st.st_size)
+    
+    with _private_key_lock:
+        if _private_key_cache['signature'] != signature:
+            with open(private_key_path, 'rb') as f:
+                _private_key_cache['key'] = serialization.load_pem_private_key(f.read(), password=None)
+            _private_key_cache['signature'] = signature
+        return _private_key_cache['key']
+
+
 def _sign_license_v2(license_data: dict) -> str:
     """Sign license data using RSA-PSS and return base64-encoded signature."""
     try:
-        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives import hashes
         from cryptography.hazmat.primitives.asymmetric import padding
         
-        private_key_path = _get_private_key_path()
-        if not private_key_path.exists():
-            raise FileNotFoundError(f"Private key not found: {private_key_path}")
-        
-        with open(private_key_path, 'rb') as f:
-            private_key = serialization.load_pem_private_key(f.read(), password=None)
+        private_key = _load_private_key()
         
         # Create canonical JSON (sorted keys, no whitespace after separators)
         # MUST match _canonical_json_bytes in license_manager.py
@@ -1735,7 +1766,128 @@ def run_powershell_elevated_file_sync(ps1_path: Path, ps_args: Optional[list[str
     r = subprocess.run(['powershell.exe', '-NoProfile', '-Command', cmd], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     return r.returncode
 
+class RouteTable:
+    """Request routing: exact paths in a dict, path prefixes in a character trie.
+
+    `priority` prefixes win over everything (used to switch off whole trees);
+    otherwise an exact match wins, then the longest matching prefix.
+    """
+
+    def __init__(self, exact=None, prefixes=None, priority=None):
+        self.exact = dict(exact or {})
+        self._prefixes = {}
+        self._priority = {}
+        for prefix, handler in (prefixes or {}).items():
+            self._add(self._prefixes, prefix, handler)
+        for prefix, handler in (priority or {}).items():
+            self._add(self._priority, prefix, handler)
+
+    @staticmethod
+    def _add(trie, prefix, handler):
+        node = trie
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node[None] = handler
+
+    @staticmethod
+    def _longest(trie, path):
+        node, found = trie, None
+        for ch in path:
+            node = node.get(ch)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+    def resolve(self, path):
+        return (self._longest(self._priority, path)
+                or self.exact.get(path)
+                or self._longest(self._prefixes, path))
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """HTTP server handing connections to a fixed-size thread pool (queued when all workers are busy)."""
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=UI_WORKERS):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ui-http')
+        self._queued = 0  # accepted connections still waiting for a worker
+        self._queued_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._queued_lock:
+            self._queued += 1
+        self._pool.submit(self._process_request, request, client_address)
+
+    def wait_for_request(self, sock, timeout: float) -> bool:
+        """Wait for the next request on a keep-alive connection.
+
+        Returns False once `timeout` passes idle, or as soon as other
+        connections are queued, so the worker can be handed to them.
+        """
+        deadline = time.monotonic() + timeout
+        while not self._queued:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([sock], [], [], min(remaining, KEEPALIVE_POLL_INTERVAL))
+            if readable:
+                return True
+        return False
+
+    def _process_request(self, request, client_address):
+        with self._queued_lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+# Compressed copies of static files: {path: (mtime_ns, size, gzip bytes)}
+_gzip_cache = {}
+_gzip_cache_lock = threading.Lock()
+
+
+def _gzipped_file(path: Path) -> Optional[bytes]:
+    """Gzip body for a compressible static file (cached until the file changes)."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if st.st_size < GZIP_MIN_SIZE or path.suffix.lower() not in GZIP_TYPES:
+        return None
+    key = str(path)
+    with _gzip_cache_lock:
+        cached = _gzip_cache.get(key)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    body = gzip.compress(path.read_bytes(), compresslevel=6)
+    with _gzip_cache_lock:
+        _gzip_cache[key] = (st.st_mtime_ns, st.st_size, body)
+    return body
+
+
 class Handler(http.server.SimpleHTTPRequestHandler):
+    # Keep-alive: every response gets a Content-Length (see _buffered)
+    protocol_version = 'HTTP/1.1'
+    # Idle keep-alive connections give their worker back after this many seconds
+    timeout = KEEPALIVE_TIMEOUT
+
+    def handle(self):
+        """Serve requests until the client closes, idles out or the pool is needed elsewhere."""
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self.server.wait_for_request(self.connection, self.timeout):
+            self.handle_one_request()
+
     def end_headers(self):
         # Avoid stale dashboard assets/API responses due to browser caching.
         self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate, max-age=0')
@@ -1747,490 +1899,548 @@ class Handler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
         return super().end_headers()
 
+    def _buffered(self, handler, *args):
+        """Run a route handler with its output buffered, then send it with a Content-Length."""
+        wfile = self.wfile
+        self.wfile = buf = io.BytesIO()
+        try:
+            handler(self, *args)
+        except Exception:
+            self.close_connection = True
+            raise
+        finally:
+            self.wfile = wfile
+        data = buf.getvalue()
+        if not data:
+            self.close_connection = True
+            return
+        head, sep, body = data.partition(b'\r\n\r\n')
+        if sep and b'\r\ncontent-length:' not in head.lower():
+            data = head + b'\r\nContent-Length: %d' % len(body) + sep + body
+        wfile.write(data)
+
     def do_OPTIONS(self):
         """Handle CORS preflight requests for Hybrid mode"""
+        self._buffered(Handler._options)
+
+    def _options(self):
         self.send_response(200)
         self.end_headers()
 
     def do_GET(self):
         parsed = urllib.parse.urlparse(self.path)
+        handler = GET_ROUTES.resolve(parsed.path)
+        if handler is None:
+            return self._serve_static()
+        self._buffered(handler, parsed)
 
-        # ============ OFFLINE ADMIN (REMOVED) ============
-        if parsed.path.startswith('/api/admin/'):
-            self.send_response(404)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            self.wfile.write(json.dumps({'error': 'Offline admin is disabled'}).encode('utf-8'))
-            return
-        if parsed.path in ('/admin_login.html', '/admin_dashboard.html'):
-            self.send_response(404)
-            self.send_header('Content-Type','text/plain; charset=utf-8')
-            self.end_headers()
-            self.wfile.write('Offline admin is disabled'.encode('utf-8'))
-            return
+    def do_POST(self):
+        parsed = urllib.parse.urlparse(self.path)
+        content_length = int(self.headers.get('Content-Length', 0))
+        # Read the body up front so the connection stays in sync whatever the handler reads
+        rfile = self.rfile
+        self.rfile = io.BytesIO(rfile.read(content_length) if content_length > 0 else b'')
+        try:
+            handler = POST_ROUTES.resolve(parsed.path)
+            if handler is None:
+                # Fallback to GET handler for other POST requests
+                return self.do_GET()
+            self._buffered(handler, parsed, content_length)
+        finally:
+            self.rfile = rfile
 
-        # ============ USER AUTH (GOOGLE OAUTH) ============
-        if parsed.path == '/api/user/google/start':
-            self.send_response(302)
+    def do_DELETE(self):
+        parsed = urllib.parse.urlparse(self.path)
+        self._buffered(DELETE_ROUTES.resolve(parsed.path) or Handler._delete_not_found, parsed)
+
+    def _serve_static(self):
+        """Static web/ files, gzip-compressed for clients that accept it."""
+        path = Path(self.translate_path(self.path))
+        if path.is_dir() and urllib.parse.urlsplit(self.path).path.endswith('/'):
+            # Directory URLs serve their index file (same lookup as SimpleHTTPRequestHandler)
+            path = next((path / name for name in ('index.html', 'index.htm') if (path / name).is_file()), path)
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and path.is_file():
             try:
-                client_id = os.environ.get('GOOGLE_CLIENT_ID', '').strip()
-                redirect_uri = os.environ.get('GOOGLE_REDIRECT_URI', '').strip() or 'http://127.0.0.1:5000/api/user/google/callback'
-                if not client_id:
-                    # Redirect back with an error
-                    self.send_header('Location', '/user_login.html?err=google_not_configured')
-                    self.end_headers()
-                    return
+                body = _gzipped_file(path)
+            except OSError:
+                body = None
+            if body is not None:
+                self.send_response(200)
+                self.send_header('Content-Type', self.guess_type(str(path)))
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Vary', 'Accept-Encoding')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        return super().do_GET()
 
-                state = uuid.uuid4().hex
-                # Lightweight state store
-                try:
-                    tmp_state_file = BASE / '.google_oauth_state.json'
-                    states = []
-                    if tmp_state_file.exists():
-                        with open(tmp_state_file, 'r', encoding='utf-8') as f:
-                            states = json.load(f) or []
-                    states.insert(0, {'state': state, 'created_at': datetime.now().isoformat()})
-                    states = states[:50]
-                    with open(tmp_state_file, 'w', encoding='utf-8') as f:
-                        json.dump(states, f, indent=2, ensure_ascii=False)
-                except Exception:
-                    pass
+    # ============ OFFLINE ADMIN (REMOVED) ============
+    def _get_admin_disabled(self, parsed):
+        self.send_response(404)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(json.dumps({'error': 'Offline admin is disabled'}).encode('utf-8'))
 
-                params = {
-                    'client_id': client_id,
-                    'redirect_uri': redirect_uri,
-                    'response_type': 'code',
-                    'scope': 'openid email profile',
-                    'state': state,
-                    'prompt': 'select_account'
-                }
-                auth_url = 'https://accounts.google.com/o/oauth2/v2/auth?' + urllib.parse.urlencode(params)
-                self.send_header('Location', auth_url)
-            except Exception:
-                self.send_header('Location', '/user_login.html?err=google_failed')
-            self.end_headers()
-            return
+    def _get_admin_page_disabled(self, parsed):
+        self.send_response(404)
+        self.send_header('Content-Type','text/plain; charset=utf-8')
+        self.end_headers()
+        self.wfile.write('Offline admin is disabled'.encode('utf-8'))
 
-        if parsed.path == '/api/user/google/callback':
-            # Exchange code for tokens and create a local user session
-            q = urllib.parse.parse_qs(parsed.query)
-            code = (q.get('code', ['']) or [''])[0]
-            state = (q.get('state', ['']) or [''])[0]
+    # ============ USER AUTH (GOOGLE OAUTH) ============
+    def _get_user_google_start(self, parsed):
+        self.send_response(302)
+        try:
+            client_id = os.environ.get('GOOGLE_CLIENT_ID', '').strip()
+            redirect_uri = os.environ.get('GOOGLE_REDIRECT_URI', '').strip() or 'http://127.0.0.1:5000/api/user/google/callback'
+            if not client_id:
+                # Redirect back with an error
+                self.send_header('Location', '/user_login.html?err=google_not_configured')
+                self.end_headers()
+                return
 
+            state = uuid.uuid4().hex
+            # Lightweight state store
             try:
-                client_id = os.environ.get('GOOGLE_CLIENT_ID', '').strip()
-                client_secret = os.environ.get('GOOGLE_CLIENT_SECRET', '').strip()
-                redirect_uri = os.environ.get('GOOGLE_REDIRECT_URI', '').strip() or 'http://127.0.0.1:5000/api/user/google/callback'
-                if not client_id or not client_secret:
-                    self.send_response(302)
-                    self.send_header('Location', '/user_login.html?err=google_not_configured')
-                    self.end_headers()
-                    return
-
-                # Verify state (best-effort)
-                try:
-                    tmp_state_file = BASE / '.google_oauth_state.json'
-                    if tmp_state_file.exists():
-                        with open(tmp_state_file, 'r', encoding='utf-8') as f:
-                            states = json.load(f) or []
-                        if state and not any(s.get('state') == state for s in states):
-                            raise ValueError('invalid_state')
-                except Exception:
-                    pass
-
-                if not code:
-                    self.send_response(302)
-                    self.send_header('Location', '/user_login.html?err=google_no_code')
-                    self.end_headers()
-                    return
-
-                import urllib.request as urllib_request
-
-                token_body = urllib.parse.urlencode({
-                    'client_id': client_id,
-                    'client_secret': client_secret,
-                    'code': code,
-                    'grant_type': 'authorization_code',
-                    'redirect_uri': redirect_uri
-                }).encode('utf-8')
-
-                req = urllib_request.Request(
-                    'https://oauth2.googleapis.com/token',
-                    data=token_body,
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                    method='POST'
-                )
-
-                with urllib_request.urlopen(req, timeout=15) as resp:
-                    token_data = json.loads(resp.read().decode('utf-8'))
-
-                access_token = token_data.get('access_token', '')
-                if not access_token:
-                    raise ValueError('no_access_token')
-
-                # Fetch user info
-                ui_req = urllib_request.Request(
-                    'https://openidconnect.googleapis.com/v1/userinfo',
-                    headers={'Authorization': f'Bearer {access_token}'},
-                    method='GET'
-                )
-                with urllib_request.urlopen(ui_req, timeout=15) as resp:
-                    userinfo = json.loads(resp.read().decode('utf-8'))
+                tmp_state_file = BASE / '.google_oauth_state.json'
+                states = []
+                if tmp_state_file.exists():
+                    with open(tmp_state_file, 'r', encoding='utf-8') as f:
+                        states = json.load(f) or []
+                states.insert(0, {'state': state, 'created_at': datetime.now().isoformat()})
+                states = states[:50]
+                with open(tmp_state_file, 'w', encoding='utf-8') as f:
+                    json.dump(states, f, indent=2, ensure_ascii=False)
+            except Exception:
+                pass
 
-                email = userinfo.get('email', '')
-                name = userinfo.get('name', '')
-                google_sub = userinfo.get('sub', '')
+            params = {
+                'client_id': client_id,
+                'redirect_uri': redirect_uri,
+                'response_type': 'code',
+                'scope': 'openid email profile',
+                'state': state,
+                'prompt': 'select_account'
+            }
+            auth_url = 'https://accounts.google.com/o/oauth2/v2/auth?' + urllib.parse.urlencode(params)
+            self.send_header('Location', auth_url)
+        except Exception:
+            self.send_header('Location', '/user_login.html?err=google_failed')
+        self.end_headers()
 
-                from user_manager import create_or_link_google_user, public_user_view, create_user_token
-                user = create_or_link_google_user(email=email, name=name, google_sub=google_sub)
-                token = create_user_token(user['id'])
+    def _get_user_google_callback(self, parsed):
+        # Exchange code for tokens and create a local user session
+        q = urllib.parse.parse_qs(parsed.query)
+        code = (q.get('code', ['']) or [''])[0]
+        state = (q.get('state', ['']) or [''])[0]
 
-                # Put token in URL fragment so browser JS can store it
+        try:
+            client_id = os.environ.get('GOOGLE_CLIENT_ID', '').strip()
+            client_secret = os.environ.get('GOOGLE_CLIENT_SECRET', '').strip()
+            redirect_uri = os.environ.get('GOOGLE_REDIRECT_URI', '').strip() or 'http://127.0.0.1:5000/api/user/google/callback'
+            if not client_id or not client_secret:
                 self.send_response(302)
-                self.send_header('Location', f"/user_dashboard.html#token={urllib.parse.quote(token)}")
+                self.send_header('Location', '/user_login.html?err=google_not_configured')
                 self.end_headers()
                 return
+
+            # Verify state (best-effort)
+            try:
+                tmp_state_file = BASE / '.google_oauth_state.json'
+                if tmp_state_file.exists():
+                    with open(tmp_state_file, 'r', encoding='utf-8') as f:
+                        states = json.load(f) or []
+                    if state and not any(s.get('state') == state for s in states):
+                        raise ValueError('invalid_state')
             except Exception:
+                pass
+
+            if not code:
                 self.send_response(302)
-                self.send_header('Location', '/user_login.html?err=google_failed')
+                self.send_header('Location', '/user_login.html?err=google_no_code')
                 self.end_headers()
                 return
 
-        # ============ USER AUTH API ============
-        if parsed.path == '/api/user/me':
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
+            import urllib.request as urllib_request
+
+            token_body = urllib.parse.urlencode({
+                'client_id': client_id,
+                'client_secret': client_secret,
+                'code': code,
+                'grant_type': 'authorization_code',
+                'redirect_uri': redirect_uri
+            }).encode('utf-8')
+
+            req = urllib_request.Request(
+                'https://oauth2.googleapis.com/token',
+                data=token_body,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                method='POST'
+            )
+
+            with urllib_request.urlopen(req, timeout=15) as resp:
+                token_data = json.loads(resp.read().decode('utf-8'))
+
+            access_token = token_data.get('access_token', '')
+            if not access_token:
+                raise ValueError('no_access_token')
+
+            # Fetch user info
+            ui_req = urllib_request.Request(
+                'https://openidconnect.googleapis.com/v1/userinfo',
+                headers={'Authorization': f'Bearer {access_token}'},
+                method='GET'
+            )
+            with urllib_request.urlopen(ui_req, timeout=15) as resp:
+                userinfo = json.loads(resp.read().decode('utf-8'))
+
+            email = userinfo.get('email', '')
+            name = userinfo.get('name', '')
+            google_sub = userinfo.get('sub', '')
+
+            from user_manager import create_or_link_google_user, public_user_view, create_user_token
+            user = create_or_link_google_user(email=email, name=name, google_sub=google_sub)
+            token = create_user_token(user['id'])
+
+            # Put token in URL fragment so browser JS can store it
+            self.send_response(302)
+            self.send_header('Location', f"/user_dashboard.html#token={urllib.parse.quote(token)}")
             self.end_headers()
-            try:
-                from user_manager import verify_user_token, get_user, public_user_view
-                auth_header = self.headers.get('Authorization', '')
-                if not auth_header.startswith('Bearer '):
-                    self.wfile.write(json.dumps({'success': False, 'message': 'Unauthorized'}).encode('utf-8'))
-                    return
-                verified = verify_user_token(auth_header[7:])
-                if not verified.is_valid:
-                    self.wfile.write(json.dumps({'success': False, 'message': 'Invalid token'}).encode('utf-8'))
-                    return
-                user = get_user(verified.user_id)
-                self.wfile.write(json.dumps({'success': True, 'user': public_user_view(user)}).encode('utf-8'))
-            except Exception as e:
-                self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
             return
-
-        if parsed.path == '/api/user/purchases':
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
+        except Exception:
+            self.send_response(302)
+            self.send_header('Location', '/user_login.html?err=google_failed')
             self.end_headers()
-            try:
-                from user_manager import verify_user_token
-                auth_header = self.headers.get('Authorization', '')
-                if not auth_header.startswith('Bearer '):
-                    self.wfile.write(json.dumps({'success': False, 'message': 'Unauthorized'}).encode('utf-8'))
-                    return
-                verified = verify_user_token(auth_header[7:])
-                if not verified.is_valid:
-                    self.wfile.write(json.dumps({'success': False, 'message': 'Invalid token'}).encode('utf-8'))
-                    return
+            return
 
-                purchases = []
-                if SALES_LOG_FILE.exists():
-                    try:
-                        with open(SALES_LOG_FILE, 'r', encoding='utf-8') as f:
-                            sales = json.load(f)
-                        purchases = [s for s in (sales or []) if str(s.get('user_id', '')).strip() == verified.user_id]
-                    except Exception:
-                        purchases = []
+    # ============ USER AUTH API ============
+    def _get_user_me(self, parsed):
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        try:
+            from user_manager import verify_user_token, get_user, public_user_view
+            auth_header = self.headers.get('Authorization', '')
+            if not auth_header.startswith('Bearer '):
+                self.wfile.write(json.dumps({'success': False, 'message': 'Unauthorized'}).encode('utf-8'))
+                return
+            verified = verify_user_token(auth_header[7:])
+            if not verified.is_valid:
+                self.wfile.write(json.dumps({'success': False, 'message': 'Invalid token'}).encode('utf-8'))
+                return
+            user = get_user(verified.user_id)
+            self.wfile.write(json.dumps({'success': True, 'user': public_user_view(user)}).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
 
-                self.wfile.write(json.dumps({'success': True, 'purchases': purchases}).encode('utf-8'))
-            except Exception as e:
-                self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
-            return
-        if parsed.path == '/api/status':
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            resp = get_status()
-            self.wfile.write(json.dumps(resp, default=str).encode('utf-8'))
-            return
+    def _get_user_purchases(self, parsed):
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        try:
+            from user_manager import verify_user_token
+            auth_header = self.headers.get('Authorization', '')
+            if not auth_header.startswith('Bearer '):
+                self.wfile.write(json.dumps({'success': False, 'message': 'Unauthorized'}).encode('utf-8'))
+                return
+            verified = verify_user_token(auth_header[7:])
+            if not verified.is_valid:
+                self.wfile.write(json.dumps({'success': False, 'message': 'Invalid token'}).encode('utf-8'))
+                return
+
+            purchases = []
+            if SALES_LOG_FILE.exists():
+                try:
+                    with open(SALES_LOG_FILE, 'r', encoding='utf-8') as f:
+                        sales = json.load(f)
+                    purchases = [s for s in (sales or []) if str(s.get('user_id', '')).strip() == verified.user_id]
+                except Exception:
+                    purchases = []
+
+            self.wfile.write(json.dumps({'success': True, 'purchases': purchases}).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
+
+    def _get_status(self, parsed):
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        resp = get_status()
+        self.wfile.write(json.dumps(resp, default=str).encode('utf-8'))
+
+    # API to get installation logs for monitoring
+    def _get_logs(self, parsed):
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
         
-        # API to get installation logs for monitoring
-        if parsed.path == '/api/logs':
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            # Get last N lines from log file
-            lines_param = query_params.get('lines', ['50'])
+        # Get last N lines from log file
+        lines_param = query_params.get('lines', ['50'])
+        try:
+            num_lines = int(lines_param[0])
+        except:
+            num_lines = 50
+        
+        log_content = []
+        if LOG.exists():
             try:
-                num_lines = int(lines_param[0])
+                with open(LOG, 'r', encoding='utf-8', errors='ignore') as f:
+                    all_lines = f.readlines()
+                    log_content = all_lines[-num_lines:] if len(all_lines) > num_lines else all_lines
             except:
-                num_lines = 50
+                pass
+        
+        self.wfile.write(json.dumps({
+            'success': True,
+            'lines': [line.strip() for line in log_content],
+            'total_lines': len(log_content)
+        }).encode('utf-8'))
+
+    def _get_settings(self, parsed):
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        settings = load_settings()
+        # Add detected odoo path if not set
+        if not settings.get('odoo_path'):
+            detected = resolve_odoo_root()
+            settings['detected_odoo_path'] = str(detected) if detected else ''
+        self.wfile.write(json.dumps(settings, default=str).encode('utf-8'))
+
+    def _get_browse_folder(self, parsed):
+        # Open Windows folder browser dialog using PowerShell
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        try:
+            # Use PowerShell to show folder browser dialog
+            ps_script = '''
+            Add-Type -AssemblyName System.Windows.Forms
+            [System.Windows.Forms.Application]::EnableVisualStyles()
+            $folderBrowser = New-Object System.Windows.Forms.FolderBrowserDialog
+            $folderBrowser.Description = "پوشه Odoo را انتخاب کنید"
+            $folderBrowser.ShowNewFolderButton = $true
+            $folderBrowser.RootFolder = [System.Environment+SpecialFolder]::MyComputer
             
-            log_content = []
-            if LOG.exists():
-                try:
-                    with open(LOG, 'r', encoding='utf-8', errors='ignore') as f:
-                        all_lines = f.readlines()
-                        log_content = all_lines[-num_lines:] if len(all_lines) > num_lines else all_lines
-                except:
-                    pass
+            # Create a form to be the owner and bring to front
+            $form = New-Object System.Windows.Forms.Form
+            $form.TopMost = $true
+            $form.WindowState = [System.Windows.Forms.FormWindowState]::Minimized
+            $form.Show()
+            $form.Hide()
             
-            self.wfile.write(json.dumps({
-                'success': True,
-                'lines': [line.strip() for line in log_content],
-                'total_lines': len(log_content)
-            }).encode('utf-8'))
-            return
+            $result = $folderBrowser.ShowDialog($form)
+            $form.Dispose()
+            
+            if ($result -eq [System.Windows.Forms.DialogResult]::OK) {
+                Write-Output $folderBrowser.SelectedPath
+            } else {
+                Write-Output "CANCELLED"
+            }
+            '''
+            result = subprocess.run(
+                ['powershell', '-ExecutionPolicy', 'Bypass', '-Command', ps_script],
+                capture_output=True,
+                text=True,
+                timeout=120  # 2 minute timeout for user to select folder
+            )
+            selected_path = result.stdout.strip()
+            if selected_path == "CANCELLED" or not selected_path:
+                self.wfile.write(json.dumps({'path': '', 'cancelled': True}).encode('utf-8'))
+            else:
+                self.wfile.write(json.dumps({'path': selected_path}).encode('utf-8'))
+        except subprocess.TimeoutExpired:
+            self.wfile.write(json.dumps({'error': 'زمان انتخاب پوشه به پایان رسید'}).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
+
+    def _get_check_install_status(self, parsed):
+        # Check installation status by re-checking dependencies
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        _status_collector.refresh(DEPENDENCY_PROBES, max_age=5)
+        resp = get_status()
+        # Also include last install result for error detection
+        install_result = read_install_result()
+        # Return deps status plus install result for quick polling
+        self.wfile.write(json.dumps({
+            'deps': resp['deps'],
+            'install_result': install_result
+        }, default=str).encode('utf-8'))
+
+    def _get_install_result(self, parsed):
+        # Get the last installation result
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        result = read_install_result()
+        self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+
+    def _get_clear_install_result(self, parsed):
+        # Clear the installation result file
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        clear_install_result()
+        self.wfile.write(json.dumps({'cleared': True}).encode('utf-8'))
+
+    def _get_odoo_info(self, parsed):
+        # Get comprehensive Odoo installation info including config
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        info = get_odoo_info()
+        self.wfile.write(json.dumps(info, default=str).encode('utf-8'))
+
+    def _get_validate_folder(self, parsed):
+        # Validate if a folder is a valid Odoo installation
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        q = urllib.parse.parse_qs(parsed.query)
+        folder_path = q.get('path', [None])[0]
         
-        if parsed.path == '/api/settings':
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            settings = load_settings()
-            # Add detected odoo path if not set
-            if not settings.get('odoo_path'):
-                detected = resolve_odoo_root()
-                settings['detected_odoo_path'] = str(detected) if detected else ''
-            self.wfile.write(json.dumps(settings, default=str).encode('utf-8'))
-            return
+        if folder_path:
+            validation = validate_odoo_folder(Path(folder_path))
+        else:
+            validation = {
+                'valid': False,
+                'version': None,
+                'message': 'مسیر پوشه ارسال نشده',
+                'has_venv': False,
+                'has_source': False,
+                'has_config': False,
+            }
+        self.wfile.write(json.dumps(validation, default=str).encode('utf-8'))
+
+    def _get_license_status(self, parsed):
+        # Get license status
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
         
-        if parsed.path == '/api/browse_folder':
-            # Open Windows folder browser dialog using PowerShell
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            try:
-                # Use PowerShell to show folder browser dialog
-                ps_script = '''
-                Add-Type -AssemblyName System.Windows.Forms
-                [System.Windows.Forms.Application]::EnableVisualStyles()
-                $folderBrowser = New-Object System.Windows.Forms.FolderBrowserDialog
-                $folderBrowser.Description = "پوشه Odoo را انتخاب کنید"
-                $folderBrowser.ShowNewFolderButton = $true
-                $folderBrowser.RootFolder = [System.Environment+SpecialFolder]::MyComputer
-                
-                # Create a form to be the owner and bring to front
-                $form = New-Object System.Windows.Forms.Form
-                $form.TopMost = $true
-                $form.WindowState = [System.Windows.Forms.FormWindowState]::Minimized
-                $form.Show()
-                $form.Hide()
-                
-                $result = $folderBrowser.ShowDialog($form)
-                $form.Dispose()
-                
-                if ($result -eq [System.Windows.Forms.DialogResult]::OK) {
-                    Write-Output $folderBrowser.SelectedPath
-                } else {
-                    Write-Output "CANCELLED"
-                }
-                '''
-                result = subprocess.run(
-                    ['powershell', '-ExecutionPolicy', 'Bypass', '-Command', ps_script],
-                    capture_output=True,
-                    text=True,
-                    timeout=120  # 2 minute timeout for user to select folder
-                )
-                selected_path = result.stdout.strip()
-                if selected_path == "CANCELLED" or not selected_path:
-                    self.wfile.write(json.dumps({'path': '', 'cancelled': True}).encode('utf-8'))
-                else:
-                    self.wfile.write(json.dumps({'path': selected_path}).encode('utf-8'))
-            except subprocess.TimeoutExpired:
-                self.wfile.write(json.dumps({'error': 'زمان انتخاب پوشه به پایان رسید'}).encode('utf-8'))
-            except Exception as e:
-                self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
-            return
+        if not LICENSE_ENABLED:
+            result = {
+                'licensed': True,  # Bypass if license system not available
+                'is_valid': True,
+                'message': 'License system disabled',
+                'hardware_id': 'N/A',
+                'is_lifetime': True,
+                'expiry_date': None,
+                'days_remaining': -1
+            }
+        else:
+            refresh_revocation_list()
+            is_licensed, message = check_license()
+            result = {
+                'licensed': is_licensed,
+                'is_valid': is_licensed,
+                'message': message,
+                'hardware_id': get_hardware_id(),
+            }
+            if is_licensed:
+                info = get_license_info()
+                result.update(info)
         
-        if parsed.path == '/api/check_install_status':
-            # Check installation status by re-checking dependencies
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            resp = get_status()
-            # Also include last install result for error detection
-            install_result = read_install_result()
-            # Return deps status plus install result for quick polling
-            self.wfile.write(json.dumps({
-                'deps': resp['deps'],
-                'install_result': install_result
-            }, default=str).encode('utf-8'))
-            return
+        self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+
+    # ============ ADMIN GET APIs ============
+    def _get_admin_verify(self, parsed):
+        # Verify admin token
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
         
-        if parsed.path == '/api/install_result':
-            # Get the last installation result
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            result = read_install_result()
-            self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({'valid': False}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/clear_install_result':
-            # Clear the installation result file
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            clear_install_result()
-            self.wfile.write(json.dumps({'cleared': True}).encode('utf-8'))
-            return
+        token = auth_header[7:]
+        is_valid, username = verify_admin_token(token)
         
-        if parsed.path == '/api/odoo_info':
-            # Get comprehensive Odoo installation info including config
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            info = get_odoo_info()
-            self.wfile.write(json.dumps(info, default=str).encode('utf-8'))
+        self.wfile.write(json.dumps({
+            'valid': is_valid,
+            'username': username
+        }).encode('utf-8'))
+
+    def _get_admin_stats(self, parsed):
+        # Get license statistics
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/validate_folder':
-            # Validate if a folder is a valid Odoo installation
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            q = urllib.parse.parse_qs(parsed.query)
-            folder_path = q.get('path', [None])[0]
-            
-            if folder_path:
-                validation = validate_odoo_folder(Path(folder_path))
-            else:
-                validation = {
-                    'valid': False,
-                    'version': None,
-                    'message': 'مسیر پوشه ارسال نشده',
-                    'has_venv': False,
-                    'has_source': False,
-                    'has_config': False,
-                }
-            self.wfile.write(json.dumps(validation, default=str).encode('utf-8'))
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/license/status':
-            # Get license status
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            if not LICENSE_ENABLED:
-                result = {
-                    'licensed': True,  # Bypass if license system not available
-                    'is_valid': True,
-                    'message': 'License system disabled',
-                    'hardware_id': 'N/A',
-                    'is_lifetime': True,
-                    'expiry_date': None,
-                    'days_remaining': -1
-                }
+        db = load_license_db()
+        
+        # Recalculate stats
+        now = datetime.now()
+        active = 0
+        expired = 0
+        for lic in db.get('licenses', []):
+            if lic.get('validity_hours') == -1:
+                active += 1
             else:
-                is_licensed, message = check_license()
-                result = {
-                    'licensed': is_licensed,
-                    'is_valid': is_licensed,
-                    'message': message,
-                    'hardware_id': get_hardware_id(),
-                }
-                if is_licensed:
-                    info = get_license_info()
-                    result.update(info)
-            
-            self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
-            return
+                try:
+                    expiry = datetime.fromisoformat(lic['expiry_iso'])
+                    if now < expiry:
+                        active += 1
+                    else:
+                        expired += 1
+                except:
+                    pass
         
-        # ============ ADMIN GET APIs ============
-        if parsed.path == '/api/admin/verify':
-            # Verify admin token
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({'valid': False}).encode('utf-8'))
-                return
-            
-            token = auth_header[7:]
-            is_valid, username = verify_admin_token(token)
-            
-            self.wfile.write(json.dumps({
-                'valid': is_valid,
-                'username': username
-            }).encode('utf-8'))
+        stats = {
+            'total': len(db.get('licenses', [])),
+            'active': active,
+            'expired': expired,
+            'devices': len(set(lic['hardware_id'] for lic in db.get('licenses', [])))
+        }
+        
+        self.wfile.write(json.dumps(stats).encode('utf-8'))
+
+    def _get_admin_licenses(self, parsed):
+        # Get all licenses from database
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/stats':
-            # Get license statistics
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
-                return
-            
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
-            
-            if not is_valid:
-                self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
-                return
-            
-            db = load_license_db()
-            
-            # Recalculate stats
-            now = datetime.now()
-            active = 0
-            expired = 0
-            for lic in db.get('licenses', []):
-                if lic.get('validity_hours') == -1:
-                    active += 1
-                else:
-                    try:
-                        expiry = datetime.fromisoformat(lic['expiry_iso'])
-                        if now < expiry:
-                            active += 1
-                        else:
-                            expired += 1
-                    except:
-                        pass
-            
-            stats = {
-                'total': len(db.get('licenses', [])),
-                'active': active,
-                'expired': expired,
-                'devices': len(set(lic['hardware_id'] for lic in db.get('licenses', [])))
-            }
-            
-            self.wfile.write(json.dumps(stats).encode('utf-8'))
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/licenses':
-            # Get all licenses from database
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
-                return
-            
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
-            
-            if not is_valid:
-                self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
-                return
-            
-            if DATABASE_ENABLED:
-                licenses = db_list_licenses()
-            else:
-                db = load_license_db()
-                licenses = db.get('licenses', [])
+        if DATABASE_ENABLED:
+            # Status is kept current by the database's expiry scheduler
+            licenses = db_list_licenses()
+            for lic in licenses:
+                lic['is_expired'] = lic.get('status') == 'expired'
+        else:
+            db = load_license_db()
+            licenses = db.get('licenses', [])
             
             # Update is_expired flag
             now = datetime.now()
@@ -2246,1266 +2456,1315 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                     except:
                         lic['is_expired'] = True
                         lic['status'] = 'expired'
-            
-            self.wfile.write(json.dumps({'licenses': licenses}).encode('utf-8'))
-            return
         
-        if parsed.path == '/api/admin/customers':
-            # Get all customers
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
-                return
-            
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
-            
-            if not is_valid:
-                self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
-                return
-            
-            if DATABASE_ENABLED:
-                customers = list_customers()
-            else:
-                customers = []
-            
-            self.wfile.write(json.dumps({'customers': customers}).encode('utf-8'))
+        self.wfile.write(json.dumps({'licenses': licenses}).encode('utf-8'))
+
+    def _get_admin_customers(self, parsed):
+        # Get all customers
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/dashboard':
-            # Get dashboard data
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
-                return
-            
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
-            
-            if not is_valid:
-                self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
-                return
-            
-            if DATABASE_ENABLED:
-                data = get_dashboard_data()
-            else:
-                data = {
-                    'stats': {'total_customers': 0, 'total_licenses': 0, 'active_licenses': 0, 'expired_licenses': 0, 'total_revenue': 0},
-                    'recent_licenses': [],
-                    'recent_customers': []
-                }
-            
-            self.wfile.write(json.dumps(data, default=str).encode('utf-8'))
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
             return
         
-        # ============ PLANS API ============
-        if parsed.path == '/api/plans':
-            # Get plans for public display (no auth required)
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            plans = load_plans()
-            self.wfile.write(json.dumps({'success': True, 'plans': plans}).encode('utf-8'))
+        if DATABASE_ENABLED:
+            customers = list_customers()
+        else:
+            customers = []
+        
+        self.wfile.write(json.dumps({'customers': customers}).encode('utf-8'))
+
+    def _get_admin_dashboard(self, parsed):
+        # Get dashboard data
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/plans':
-            # Get all plans for admin (auth required) - includes inactive
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
-                return
-            
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
-            
-            if not is_valid:
-                self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
-                return
-            
-            plans = load_all_plans()  # Get all plans including inactive
-            self.wfile.write(json.dumps({'success': True, 'plans': plans}).encode('utf-8'))
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/check_compatibility':
-            # Check dependency compatibility between Odoo requirements and offline wheels
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            q = urllib.parse.parse_qs(parsed.query)
-            
-            # Allow specifying a custom path
-            custom_path = q.get('path', [None])[0]
-            if custom_path:
-                odoo_root = Path(custom_path)
-            else:
-                odoo_root = resolve_odoo_root()
-            
-            result = check_dependency_compatibility(odoo_root)
-            self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+        if DATABASE_ENABLED:
+            data = get_dashboard_data()
+        else:
+            data = {
+                'stats': {'total_customers': 0, 'total_licenses': 0, 'active_licenses': 0, 'expired_licenses': 0, 'total_revenue': 0},
+                'recent_licenses': [],
+                'recent_customers': []
+            }
+        
+        self.wfile.write(json.dumps(data, default=str).encode('utf-8'))
+
+    # ============ PLANS API ============
+    def _get_plans(self, parsed):
+        # Get plans for public display (no auth required)
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        plans = load_plans()
+        self.wfile.write(json.dumps({'success': True, 'plans': plans}).encode('utf-8'))
+
+    def _get_admin_plans(self, parsed):
+        # Get all plans for admin (auth required) - includes inactive
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({'error': 'Unauthorized'}).encode('utf-8'))
             return
         
-        if parsed.path == '/api/download_package':
-            # Download a missing package from PyPI
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            q = urllib.parse.parse_qs(parsed.query)
-            
-            package_name = q.get('package', [None])[0]
-            version = q.get('version', [None])[0]
-            
-            if not package_name:
-                self.wfile.write(json.dumps({'error': 'نام پکیج مشخص نشده'}).encode('utf-8'))
-                return
-            
-            result = download_missing_package(package_name, version)
-            self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({'error': 'Invalid token'}).encode('utf-8'))
             return
+        
+        plans = load_all_plans()  # Get all plans including inactive
+        self.wfile.write(json.dumps({'success': True, 'plans': plans}).encode('utf-8'))
 
-        # installation/uninstallation endpoints
-        if parsed.path.startswith('/api/install') or parsed.path.startswith('/api/uninstall') or parsed.path.startswith('/api/run') or parsed.path.startswith('/api/start') or parsed.path.startswith('/api/check'):
-            q = urllib.parse.parse_qs(parsed.query)
-            # normalize command token (last path component)
-            cmd = parsed.path.strip('/').split('/')[-1]
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            res = run_command(cmd, q)
-            self.wfile.write(json.dumps(res, default=str).encode('utf-8'))
+    def _get_check_compatibility(self, parsed):
+        # Check dependency compatibility between Odoo requirements and offline wheels
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        q = urllib.parse.parse_qs(parsed.query)
+        
+        # Allow specifying a custom path
+        custom_path = q.get('path', [None])[0]
+        if custom_path:
+            odoo_root = Path(custom_path)
+        else:
+            odoo_root = resolve_odoo_root()
+        
+        result = check_dependency_compatibility(odoo_root)
+        self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+
+    def _get_download_package(self, parsed):
+        # Download a missing package from PyPI
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        q = urllib.parse.parse_qs(parsed.query)
+        
+        package_name = q.get('package', [None])[0]
+        version = q.get('version', [None])[0]
+        
+        if not package_name:
+            self.wfile.write(json.dumps({'error': 'نام پکیج مشخص نشده'}).encode('utf-8'))
             return
-        return super().do_GET()
+        
+        result = download_missing_package(package_name, version)
+        self.wfile.write(json.dumps(result, default=str).encode('utf-8'))
+
+    # installation/uninstallation endpoints
+    def _get_command(self, parsed):
+        q = urllib.parse.parse_qs(parsed.query)
+        # normalize command token (last path component)
+        cmd = parsed.path.strip('/').split('/')[-1]
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        res = run_command(cmd, q)
+        self.wfile.write(json.dumps(res, default=str).encode('utf-8'))
 
-    def do_POST(self):
-        parsed = urllib.parse.urlparse(self.path)
-        content_length = int(self.headers.get('Content-Length', 0))
+    # ============ OFFLINE ADMIN (REMOVED) ============
+    def _post_admin_disabled(self, parsed, content_length):
+        self.send_response(404)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(json.dumps({'success': False, 'message': 'Offline admin is disabled'}).encode('utf-8'))
 
-        # ============ OFFLINE ADMIN (REMOVED) ============
-        if parsed.path.startswith('/api/admin/'):
-            self.send_response(404)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            self.wfile.write(json.dumps({'success': False, 'message': 'Offline admin is disabled'}).encode('utf-8'))
-            return
+    # ============ USER AUTH API ============
+    def _post_user_register(self, parsed, content_length):
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            email = data.get('email', '')
+            mobile = data.get('mobile', '')
+            password = data.get('password', '')
+            name = data.get('name', '')
+            from user_manager import create_user, public_user_view, create_user_token
+            user = create_user(email=email, mobile=mobile, password=password, name=name)
+            token = create_user_token(user['id'])
+            self.wfile.write(json.dumps({'success': True, 'token': token, 'user': public_user_view(user)}).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
 
-        # ============ USER AUTH API ============
-        if parsed.path == '/api/user/register':
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                email = data.get('email', '')
-                mobile = data.get('mobile', '')
-                password = data.get('password', '')
-                name = data.get('name', '')
-                from user_manager import create_user, public_user_view, create_user_token
-                user = create_user(email=email, mobile=mobile, password=password, name=name)
-                token = create_user_token(user['id'])
-                self.wfile.write(json.dumps({'success': True, 'token': token, 'user': public_user_view(user)}).encode('utf-8'))
-            except Exception as e:
-                self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
-            return
+    def _post_user_login(self, parsed, content_length):
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            identifier = data.get('identifier', '')
+            password = data.get('password', '')
+            from user_manager import find_user_by_identifier, verify_password, public_user_view, create_user_token
+            user = find_user_by_identifier(identifier)
+            if not user or user.get('status') != 'active':
+                self.wfile.write(json.dumps({'success': False, 'message': 'کاربر یافت نشد'}).encode('utf-8'))
+                return
+            if user.get('provider') != 'local':
+                self.wfile.write(json.dumps({'success': False, 'message': 'این حساب با روش دیگری ساخته شده است'}).encode('utf-8'))
+                return
+            if not verify_password(password, user.get('password_hash', '')):
+                self.wfile.write(json.dumps({'success': False, 'message': 'رمز عبور اشتباه است'}).encode('utf-8'))
+                return
+            token = create_user_token(user['id'])
+            self.wfile.write(json.dumps({'success': True, 'token': token, 'user': public_user_view(user)}).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
 
-        if parsed.path == '/api/user/login':
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                identifier = data.get('identifier', '')
-                password = data.get('password', '')
-                from user_manager import find_user_by_identifier, verify_password, public_user_view, create_user_token
-                user = find_user_by_identifier(identifier)
-                if not user or user.get('status') != 'active':
-                    self.wfile.write(json.dumps({'success': False, 'message': 'کاربر یافت نشد'}).encode('utf-8'))
-                    return
-                if user.get('provider') != 'local':
-                    self.wfile.write(json.dumps({'success': False, 'message': 'این حساب با روش دیگری ساخته شده است'}).encode('utf-8'))
-                    return
-                if not verify_password(password, user.get('password_hash', '')):
-                    self.wfile.write(json.dumps({'success': False, 'message': 'رمز عبور اشتباه است'}).encode('utf-8'))
-                    return
-                token = create_user_token(user['id'])
-                self.wfile.write(json.dumps({'success': True, 'token': token, 'user': public_user_view(user)}).encode('utf-8'))
-            except Exception as e:
-                self.wfile.write(json.dumps({'success': False, 'message': str(e)}).encode('utf-8'))
-            return
+    def _post_shutdown(self, parsed, content_length):
+        # Shutdown the server
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(json.dumps({'success': True, 'message': 'Shutting down...'}).encode('utf-8'))
         
-        if parsed.path == '/api/shutdown':
-            # Shutdown the server
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            self.wfile.write(json.dumps({'success': True, 'message': 'Shutting down...'}).encode('utf-8'))
+        # Schedule shutdown
+        def shutdown():
+            time.sleep(0.5)
+            os._exit(0)
+        threading.Thread(target=shutdown, daemon=True).start()
+
+    def _post_settings(self, parsed, content_length):
+        try:
+            body = self.rfile.read(content_length)
+            new_settings = json.loads(body.decode('utf-8'))
             
-            # Schedule shutdown
-            def shutdown():
-                time.sleep(0.5)
-                os._exit(0)
-            threading.Thread(target=shutdown, daemon=True).start()
-            return
-        
-        if parsed.path == '/api/settings':
-            try:
-                body = self.rfile.read(content_length)
-                new_settings = json.loads(body.decode('utf-8'))
-                
-                # Validate odoo_path if provided
-                if new_settings.get('odoo_path'):
-                    path = Path(new_settings['odoo_path'])
-                    if not path.exists():
-                        self.send_response(400)
-                        self.send_header('Content-Type','application/json; charset=utf-8')
-                        self.end_headers()
-                        self.wfile.write(json.dumps({'error': 'مسیر وارد شده وجود ندارد'}).encode('utf-8'))
-                        return
-                
-                # Merge with existing settings
-                settings = load_settings()
-                settings.update(new_settings)
-                
-                if save_settings(settings):
-                    self.send_response(200)
+            # Validate odoo_path if provided
+            if new_settings.get('odoo_path'):
+                path = Path(new_settings['odoo_path'])
+                if not path.exists():
+                    self.send_response(400)
                     self.send_header('Content-Type','application/json; charset=utf-8')
                     self.end_headers()
-                    self.wfile.write(json.dumps({'success': True, 'settings': settings}).encode('utf-8'))
-                else:
-                    self.send_response(500)
-                    self.send_header('Content-Type','application/json; charset=utf-8')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({'error': 'خطا در ذخیره تنظیمات'}).encode('utf-8'))
-            except Exception as e:
+                    self.wfile.write(json.dumps({'error': 'مسیر وارد شده وجود ندارد'}).encode('utf-8'))
+                    return
+            
+            # Merge with existing settings
+            settings = load_settings()
+            settings.update(new_settings)
+            
+            if save_settings(settings):
+                self.send_response(200)
+                self.send_header('Content-Type','application/json; charset=utf-8')
+                self.end_headers()
+                self.wfile.write(json.dumps({'success': True, 'settings': settings}).encode('utf-8'))
+            else:
                 self.send_response(500)
                 self.send_header('Content-Type','application/json; charset=utf-8')
                 self.end_headers()
-                self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
-            return
-        
-        if parsed.path == '/api/install_odoo':
-            # Install Odoo from GitHub
-            self.send_response(200)
+                self.wfile.write(json.dumps({'error': 'خطا در ذخیره تنظیمات'}).encode('utf-8'))
+        except Exception as e:
+            self.send_response(500)
             self.send_header('Content-Type','application/json; charset=utf-8')
             self.end_headers()
+            self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
+
+    def _post_install_odoo(self, parsed, content_length):
+        # Install Odoo from GitHub
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            odoo_path = data.get('odoo_path', '').strip()
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                odoo_path = data.get('odoo_path', '').strip()
-                
-                if not odoo_path:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'مسیر نصب مشخص نشده است'
-                    }).encode('utf-8'))
-                    return
-                
-                # Start installation in background thread
-                def install_worker():
-                    try:
-                        log_message(f"شروع نصب Odoo در مسیر: {odoo_path}")
-                        
-                        # Create directory if not exists
-                        target_dir = Path(odoo_path)
-                        target_dir.mkdir(parents=True, exist_ok=True)
-                        
-                        # Download Odoo from Google Drive (Custom Version)
-                        file_id = "1Hvbbasxs3qe0jxRwQpHZh2295o2qxNsq"
-                        log_message(f"دانلود Odoo از Google Drive (نسخه سفارشی)...")
-                        
-                        import urllib.request
-                        import zipfile
-                        import requests
-                        
-                        # Download with confirmation token handling
-                        zip_path = target_dir.parent / "odoo19_download.zip"
-                        log_message("در حال دانلود... (این کار چند دقیقه طول می‌کشد)")
-                        
-                        # Google Drive direct download
-                        url = f"https://drive.google.com/uc?export=download&id={file_id}"
-                        session = requests.Session()
-                        response = session.get(url, stream=True)
-                        
-                        # Check for confirmation token
-                        for key, value in response.cookies.items():
-                            if key.startswith('download_warning'):
-                                url = f"https://drive.google.com/uc?export=download&id={file_id}&confirm={value}"
-                                response = session.get(url, stream=True)
-                                break
-                        
-                        # Download with progress
-                        total_size = int(response.headers.get('content-length', 0))
-                        with open(zip_path, 'wb') as f:
-                            downloaded = 0
-                            for chunk in response.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
-                                    downloaded += len(chunk)
-                                    if total_size > 0:
-                                        percent = int(downloaded * 100 / total_size)
-                                        if percent % 10 == 0:  # Log every 10%
-                                            log_message(f"دانلود: {percent}%")
-                        
-                        log_message("✅ دانلود کامل شد!")
-                        
-                        # Extract
-                        log_message("در حال استخراج فایل‌ها...")
-                        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                            zip_ref.extractall(target_dir.parent)
-                        
-                        # Rename extracted folder
-                        extracted_folder = target_dir.parent / "odoo-19.0"
-                        if extracted_folder.exists():
-                            import shutil
-                            if target_dir.exists():
-                                shutil.rmtree(target_dir)
-                            extracted_folder.rename(target_dir)
-                        
-                        # Cleanup
-                        if zip_path.exists():
-                            zip_path.unlink()
-                        
-                        log_message(f"✅ نصب Odoo با موفقیت انجام شد در: {odoo_path}")
-                        
-                        # Update config
-                        settings = load_settings()
-                        settings['odoo_path'] = str(odoo_path)
-                        save_settings(settings)
-                        log_message("تنظیمات به‌روزرسانی شد")
-                        
-                    except Exception as e:
-                        log_message(f"❌ خطا در نصب Odoo: {str(e)}")
-                
-                thread = threading.Thread(target=install_worker, daemon=True)
-                thread.start()
-                
-                self.wfile.write(json.dumps({
-                    'success': True,
-                    'message': 'نصب Odoo آغاز شد. لاگ‌ها را مشاهده کنید.'
-                }).encode('utf-8'))
-                
-            except Exception as e:
+            if not odoo_path:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'error': str(e)
+                    'error': 'مسیر نصب مشخص نشده است'
                 }).encode('utf-8'))
+                return
+            
+            # Start installation in background thread
+            def install_worker():
+                try:
+                    log_message(f"شروع نصب Odoo در مسیر: {odoo_path}")
+                    
+                    # Create directory if not exists
+                    target_dir = Path(odoo_path)
+                    target_dir.mkdir(parents=True, exist_ok=True)
+                    
+                    # Download Odoo from Google Drive (Custom Version)
+                    file_id = "1Hvbbasxs3qe0jxRwQpHZh2295o2qxNsq"
+                    log_message(f"دانلود Odoo از Google Drive (نسخه سفارشی)...")
+                    
+                    import urllib.request
+                    import zipfile
+                    import requests
+                    
+                    # Download with confirmation token handling
+                    zip_path = target_dir.parent / "odoo19_download.zip"
+                    log_message("در حال دانلود... (این کار چند دقیقه طول می‌کشد)")
+                    
+                    # Google Drive direct download
+                    url = f"https://drive.google.com/uc?export=download&id={file_id}"
+                    session = requests.Session()
+                    response = session.get(url, stream=True)
+                    
+                    # Check for confirmation token
+                    for key, value in response.cookies.items():
+                        if key.startswith('download_warning'):
+                            url = f"https://drive.google.com/uc?export=download&id={file_id}&confirm={value}"
+                            response = session.get(url, stream=True)
+                            break
+                    
+                    # Download with progress
+                    total_size = int(response.headers.get('content-length', 0))
+                    with open(zip_path, 'wb') as f:
+                        downloaded = 0
+                        for chunk in response.iter_content(chunk_size=8192):
+                            if chunk:
+                                f.write(chunk)
+                                downloaded += len(chunk)
+                                if total_size > 0:
+                                    percent = int(downloaded * 100 / total_size)
+                                    if percent % 10 == 0:  # Log every 10%
+                                        log_message(f"دانلود: {percent}%")
+                    
+                    log_message("✅ دانلود کامل شد!")
+                    
+                    # Extract
+                    log_message("در حال استخراج فایل‌ها...")
+                    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                        zip_ref.extractall(target_dir.parent)
+                    
+                    # Rename extracted folder
+                    extracted_folder = target_dir.parent / "odoo-19.0"
+                    if extracted_folder.exists():
+                        import shutil
+                        if target_dir.exists():
+                            shutil.rmtree(target_dir)
+                        extracted_folder.rename(target_dir)
+                    
+                    # Cleanup
+                    if zip_path.exists():
+                        zip_path.unlink()
+                    
+                    log_message(f"✅ نصب Odoo با موفقیت انجام شد در: {odoo_path}")
+                    
+                    # Update config
+                    settings = load_settings()
+                    settings['odoo_path'] = str(odoo_path)
+                    save_settings(settings)
+                    log_message("تنظیمات به‌روزرسانی شد")
+                    
+                except Exception as e:
+                    log_message(f"❌ خطا در نصب Odoo: {str(e)}")
+            
+            thread = threading.Thread(target=install_worker, daemon=True)
+            thread.start()
+            
+            self.wfile.write(json.dumps({
+                'success': True,
+                'message': 'نصب Odoo آغاز شد. لاگ‌ها را مشاهده کنید.'
+            }).encode('utf-8'))
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode('utf-8'))
+
+    def _post_license_activate(self, parsed, content_length):
+        # Activate a license key
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        if not LICENSE_ENABLED:
+            self.wfile.write(json.dumps({
+                'success': True,
+                'message': 'License system disabled - running in bypass mode'
+            }).encode('utf-8'))
             return
         
-        if parsed.path == '/api/license/activate':
-            # Activate a license key
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            license_key = data.get('license_key', '').strip()
             
-            if not LICENSE_ENABLED:
+            if not license_key:
                 self.wfile.write(json.dumps({
-                    'success': True,
-                    'message': 'License system disabled - running in bypass mode'
+                    'success': False,
+                    'message': 'کلید لایسنس خالی است'
                 }).encode('utf-8'))
                 return
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                license_key = data.get('license_key', '').strip()
-                
-                if not license_key:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'کلید لایسنس خالی است'
-                    }).encode('utf-8'))
-                    return
-                
-                # ========== USER OWNERSHIP CHECK ==========
-                # Check if this license belongs to a specific user
-                current_user_id = None
-                auth_header = self.headers.get('Authorization', '')
-                if auth_header.startswith('Bearer '):
-                    try:
-                        from user_manager import verify_user_token
-                        verified = verify_user_token(auth_header[7:])
-                        if verified and getattr(verified, 'is_valid', False):
-                            current_user_id = getattr(verified, 'user_id', None)
-                    except Exception:
-                        pass
-                
-                # Get license from database to check ownership
+            # ========== USER OWNERSHIP CHECK ==========
+            # Check if this license belongs to a specific user
+            current_user_id = None
+            auth_header = self.headers.get('Authorization', '')
+            if auth_header.startswith('Bearer '):
                 try:
-                    from database_manager import get_license_by_key
-                    lic_record = get_license_by_key(license_key)
-                    if lic_record:
-                        license_owner_id = lic_record.get('user_id')
-                        # If license has an owner (user_id), verify current user matches
-                        if license_owner_id:
-                            if not current_user_id:
-                                self.wfile.write(json.dumps({
-                                    'success': False,
-                                    'message': 'این لایسنس متعلق به یک کاربر است. لطفاً ابتدا وارد حساب کاربری خود شوید.'
-                                }).encode('utf-8'))
-                                return
-                            if current_user_id != license_owner_id:
-                                self.wfile.write(json.dumps({
-                                    'success': False,
-                                    'message': 'این لایسنس متعلق به حساب کاربری شما نیست. با حساب صحیح وارد شوید.'
-                                }).encode('utf-8'))
-                                return
+                    from user_manager import verify_user_token
+                    verified = verify_user_token(auth_header[7:])
+                    if verified and getattr(verified, 'is_valid', False):
+                        current_user_id = getattr(verified, 'user_id', None)
                 except Exception:
-                    pass  # If DB check fails, proceed with normal activation
-                # ========== END OWNERSHIP CHECK ==========
-                
-                success, message = activate_license(license_key)
-                self.wfile.write(json.dumps({
-                    'success': success,
-                    'message': message
-                }).encode('utf-8'))
-                
-            except Exception as e:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': f'خطا: {str(e)}'
-                }).encode('utf-8'))
+                    pass
+            
+            # Get license from database to check ownership
+            try:
+                from database_manager import get_license_by_key
+                lic_record = get_license_by_key(license_key)
+                if lic_record:
+                    license_owner_id = lic_record.get('user_id')
+                    # If license has an owner (user_id), verify current user matches
+                    if license_owner_id:
+                        if not current_user_id:
+                            self.wfile.write(json.dumps({
+                                'success': False,
+                                'message': 'این لایسنس متعلق به یک کاربر است. لطفاً ابتدا وارد حساب کاربری خود شوید.'
+                            }).encode('utf-8'))
+                            return
+                        if current_user_id != license_owner_id:
+                            self.wfile.write(json.dumps({
+                                'success': False,
+                                'message': 'این لایسنس متعلق به حساب کاربری شما نیست. با حساب صحیح وارد شوید.'
+                            }).encode('utf-8'))
+                            return
+            except Exception:
+                pass  # If DB check fails, proceed with normal activation
+            # ========== END OWNERSHIP CHECK ==========
+            
+            success, message = activate_license(license_key)
+            self.wfile.write(json.dumps({
+                'success': success,
+                'message': message
+            }).encode('utf-8'))
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': f'خطا: {str(e)}'
+            }).encode('utf-8'))
+
+    def _post_license_deactivate(self, parsed, content_length):
+        # Deactivate license
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        if not LICENSE_ENABLED:
+            self.wfile.write(json.dumps({
+                'success': True,
+                'message': 'License system disabled'
+            }).encode('utf-8'))
             return
         
-        if parsed.path == '/api/license/deactivate':
-            # Deactivate license
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
+        try:
+            success = deactivate_license()
+            self.wfile.write(json.dumps({
+                'success': success,
+                'message': 'لایسنس با موفقیت غیرفعال شد' if success else 'خطا در غیرفعال‌سازی'
+            }).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    # ============ ADMIN API ============
+    def _post_admin_login(self, parsed, content_length):
+        # Admin login
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            username = data.get('username', '')
+            password = data.get('password', '')
             
-            if not LICENSE_ENABLED:
+            if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+                token = create_admin_token(username)
                 self.wfile.write(json.dumps({
                     'success': True,
-                    'message': 'License system disabled'
-                }).encode('utf-8'))
-                return
-            
-            try:
-                success = deactivate_license()
-                self.wfile.write(json.dumps({
-                    'success': success,
-                    'message': 'لایسنس با موفقیت غیرفعال شد' if success else 'خطا در غیرفعال‌سازی'
+                    'token': token,
+                    'message': 'ورود موفق'
                 }).encode('utf-8'))
-            except Exception as e:
+            else:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': str(e)
+                    'message': 'نام کاربری یا رمز عبور اشتباه است'
                 }).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    def _post_admin_plans(self, parsed, content_length):
+        # Save/update plans (admin only)
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن احراز هویت یافت نشد'
+            }).encode('utf-8'))
             return
         
-        # ============ ADMIN API ============
-        if parsed.path == '/api/admin/login':
-            # Admin login
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                username = data.get('username', '')
-                password = data.get('password', '')
-                
-                if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
-                    token = create_admin_token(username)
-                    self.wfile.write(json.dumps({
-                        'success': True,
-                        'token': token,
-                        'message': 'ورود موفق'
-                    }).encode('utf-8'))
-                else:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'نام کاربری یا رمز عبور اشتباه است'
-                    }).encode('utf-8'))
-            except Exception as e:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': str(e)
-                }).encode('utf-8'))
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن نامعتبر یا منقضی شده'
+            }).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/plans':
-            # Save/update plans (admin only)
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': 'توکن احراز هویت یافت نشد'
-                }).encode('utf-8'))
-                return
-            
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            plans = data.get('plans', [])
             
-            if not is_valid:
+            if not plans:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن نامعتبر یا منقضی شده'
+                    'message': 'لیست پلن‌ها خالی است'
                 }).encode('utf-8'))
                 return
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                plans = data.get('plans', [])
-                
-                if not plans:
+            # Validate plans
+            for plan in plans:
+                if not plan.get('id') or not plan.get('name') or plan.get('price') is None:
                     self.wfile.write(json.dumps({
                         'success': False,
-                        'message': 'لیست پلن‌ها خالی است'
+                        'message': 'اطلاعات پلن ناقص است (id, name, price الزامی هستند)'
                     }).encode('utf-8'))
                     return
-                
-                # Validate plans
-                for plan in plans:
-                    if not plan.get('id') or not plan.get('name') or plan.get('price') is None:
-                        self.wfile.write(json.dumps({
-                            'success': False,
-                            'message': 'اطلاعات پلن ناقص است (id, name, price الزامی هستند)'
-                        }).encode('utf-8'))
-                        return
-                
-                if save_plans(plans):
-                    self.wfile.write(json.dumps({
-                        'success': True,
-                        'message': 'پلن‌ها با موفقیت ذخیره شدند',
-                        'plans': plans
-                    }).encode('utf-8'))
-                else:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'خطا در ذخیره پلن‌ها'
-                    }).encode('utf-8'))
-                
-            except Exception as e:
+            
+            if save_plans(plans):
+                self.wfile.write(json.dumps({
+                    'success': True,
+                    'message': 'پلن‌ها با موفقیت ذخیره شدند',
+                    'plans': plans
+                }).encode('utf-8'))
+            else:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': str(e)
+                    'message': 'خطا در ذخیره پلن‌ها'
                 }).encode('utf-8'))
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    def _post_admin_generate_license(self, parsed, content_length):
+        # Generate license (admin only)
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن احراز هویت یافت نشد'
+            }).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/generate_license':
-            # Generate license (admin only)
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
+        token = auth_header[7:]
+        is_valid, username = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن نامعتبر یا منقضی شده'
+            }).encode('utf-8'))
+            return
+        
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
             
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
+            hardware_id = data.get('hardware_id', '').strip()
+            validity_hours = int(data.get('validity_hours', 8760))
+            customer_name = data.get('customer_name', '')
+            note = data.get('note', '')
+            
+            if not hardware_id:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن احراز هویت یافت نشد'
+                    'message': 'شناسه سخت‌افزاری الزامی است'
                 }).encode('utf-8'))
                 return
             
-            token = auth_header[7:]
-            is_valid, username = verify_admin_token(token)
+            # Generate license (will also save to new database if enabled)
+            license_data = generate_license_with_hours(hardware_id, validity_hours, 
+                                                       customer_name=customer_name)
+            license_data['customer_name'] = customer_name
+            license_data['note'] = note
+            license_data['generated_by'] = username
             
-            if not is_valid:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': 'توکن نامعتبر یا منقضی شده'
-                }).encode('utf-8'))
-                return
+            # Save to legacy database (for backward compatibility)
+            if not DATABASE_ENABLED:
+                add_license_to_db(license_data)
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                
-                hardware_id = data.get('hardware_id', '').strip()
-                validity_hours = int(data.get('validity_hours', 8760))
-                customer_name = data.get('customer_name', '')
-                note = data.get('note', '')
-                
-                if not hardware_id:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'شناسه سخت‌افزاری الزامی است'
-                    }).encode('utf-8'))
-                    return
-                
-                # Generate license (will also save to new database if enabled)
-                license_data = generate_license_with_hours(hardware_id, validity_hours, 
-                                                           customer_name=customer_name)
-                license_data['customer_name'] = customer_name
-                license_data['note'] = note
-                license_data['generated_by'] = username
-                
-                # Save to legacy database (for backward compatibility)
-                if not DATABASE_ENABLED:
-                    add_license_to_db(license_data)
-                
-                self.wfile.write(json.dumps({
-                    'success': True,
-                    **license_data
-                }).encode('utf-8'))
-                
-            except Exception as e:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': str(e)
-                }).encode('utf-8'))
+            self.wfile.write(json.dumps({
+                'success': True,
+                **license_data
+            }).encode('utf-8'))
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    def _post_admin_customers(self, parsed, content_length):
+        # Create new customer (admin only)
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن احراز هویت یافت نشد'
+            }).encode('utf-8'))
+            return
+        
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن نامعتبر یا منقضی شده'
+            }).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/customers':
-            # Create new customer (admin only)
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
+        if not DATABASE_ENABLED:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'دیتابیس فعال نیست'
+            }).encode('utf-8'))
+            return
+        
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
             
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
+            name = data.get('name', '').strip()
+            phone = data.get('phone', '').strip()
+            email = data.get('email', '').strip()
+            company = data.get('company', '').strip()
+            notes = data.get('notes', '').strip()
+            
+            if not name:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن احراز هویت یافت نشد'
+                    'message': 'نام مشتری الزامی است'
                 }).encode('utf-8'))
                 return
             
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
+            customer = create_customer(
+                name=name,
+                phone=phone,
+                email=email,
+                company=company,
+                notes=notes
+            )
             
-            if not is_valid:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': 'توکن نامعتبر یا منقضی شده'
-                }).encode('utf-8'))
-                return
+            self.wfile.write(json.dumps({
+                'success': True,
+                'customer': customer
+            }).encode('utf-8'))
             
-            if not DATABASE_ENABLED:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': 'دیتابیس فعال نیست'
-                }).encode('utf-8'))
-                return
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    def _post_admin_customer(self, parsed, content_length):
+        if parsed.path.count('/') != 4:
+            return self.do_GET()
+        # Update customer (admin only) - PUT method via POST
+        customer_id = parsed.path.split('/')[-1]
+        
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن احراز هویت یافت نشد'
+            }).encode('utf-8'))
+            return
+        
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن نامعتبر یا منقضی شده'
+            }).encode('utf-8'))
+            return
+        
+        if not DATABASE_ENABLED:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'دیتابیس فعال نیست'
+            }).encode('utf-8'))
+            return
+        
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                
-                name = data.get('name', '').strip()
-                phone = data.get('phone', '').strip()
-                email = data.get('email', '').strip()
-                company = data.get('company', '').strip()
-                notes = data.get('notes', '').strip()
-                
-                if not name:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'نام مشتری الزامی است'
-                    }).encode('utf-8'))
-                    return
-                
-                customer = create_customer(
-                    name=name,
-                    phone=phone,
-                    email=email,
-                    company=company,
-                    notes=notes
-                )
-                
+            customer = update_customer(customer_id, data)
+            
+            if customer:
                 self.wfile.write(json.dumps({
                     'success': True,
                     'customer': customer
                 }).encode('utf-8'))
-                
-            except Exception as e:
+            else:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': str(e)
+                    'message': 'مشتری یافت نشد'
                 }).encode('utf-8'))
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    def _post_admin_licenses_revoke(self, parsed, content_length):
+        # Revoke a license (admin only)
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن احراز هویت یافت نشد'
+            }).encode('utf-8'))
             return
         
-        if parsed.path.startswith('/api/admin/customers/') and parsed.path.count('/') == 4:
-            # Update customer (admin only) - PUT method via POST
-            customer_id = parsed.path.split('/')[-1]
-            
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن نامعتبر یا منقضی شده'
+            }).encode('utf-8'))
+            return
+        
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            license_id = data.get('license_id', '').strip()
             
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
+            if not license_id:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن احراز هویت یافت نشد'
+                    'message': 'شناسه لایسنس الزامی است'
                 }).encode('utf-8'))
                 return
             
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
+            if DATABASE_ENABLED:
+                success = revoke_license(license_id)
+            else:
+                success = False
             
-            if not is_valid:
+            if success:
                 self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': 'توکن نامعتبر یا منقضی شده'
+                    'success': True,
+                    'message': 'لایسنس با موفقیت لغو شد'
                 }).encode('utf-8'))
-                return
-            
-            if not DATABASE_ENABLED:
+            else:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'دیتابیس فعال نیست'
+                    'message': 'لایسنس یافت نشد'
                 }).encode('utf-8'))
-                return
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                
-                customer = update_customer(customer_id, data)
-                
-                if customer:
-                    self.wfile.write(json.dumps({
-                        'success': True,
-                        'customer': customer
-                    }).encode('utf-8'))
-                else:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'مشتری یافت نشد'
-                    }).encode('utf-8'))
-                
-            except Exception as e:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': str(e)
-                }).encode('utf-8'))
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    def _post_admin_search(self, parsed, content_length):
+        # Search customers and licenses (admin only)
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن احراز هویت یافت نشد'
+            }).encode('utf-8'))
             return
         
-        if parsed.path == '/api/admin/licenses/revoke':
-            # Revoke a license (admin only)
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن نامعتبر یا منقضی شده'
+            }).encode('utf-8'))
+            return
+        
+        try:
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            query = data.get('query', '').strip()
+            search_type = data.get('type', 'all')  # 'customers', 'licenses', 'all'
+            try:
+                limit = int(data.get('limit') or 50)
+            except (TypeError, ValueError):
+                limit = 50
+            limit = max(1, min(limit, 500))
             
-            # Verify admin token
-            auth_header = self.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': 'توکن احراز هویت یافت نشد'
-                }).encode('utf-8'))
-                return
+            results = {'customers': [], 'licenses': []}
             
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
+            if DATABASE_ENABLED:
+                if search_type in ['customers', 'all']:
+                    results['customers'] = search_customers(query, limit)
+                if search_type in ['licenses', 'all']:
+                    results['licenses'] = search_licenses(query, limit)
             
-            if not is_valid:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': 'توکن نامعتبر یا منقضی شده'
-                }).encode('utf-8'))
-                return
+            self.wfile.write(json.dumps({
+                'success': True,
+                **results
+            }).encode('utf-8'))
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                license_id = data.get('license_id', '').strip()
-                
-                if not license_id:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'شناسه لایسنس الزامی است'
-                    }).encode('utf-8'))
-                    return
-                
-                if DATABASE_ENABLED:
-                    success = revoke_license(license_id)
-                else:
-                    success = False
-                
-                if success:
-                    self.wfile.write(json.dumps({
-                        'success': True,
-                        'message': 'لایسنس با موفقیت لغو شد'
-                    }).encode('utf-8'))
-                else:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'لایسنس یافت نشد'
-                    }).encode('utf-8'))
-                
-            except Exception as e:
-                self.wfile.write(json.dumps({
-                    'success': False,
-                    'message': str(e)
-                }).encode('utf-8'))
-            return
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    # ============ PAYMENT API (ZarinPal) ============
+    def _post_payment_request(self, parsed, content_length):
+        # Create payment request
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
         
-        if parsed.path == '/api/admin/search':
-            # Search customers and licenses (admin only)
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
+        try:
+            # Require logged-in user
             auth_header = self.headers.get('Authorization', '')
             if not auth_header.startswith('Bearer '):
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن احراز هویت یافت نشد'
+                    'error': 'برای خرید لازم است وارد حساب کاربری شوید.'
                 }).encode('utf-8'))
                 return
-            
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
-            
-            if not is_valid:
+            try:
+                from user_manager import verify_user_token
+                verified = verify_user_token(auth_header[7:])
+            except Exception:
+                verified = None
+            if not verified or not getattr(verified, 'is_valid', False):
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن نامعتبر یا منقضی شده'
+                    'error': 'توکن نامعتبر است. لطفاً دوباره وارد شوید.'
                 }).encode('utf-8'))
                 return
+
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
             
-            try:
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                query = data.get('query', '').strip()
-                search_type = data.get('type', 'all')  # 'customers', 'licenses', 'all'
-                
-                results = {'customers': [], 'licenses': []}
-                
-                if DATABASE_ENABLED:
-                    if search_type in ['customers', 'all']:
-                        results['customers'] = search_customers(query)
-                    if search_type in ['licenses', 'all']:
-                        results['licenses'] = search_licenses(query)
-                
-                self.wfile.write(json.dumps({
-                    'success': True,
-                    **results
-                }).encode('utf-8'))
-                
-            except Exception as e:
+            hardware_id = data.get('hardware_id', '').strip()
+            plan_id = data.get('plan_id', '').strip()
+            amount = int(data.get('amount', 0))
+            validity_hours = int(data.get('validity_hours', 0))
+            customer_name = data.get('customer_name', '')
+            customer_email = data.get('customer_email', '')
+            customer_phone = data.get('customer_phone', '')
+
+            user_id = getattr(verified, 'user_id', '')
+            if not user_id:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': str(e)
+                    'error': 'خطا در تشخیص کاربر. لطفاً دوباره وارد شوید.'
                 }).encode('utf-8'))
-            return
-        
-        # ============ PAYMENT API (ZarinPal) ============
-        if parsed.path == '/api/payment/request':
-            # Create payment request
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            try:
-                # Require logged-in user
-                auth_header = self.headers.get('Authorization', '')
-                if not auth_header.startswith('Bearer '):
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'برای خرید لازم است وارد حساب کاربری شوید.'
-                    }).encode('utf-8'))
-                    return
-                try:
-                    from user_manager import verify_user_token
-                    verified = verify_user_token(auth_header[7:])
-                except Exception:
-                    verified = None
-                if not verified or not getattr(verified, 'is_valid', False):
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'توکن نامعتبر است. لطفاً دوباره وارد شوید.'
-                    }).encode('utf-8'))
-                    return
-
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                
-                hardware_id = data.get('hardware_id', '').strip()
-                plan_id = data.get('plan_id', '').strip()
-                amount = int(data.get('amount', 0))
-                validity_hours = int(data.get('validity_hours', 0))
-                customer_name = data.get('customer_name', '')
-                customer_email = data.get('customer_email', '')
-                customer_phone = data.get('customer_phone', '')
-
-                user_id = getattr(verified, 'user_id', '')
-                if not user_id:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'خطا در تشخیص کاربر. لطفاً دوباره وارد شوید.'
-                    }).encode('utf-8'))
-                    return
-                
-                if not hardware_id or not plan_id or amount <= 0:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'اطلاعات ناقص است'
-                    }).encode('utf-8'))
-                    return
-                
-                # Try to import payment config
-                try:
-                    from payment_config import (
-                        ZARINPAL_MERCHANT_ID, ZARINPAL_SANDBOX, 
-                        ZARINPAL_CALLBACK_URL, ZARINPAL_DESCRIPTION,
-                        get_zarinpal_urls, FAKE_PAYMENT_MODE
-                    )
-                except ImportError:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'تنظیمات درگاه پرداخت یافت نشد'
-                    }).encode('utf-8'))
-                    return
-                
-                # ===== FAKE PAYMENT MODE (for testing) =====
-                if FAKE_PAYMENT_MODE:
-                    # Generate license directly without ZarinPal
-                    import uuid
-                    fake_authority = f"FAKE_{uuid.uuid4().hex[:16].upper()}"
-                    
-                    # Generate license
-                    license_data = generate_license_with_hours(
-                        hardware_id=hardware_id,
-                        validity_hours=validity_hours,
-                        customer_name=customer_name,
-                        price=amount,
-                        user_id=user_id
-                    )
-                    
-                    # Log the sale
-                    log_sale({
-                        'hardware_id': hardware_id,
-                        'plan_id': plan_id,
-                        'amount': amount,
-                        'validity_hours': validity_hours,
-                        'user_id': user_id,
-                        'customer_name': customer_name,
-                        'customer_email': customer_email,
-                        'customer_phone': customer_phone,
-                    }, license_data, f"FAKE_{fake_authority}")
-                    
-                    # Build response with v2 license bundle for download
-                    response_data = {
-                        'success': True,
-                        'fake_mode': True,
-                        'license_key': license_data['license_key'],
-                        'license_id': license_data.get('license_id'),
-                        'license_v2': license_data.get('license_v2', False),
-                        'license_bundle': license_data.get('license_bundle'),
-                        'validity_text': license_data.get('validity_text', ''),
-                        'expiry_date': license_data.get('expiry_date', '')
-                    }
-                    
-                    self.wfile.write(json.dumps(response_data).encode('utf-8'))
-                    return
-                
-                # ===== REAL ZARINPAL PAYMENT =====
-                urls = get_zarinpal_urls()
-                
-                # Store pending payment info
-                pending_payments = load_pending_payments()
-                
-                # Create ZarinPal request
-                import urllib.request as urllib_request
-                zp_data = json.dumps({
-                    "merchant_id": ZARINPAL_MERCHANT_ID,
-                    "amount": amount * 10,  # Convert to Rial
-                    "callback_url": ZARINPAL_CALLBACK_URL,
-                    "description": f"{ZARINPAL_DESCRIPTION} - {plan_id}",
-                    "metadata": {
-                        "mobile": customer_phone,
-                        "email": customer_email
-                    }
-                }).encode('utf-8')
-                
-                req = urllib_request.Request(
-                    urls['request'],
-                    data=zp_data,
-                    headers={'Content-Type': 'application/json'}
-                )
-                
-                try:
-                    with urllib_request.urlopen(req, timeout=30) as resp:
-                        zp_response = json.loads(resp.read().decode('utf-8'))
-                except Exception as e:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': f'خطا در ارتباط با زرین‌پال: {str(e)}'
-                    }).encode('utf-8'))
-                    return
-                
-                if zp_response.get('data', {}).get('code') == 100:
-                    authority = zp_response['data']['authority']
-                    
-                    # Save pending payment
-                    pending_payments[authority] = {
-                        'hardware_id': hardware_id,
-                        'plan_id': plan_id,
-                        'amount': amount,
-                        'validity_hours': validity_hours,
-                        'user_id': user_id,
-                        'customer_name': customer_name,
-                        'customer_email': customer_email,
-                        'customer_phone': customer_phone,
-                        'created_at': datetime.now().isoformat()
-                    }
-                    save_pending_payments(pending_payments)
-                    
-                    payment_url = urls['startpay'] + authority
-                    
-                    self.wfile.write(json.dumps({
-                        'success': True,
-                        'payment_url': payment_url,
-                        'authority': authority
-                    }).encode('utf-8'))
-                else:
-                    errors = zp_response.get('errors', {})
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': f"خطای زرین‌پال: {errors}"
-                    }).encode('utf-8'))
-                
-            except Exception as e:
+                return
+            
+            if not hardware_id or not plan_id or amount <= 0:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'error': str(e)
+                    'error': 'اطلاعات ناقص است'
                 }).encode('utf-8'))
-            return
-        
-        if parsed.path == '/api/payment/verify':
-            # Verify payment and generate license
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
+                return
             
+            # Try to import payment config
             try:
-                # Require logged-in user (bind verification to purchaser)
-                auth_header = self.headers.get('Authorization', '')
-                if not auth_header.startswith('Bearer '):
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'برای تأیید پرداخت لازم است وارد حساب کاربری شوید.'
-                    }).encode('utf-8'))
-                    return
-                try:
-                    from user_manager import verify_user_token
-                    verified = verify_user_token(auth_header[7:])
-                except Exception:
-                    verified = None
-                if not verified or not getattr(verified, 'is_valid', False):
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'توکن نامعتبر است. لطفاً دوباره وارد شوید.'
-                    }).encode('utf-8'))
-                    return
-
-                body = self.rfile.read(content_length)
-                data = json.loads(body.decode('utf-8'))
-                authority = data.get('authority', '').strip()
-                
-                if not authority:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'Authority نامعتبر'
-                    }).encode('utf-8'))
-                    return
-                
-                # Load pending payment
-                pending_payments = load_pending_payments()
-                payment_info = pending_payments.get(authority)
-                
-                if not payment_info:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'پرداخت یافت نشد یا قبلاً پردازش شده'
-                    }).encode('utf-8'))
-                    return
-
-                purchaser_user_id = str(payment_info.get('user_id', '')).strip()
-                if not purchaser_user_id:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'این پرداخت به هیچ حساب کاربری متصل نیست و قابل تأیید نیست. لطفاً با پشتیبانی تماس بگیرید.'
-                    }).encode('utf-8'))
-                    return
-                if getattr(verified, 'user_id', '') != purchaser_user_id:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'این پرداخت متعلق به حساب کاربری شما نیست.'
-                    }).encode('utf-8'))
-                    return
-                
-                # Try to import payment config
-                try:
-                    from payment_config import (
-                        ZARINPAL_MERCHANT_ID, get_zarinpal_urls
-                    )
-                except ImportError:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'تنظیمات درگاه پرداخت یافت نشد'
-                    }).encode('utf-8'))
-                    return
+                from payment_config import (
+                    ZARINPAL_MERCHANT_ID, ZARINPAL_SANDBOX, 
+                    ZARINPAL_CALLBACK_URL, ZARINPAL_DESCRIPTION,
+                    get_zarinpal_urls, FAKE_PAYMENT_MODE
+                )
+            except ImportError:
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'error': 'تنظیمات درگاه پرداخت یافت نشد'
+                }).encode('utf-8'))
+                return
+            
+            # ===== FAKE PAYMENT MODE (for testing) =====
+            if FAKE_PAYMENT_MODE:
+                # Generate license directly without ZarinPal
+                import uuid
+                fake_authority = f"FAKE_{uuid.uuid4().hex[:16].upper()}"
                 
-                urls = get_zarinpal_urls()
+                # Generate license
+                license_data = generate_license_with_hours(
+                    hardware_id=hardware_id,
+                    validity_hours=validity_hours,
+                    customer_name=customer_name,
+                    price=amount,
+                    user_id=user_id
+                )
                 
-                # Verify with ZarinPal
-                import urllib.request as urllib_request
-                zp_data = json.dumps({
-                    "merchant_id": ZARINPAL_MERCHANT_ID,
-                    "amount": payment_info['amount'] * 10,  # Rial
-                    "authority": authority
-                }).encode('utf-8')
+                # Log the sale
+                log_sale({
+                    'hardware_id': hardware_id,
+                    'plan_id': plan_id,
+                    'amount': amount,
+                    'validity_hours': validity_hours,
+                    'user_id': user_id,
+                    'customer_name': customer_name,
+                    'customer_email': customer_email,
+                    'customer_phone': customer_phone,
+                }, license_data, f"FAKE_{fake_authority}")
                 
-                req = urllib_request.Request(
-                    urls['verify'],
-                    data=zp_data,
-                    headers={'Content-Type': 'application/json'}
-                )
+                # Build response with v2 license bundle for download
+                response_data = {
+                    'success': True,
+                    'fake_mode': True,
+                    'license_key': license_data['license_key'],
+                    'license_id': license_data.get('license_id'),
+                    'license_v2': license_data.get('license_v2', False),
+                    'license_bundle': license_data.get('license_bundle'),
+                    'validity_text': license_data.get('validity_text', ''),
+                    'expiry_date': license_data.get('expiry_date', '')
+                }
                 
-                try:
-                    with urllib_request.urlopen(req, timeout=30) as resp:
-                        zp_response = json.loads(resp.read().decode('utf-8'))
-                except Exception as e:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': f'خطا در تأیید پرداخت: {str(e)}'
-                    }).encode('utf-8'))
-                    return
+                self.wfile.write(json.dumps(response_data).encode('utf-8'))
+                return
+            
+            # ===== REAL ZARINPAL PAYMENT =====
+            urls = get_zarinpal_urls()
+            
+            # Store pending payment info
+            pending_payments = load_pending_payments()
+            
+            # Create ZarinPal request
+            import urllib.request as urllib_request
+            zp_data = json.dumps({
+                "merchant_id": ZARINPAL_MERCHANT_ID,
+                "amount": amount * 10,  # Convert to Rial
+                "callback_url": ZARINPAL_CALLBACK_URL,
+                "description": f"{ZARINPAL_DESCRIPTION} - {plan_id}",
+                "metadata": {
+                    "mobile": customer_phone,
+                    "email": customer_email
+                }
+            }).encode('utf-8')
+            
+            req = urllib_request.Request(
+                urls['request'],
+                data=zp_data,
+                headers={'Content-Type': 'application/json'}
+            )
+            
+            try:
+                with urllib_request.urlopen(req, timeout=30) as resp:
+                    zp_response = json.loads(resp.read().decode('utf-8'))
+            except Exception as e:
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'error': f'خطا در ارتباط با زرین‌پال: {str(e)}'
+                }).encode('utf-8'))
+                return
+            
+            if zp_response.get('data', {}).get('code') == 100:
+                authority = zp_response['data']['authority']
                 
-                zp_code = zp_response.get('data', {}).get('code')
+                # Save pending payment
+                pending_payments[authority] = {
+                    'hardware_id': hardware_id,
+                    'plan_id': plan_id,
+                    'amount': amount,
+                    'validity_hours': validity_hours,
+                    'user_id': user_id,
+                    'customer_name': customer_name,
+                    'customer_email': customer_email,
+                    'customer_phone': customer_phone,
+                    'created_at': datetime.now().isoformat()
+                }
+                save_pending_payments(pending_payments)
                 
-                if zp_code in [100, 101]:  # 100=success, 101=already verified
-                    ref_id = zp_response['data'].get('ref_id', '')
-                    
-                    # Generate license
-                    license_data = generate_license_with_hours(
-                        hardware_id=payment_info['hardware_id'],
-                        validity_hours=payment_info['validity_hours'],
-                        customer_name=payment_info['customer_name'],
-                        price=payment_info['amount'],
-                        user_id=purchaser_user_id
-                    )
-                    
-                    # Remove from pending
-                    del pending_payments[authority]
-                    save_pending_payments(pending_payments)
-                    
-                    # Log the sale
-                    log_sale(payment_info, license_data, ref_id)
-                    
-                    # Build response with v2 license bundle for download
-                    response_data = {
-                        'success': True,
-                        'license_key': license_data['license_key'],
-                        'license_id': license_data.get('license_id'),
-                        'license_v2': license_data.get('license_v2', False),
-                        'license_bundle': license_data.get('license_bundle'),
-                        'ref_id': ref_id,
-                        'validity_text': license_data.get('validity_text', ''),
-                        'expiry_date': license_data.get('expiry_date', '')
-                    }
-                    
-                    self.wfile.write(json.dumps(response_data).encode('utf-8'))
-                else:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'error': 'پرداخت تأیید نشد'
-                    }).encode('utf-8'))
+                payment_url = urls['startpay'] + authority
                 
-            except Exception as e:
+                self.wfile.write(json.dumps({
+                    'success': True,
+                    'payment_url': payment_url,
+                    'authority': authority
+                }).encode('utf-8'))
+            else:
+                errors = zp_response.get('errors', {})
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'error': str(e)
+                    'error': f"خطای زرین‌پال: {errors}"
                 }).encode('utf-8'))
-            return
-        
-        # Fallback to GET handler for other POST requests
-        self.do_GET()
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode('utf-8'))
 
-    def do_DELETE(self):
-        parsed = urllib.parse.urlparse(self.path)
+    def _post_payment_verify(self, parsed, content_length):
+        # Verify payment and generate license
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
         
-        if parsed.path.startswith('/api/admin/customers/') and parsed.path.count('/') == 4:
-            # Delete customer (admin only)
-            customer_id = parsed.path.split('/')[-1]
-            
-            self.send_response(200)
-            self.send_header('Content-Type','application/json; charset=utf-8')
-            self.end_headers()
-            
-            # Verify admin token
+        try:
+            # Require logged-in user (bind verification to purchaser)
             auth_header = self.headers.get('Authorization', '')
             if not auth_header.startswith('Bearer '):
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن احراز هویت یافت نشد'
+                    'error': 'برای تأیید پرداخت لازم است وارد حساب کاربری شوید.'
+                }).encode('utf-8'))
+                return
+            try:
+                from user_manager import verify_user_token
+                verified = verify_user_token(auth_header[7:])
+            except Exception:
+                verified = None
+            if not verified or not getattr(verified, 'is_valid', False):
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'error': 'توکن نامعتبر است. لطفاً دوباره وارد شوید.'
+                }).encode('utf-8'))
+                return
+
+            body = self.rfile.read(content_length)
+            data = json.loads(body.decode('utf-8'))
+            authority = data.get('authority', '').strip()
+            
+            if not authority:
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'error': 'Authority نامعتبر'
                 }).encode('utf-8'))
                 return
             
-            token = auth_header[7:]
-            is_valid, _ = verify_admin_token(token)
+            # Load pending payment
+            pending_payments = load_pending_payments()
+            payment_info = pending_payments.get(authority)
             
-            if not is_valid:
+            if not payment_info:
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'error': 'پرداخت یافت نشد یا قبلاً پردازش شده'
+                }).encode('utf-8'))
+                return
+
+            purchaser_user_id = str(payment_info.get('user_id', '')).strip()
+            if not purchaser_user_id:
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'error': 'این پرداخت به هیچ حساب کاربری متصل نیست و قابل تأیید نیست. لطفاً با پشتیبانی تماس بگیرید.'
+                }).encode('utf-8'))
+                return
+            if getattr(verified, 'user_id', '') != purchaser_user_id:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'توکن نامعتبر یا منقضی شده'
+                    'error': 'این پرداخت متعلق به حساب کاربری شما نیست.'
                 }).encode('utf-8'))
                 return
             
-            if not DATABASE_ENABLED:
+            # Try to import payment config
+            try:
+                from payment_config import (
+                    ZARINPAL_MERCHANT_ID, get_zarinpal_urls
+                )
+            except ImportError:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': 'دیتابیس فعال نیست'
+                    'error': 'تنظیمات درگاه پرداخت یافت نشد'
                 }).encode('utf-8'))
                 return
             
+            urls = get_zarinpal_urls()
+            
+            # Verify with ZarinPal
+            import urllib.request as urllib_request
+            zp_data = json.dumps({
+                "merchant_id": ZARINPAL_MERCHANT_ID,
+                "amount": payment_info['amount'] * 10,  # Rial
+                "authority": authority
+            }).encode('utf-8')
+            
+            req = urllib_request.Request(
+                urls['verify'],
+                data=zp_data,
+                headers={'Content-Type': 'application/json'}
+            )
+            
             try:
-                success = delete_customer(customer_id)
+                with urllib_request.urlopen(req, timeout=30) as resp:
+                    zp_response = json.loads(resp.read().decode('utf-8'))
+            except Exception as e:
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'error': f'خطا در تأیید پرداخت: {str(e)}'
+                }).encode('utf-8'))
+                return
+            
+            zp_code = zp_response.get('data', {}).get('code')
+            
+            if zp_code in [100, 101]:  # 100=success, 101=already verified
+                ref_id = zp_response['data'].get('ref_id', '')
                 
-                if success:
-                    self.wfile.write(json.dumps({
-                        'success': True,
-                        'message': 'مشتری با موفقیت حذف شد'
-                    }).encode('utf-8'))
-                else:
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': 'مشتری یافت نشد'
-                    }).encode('utf-8'))
+                # Generate license
+                license_data = generate_license_with_hours(
+                    hardware_id=payment_info['hardware_id'],
+                    validity_hours=payment_info['validity_hours'],
+                    customer_name=payment_info['customer_name'],
+                    price=payment_info['amount'],
+                    user_id=purchaser_user_id
+                )
                 
-            except Exception as e:
+                # Remove from pending
+                del pending_payments[authority]
+                save_pending_payments(pending_payments)
+                
+                # Log the sale
+                log_sale(payment_info, license_data, ref_id)
+                
+                # Build response with v2 license bundle for download
+                response_data = {
+                    'success': True,
+                    'license_key': license_data['license_key'],
+                    'license_id': license_data.get('license_id'),
+                    'license_v2': license_data.get('license_v2', False),
+                    'license_bundle': license_data.get('license_bundle'),
+                    'ref_id': ref_id,
+                    'validity_text': license_data.get('validity_text', ''),
+                    'expiry_date': license_data.get('expiry_date', '')
+                }
+                
+                self.wfile.write(json.dumps(response_data).encode('utf-8'))
+            else:
                 self.wfile.write(json.dumps({
                     'success': False,
-                    'message': str(e)
+                    'error': 'پرداخت تأیید نشد'
                 }).encode('utf-8'))
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode('utf-8'))
+
+    def _delete_admin_customer(self, parsed):
+        if parsed.path.count('/') != 4:
+            return self._delete_not_found(parsed)
+        # Delete customer (admin only)
+        customer_id = parsed.path.split('/')[-1]
+        
+        self.send_response(200)
+        self.send_header('Content-Type','application/json; charset=utf-8')
+        self.end_headers()
+        
+        # Verify admin token
+        auth_header = self.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن احراز هویت یافت نشد'
+            }).encode('utf-8'))
+            return
+        
+        token = auth_header[7:]
+        is_valid, _ = verify_admin_token(token)
+        
+        if not is_valid:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'توکن نامعتبر یا منقضی شده'
+            }).encode('utf-8'))
+            return
+        
+        if not DATABASE_ENABLED:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': 'دیتابیس فعال نیست'
+            }).encode('utf-8'))
             return
         
-        # Default response for unknown DELETE requests
+        try:
+            success = delete_customer(customer_id)
+            
+            if success:
+                self.wfile.write(json.dumps({
+                    'success': True,
+                    'message': 'مشتری با موفقیت حذف شد'
+                }).encode('utf-8'))
+            else:
+                self.wfile.write(json.dumps({
+                    'success': False,
+                    'message': 'مشتری یافت نشد'
+                }).encode('utf-8'))
+            
+        except Exception as e:
+            self.wfile.write(json.dumps({
+                'success': False,
+                'message': str(e)
+            }).encode('utf-8'))
+
+    # Default response for unknown DELETE requests
+    def _delete_not_found(self, parsed):
         self.send_response(404)
         self.send_header('Content-Type','application/json; charset=utf-8')
         self.end_headers()
         self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
 
+
+GET_ROUTES = RouteTable(
+    exact={
+        '/admin_login.html': Handler._get_admin_page_disabled,
+        '/admin_dashboard.html': Handler._get_admin_page_disabled,
+        '/api/user/google/start': Handler._get_user_google_start,
+        '/api/user/google/callback': Handler._get_user_google_callback,
+        '/api/user/me': Handler._get_user_me,
+        '/api/user/purchases': Handler._get_user_purchases,
+        '/api/status': Handler._get_status,
+        '/api/logs': Handler._get_logs,
+        '/api/settings': Handler._get_settings,
+        '/api/browse_folder': Handler._get_browse_folder,
+        '/api/check_install_status': Handler._get_check_install_status,
+        '/api/install_result': Handler._get_install_result,
+        '/api/clear_install_result': Handler._get_clear_install_result,
+        '/api/odoo_info': Handler._get_odoo_info,
+        '/api/validate_folder': Handler._get_validate_folder,
+        '/api/license/status': Handler._get_license_status,
+        '/api/admin/verify': Handler._get_admin_verify,
+        '/api/admin/stats': Handler._get_admin_stats,
+        '/api/admin/licenses': Handler._get_admin_licenses,
+        '/api/admin/customers': Handler._get_admin_customers,
+        '/api/admin/dashboard': Handler._get_admin_dashboard,
+        '/api/plans': Handler._get_plans,
+        '/api/admin/plans': Handler._get_admin_plans,
+        '/api/check_compatibility': Handler._get_check_compatibility,
+        '/api/download_package': Handler._get_download_package,
+    },
+    prefixes={
+        '/api/install': Handler._get_command,
+        '/api/uninstall': Handler._get_command,
+        '/api/run': Handler._get_command,
+        '/api/start': Handler._get_command,
+        '/api/check': Handler._get_command,
+    },
+    # Offline admin is removed: nothing under /api/admin/ is served
+    priority={
+        '/api/admin/': Handler._get_admin_disabled,
+    },
+)
+
+POST_ROUTES = RouteTable(
+    exact={
+        '/api/user/register': Handler._post_user_register,
+        '/api/user/login': Handler._post_user_login,
+        '/api/shutdown': Handler._post_shutdown,
+        '/api/settings': Handler._post_settings,
+        '/api/install_odoo': Handler._post_install_odoo,
+        '/api/license/activate': Handler._post_license_activate,
+        '/api/license/deactivate': Handler._post_license_deactivate,
+        '/api/admin/login': Handler._post_admin_login,
+        '/api/admin/plans': Handler._post_admin_plans,
+        '/api/admin/generate_license': Handler._post_admin_generate_license,
+        '/api/admin/customers': Handler._post_admin_customers,
+        '/api/admin/licenses/revoke': Handler._post_admin_licenses_revoke,
+        '/api/admin/search': Handler._post_admin_search,
+        '/api/payment/request': Handler._post_payment_request,
+        '/api/payment/verify': Handler._post_payment_verify,
+    },
+    prefixes={
+        '/api/admin/customers/': Handler._post_admin_customer,
+    },
+    # Offline admin is removed: nothing under /api/admin/ is served
+    priority={
+        '/api/admin/': Handler._post_admin_disabled,
+    },
+)
+
+DELETE_ROUTES = RouteTable(
+    prefixes={
+        '/api/admin/customers/': Handler._delete_admin_customer,
+    },
+)
+
+
 def tail(file_path, lines=200):
     try:
         with open(file_path, 'rb') as f:
@@ -3545,7 +3804,27 @@ def port_listening(port):
         s.close()
 
 
-def get_status():
+def _run_and_get(cmd: list[str], timeout: int = 4) -> tuple[bool, str]:
+    try:
+        out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, timeout=timeout)
+        return True, out.decode(errors='replace').strip()
+    except Exception as e:
+        return False, str(e)
+
+
+def _map_concurrently(fn, items: list) -> list:
+    """fn over items, one thread each (results in input order)."""
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=len(items)) as pool:
+        return list(pool.map(fn, items))
+
+
+# ============ STATUS PROBES ============
+# Each probe gathers one part of get_status(); StatusCollector runs them in the
+# background on their own intervals so /api/status only reads cached results.
+
+def _probe_offline() -> dict:
     offline = {}
     offline['python_installer_exists'] = (OFFLINE / 'python').exists() and any((OFFLINE / 'python').glob('*.exe'))
     offline['postgres_installer_exists'] = (OFFLINE / 'postgresql').exists() and any((OFFLINE / 'postgresql').glob('*.exe'))
@@ -3556,7 +3835,10 @@ def get_status():
     wheels = OFFLINE / 'wheels'
     offline['wheels_count'] = len(list(wheels.iterdir())) if wheels.exists() else 0
     offline['requirements_exists'] = (OFFLINE / 'requirements.txt').exists()
+    return offline
 
+
+def _probe_soft_tools() -> list:
     # Check soft folder tools with compatibility info
     sys_info = get_system_info()
     soft_tools = []
@@ -3637,56 +3919,50 @@ def get_status():
                         'installed': is_installed,
                         'install_details': install_details,
                     })
+    return soft_tools
+
 
-    log_tail = tail(LOG) if LOG.exists() else []
+def _probe_log_tail() -> list:
+    return tail(LOG) if LOG.exists() else []
 
+
+def _probe_odoo_ports() -> dict:
     # Get Odoo config to determine the actual port
     odoo_config = parse_odoo_config()
     config_port = odoo_config.get('http_port', 8069)
     
     # Check standard ports plus the configured port
-    ports_to_check = {8019, 8069, config_port}
-    odoo_ports = {}
-    for port in ports_to_check:
-        odoo_ports[str(port)] = port_listening(port)
-
-    odoo_root = resolve_odoo_root()
+    ports_to_check = sorted({8019, 8069, config_port})
+    listening = _map_concurrently(port_listening, ports_to_check)
+    return {str(port): ok for port, ok in zip(ports_to_check, listening)}
 
-    def run_and_get(cmd: list[str], timeout: int = 4) -> tuple[bool, str]:
-        try:
-            out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, timeout=timeout)
-            return True, out.decode(errors='replace').strip()
-        except Exception as e:
-            return False, str(e)
 
+def _probe_python() -> tuple[bool, str]:
     # Python (prefer workspace venv)
-    python_ok = False
-    python_detail = ''
-    venv_python = None
+    odoo_root = resolve_odoo_root()
+    checks = []
     if odoo_root:
         venv_python = odoo_root / 'venv' / 'Scripts' / 'python.exe'
         if venv_python.exists():
-            ok, detail = run_and_get([str(venv_python), '--version'])
-            if ok and 'Python' in detail:
-                python_ok = True
-                python_detail = f"venv: {detail}"
-
-    if not python_ok:
-        candidates = [
-            shutil_which('python'),
-            shutil_which('python3'),
-            r'C:\Program Files\Python311\python.exe',
-            r'C:\Program Files\Python3.11\python.exe',
-            os.path.expandvars(r'%LOCALAPPDATA%\Programs\Python\Python311\python.exe'),
-        ]
-        candidates = [c for c in candidates if c and Path(c).exists()]
-        for c in candidates:
-            ok, detail = run_and_get([c, '--version'])
-            if ok and 'Python' in detail:
-                python_ok = True
-                python_detail = f"system: {detail}"
-                break
+            checks.append(('venv', str(venv_python)))
+
+    candidates = [
+        shutil_which('python'),
+        shutil_which('python3'),
+        r'C:\Program Files\Python311\python.exe',
+        r'C:\Program Files\Python3.11\python.exe',
+        os.path.expandvars(r'%LOCALAPPDATA%\Programs\Python\Python311\python.exe'),
+    ]
+    checks += [('system', c) for c in dict.fromkeys(candidates) if c and Path(c).exists()]
+    # Ask every interpreter at once; the first working one in preference order wins
+    results = _map_concurrently(lambda check: _run_and_get([check[1], '--version']), checks)
+    for (kind, _), (ok, detail) in zip(checks, results):
+        if ok and 'Python' in detail:
+            return True, f"{kind}: {detail}"
+    return False, ''
 
+
+def _probe_postgres() -> tuple[bool, str]:
     # PostgreSQL installed (folder presence)
     pg_ok = False
     pg_detail = ''
@@ -3703,7 +3979,10 @@ def get_status():
                 break
     except Exception:
         pg_ok = False
+    return pg_ok, pg_detail
+
 
+def _probe_pg_dump() -> tuple[bool, str]:
     # pg_dump works (backup dependency)
     pg_dump_ok = False
     pg_dump_detail = ''
@@ -3716,24 +3995,31 @@ def get_status():
                 exe = d / 'bin' / 'pg_dump.exe'
                 if exe.exists():
                     pg_dump_candidates.append(exe)
-        for exe in pg_dump_candidates:
+
+        def pg_dump_version(exe):
             # Set PATH to include PostgreSQL bin directory for DLL loading
             bin_dir = str(exe.parent)
             env = os.environ.copy()
             env['PATH'] = bin_dir + ';' + env.get('PATH', '')
             try:
                 result = subprocess.run([str(exe), '--version'], capture_output=True, timeout=5, env=env)
-                detail = result.stdout.decode(errors='replace').strip()
-                if 'pg_dump' in detail:
-                    pg_dump_ok = True
-                    pg_dump_detail = f"{exe.parent} :: {detail}"
-                    break
+                return result.stdout.decode(errors='replace').strip()
             except Exception:
-                continue
+                return ''
+
+        # Newest version first; all candidates are checked at once
+        for exe, detail in zip(pg_dump_candidates, _map_concurrently(pg_dump_version, pg_dump_candidates)):
+            if 'pg_dump' in detail:
+                pg_dump_ok = True
+                pg_dump_detail = f"{exe.parent} :: {detail}"
+                break
     except Exception as e:
         pg_dump_ok = False
         pg_dump_detail = str(e)
+    return pg_dump_ok, pg_dump_detail
+
 
+def _probe_wkhtmltopdf() -> tuple[bool, str]:
     # wkhtmltopdf installed
     wk_ok = False
     wk_detail = ''
@@ -3751,7 +4037,10 @@ def get_status():
                     wk_detail = str(hits[0])
     except Exception:
         wk_ok = False
+    return wk_ok, wk_detail
 
+
+def _probe_vc_redist() -> tuple[bool, str]:
     # VC++ 2015-2022 Redistributable (x64) installed
     vc_ok = False
     vc_detail = ''
@@ -3786,7 +4075,10 @@ def get_status():
     except Exception as e:
         vc_ok = False
         vc_detail = str(e)
+    return vc_ok, vc_detail
+
 
+def _probe_nodejs() -> tuple[bool, str]:
     # Node.js installed (for assets compilation)
     node_ok = False
     node_detail = ''
@@ -3814,7 +4106,10 @@ def get_status():
     except Exception as e:
         node_ok = False
         node_detail = str(e)
+    return node_ok, node_detail
 
+
+def _probe_git() -> tuple[bool, str]:
     # Git installed (for updates and cloning)
     git_ok = False
     git_detail = ''
@@ -3842,8 +4137,12 @@ def get_status():
     except Exception as e:
         git_ok = False
         git_detail = str(e)
+    return git_ok, git_detail
+
 
+def _probe_odoo() -> tuple[bool, str]:
     # Odoo workspace
+    odoo_root = resolve_odoo_root()
     odoo_ok = False
     odoo_detail = ''
     if odoo_root:
@@ -3851,8 +4150,139 @@ def get_status():
         if odoo_bin.exists():
             odoo_ok = True
             odoo_detail = str(odoo_root)
+    return odoo_ok, odoo_detail
+
+
+# name: (probe, refresh interval in seconds, value until the first run finishes)
+STATUS_PROBES = {
+    'system_info': (get_system_info, 300, {}),
+    'offline': (_probe_offline, 15, {}),
+    'soft_tools': (_probe_soft_tools, 60, []),
+    'log_tail': (_probe_log_tail, 2, []),
+    'odoo_ports': (_probe_odoo_ports, 3, {}),
+    'python': (_probe_python, 15, (False, '')),
+    'postgres': (_probe_postgres, 15, (False, '')),
+    'pg_dump': (_probe_pg_dump, 30, (False, '')),
+    'wkhtmltopdf': (_probe_wkhtmltopdf, 15, (False, '')),
+    'vc_redist': (_probe_vc_redist, 60, (False, '')),
+    'nodejs': (_probe_nodejs, 30, (False, '')),
+    'git': (_probe_git, 30, (False, '')),
+    'odoo': (_probe_odoo, 15, (False, '')),
+}
+# Probes behind the dependency list (re-checked while an install is being polled)
+DEPENDENCY_PROBES = ('offline', 'python', 'postgres', 'pg_dump', 'wkhtmltopdf', 'vc_redist', 'nodejs', 'git', 'odoo')
+# Probes run concurrently; a round (and the very first get_status()) waits at most
+# this long, and slower probes report when they finish
+STATUS_DEADLINE = 6
+
+
+class StatusCollector:
+    """Runs status probes in a background thread, each on its own interval, and caches the results."""
+
+    def __init__(self, probes: dict):
+        self._probes = probes
+        self._results = {}
+        self._due = {name: 0.0 for name in probes}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._pool = ThreadPoolExecutor(max_workers=len(probes), thread_name_prefix='status-probe')
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='status-collector', daemon=True)
+                self._thread.start()
+
+    def refresh(self, names=None, max_age: float = 0):
+        """Schedule probes (default: all) whose result is older than `max_age` seconds to run now."""
+        now = time.monotonic()
+        with self._lock:
+            for name in names or self._probes:
+                result = self._results.get(name)
+                if name not in self._running and (result is None or now - result['_at'] >= max_age):
+                    self._due[name] = 0.0
+        self._wake.set()
+
+    def results(self) -> dict:
+        """Latest result per probe; only the first call waits (for the initial round)."""
+        self.start()
+        self._ready.wait(STATUS_DEADLINE)
+        with self._lock:
+            return dict(self._results)
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            with self._lock:
+                due = [name for name, at in self._due.items() if at <= now]
+            self._collect(due)
+            self._ready.set()
+            with self._lock:
+                next_due = min(self._due.values())
+            self._wake.wait(min(60.0, max(0.05, next_due - time.monotonic())))
+
+    def _collect(self, names):
+        """Run the given probes concurrently, waiting at most STATUS_DEADLINE for them."""
+        with self._lock:
+            names = [name for name in names if name not in self._running]
+            self._running.update(names)
+            for name in names:
+                self._due[name] = float('inf')  # rescheduled when it finishes
+        futures = [self._pool.submit(self._run_probe, name) for name in names]
+        wait_futures(futures, timeout=STATUS_DEADLINE)
+
+    def _run_probe(self, name: str):
+        probe, interval, default = self._probes[name]
+        started = time.monotonic()
+        try:
+            value, error = probe(), None
+        except Exception as e:
+            previous = self._results.get(name)
+            value, error = (previous['value'] if previous else default), str(e)
+        finished = time.monotonic()
+        with self._lock:
+            self._results[name] = {
+                'value': value,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                'duration_ms': int((finished - started) * 1000),
+                'error': error,
+                '_at': finished,
+            }
+            self._due[name] = finished + interval
+            self._running.discard(name)
+        self._wake.set()
+
 
-    wheel_ok = offline['wheels_count'] > 0
+_status_collector = StatusCollector(STATUS_PROBES)
+
+
+def get_status():
+    """Latest status snapshot from the background collector (with per-probe timestamps)."""
+    results = _status_collector.results()
+
+    def value(name):
+        result = results.get(name)
+        return result['value'] if result else STATUS_PROBES[name][2]
+
+    offline = value('offline')
+    sys_info = value('system_info')
+    soft_tools = value('soft_tools')
+    log_tail = value('log_tail')
+    odoo_ports = value('odoo_ports')
+    python_ok, python_detail = value('python')
+    pg_ok, pg_detail = value('postgres')
+    pg_dump_ok, pg_dump_detail = value('pg_dump')
+    wk_ok, wk_detail = value('wkhtmltopdf')
+    vc_ok, vc_detail = value('vc_redist')
+    node_ok, node_detail = value('nodejs')
+    git_ok, git_detail = value('git')
+    odoo_ok, odoo_detail = value('odoo')
+
+    wheel_ok = offline.get('wheels_count', 0) > 0
 
     deps = [
         {
@@ -3860,7 +4290,7 @@ def get_status():
             'label': 'Python (venv/system)',
             'ok': python_ok,
             'details': python_detail,
-            'offline_ready': offline['python_installer_exists'],
+            'offline_ready': offline.get('python_installer_exists', False),
             'install_cmd': 'install_python_offline',
         },
         {
@@ -3868,7 +4298,7 @@ def get_status():
             'label': 'PostgreSQL',
             'ok': pg_ok,
             'details': pg_detail,
-            'offline_ready': offline['postgres_installer_exists'],
+            'offline_ready': offline.get('postgres_installer_exists', False),
             'install_cmd': 'install_postgresql_offline',
         },
         {
@@ -3884,7 +4314,7 @@ def get_status():
             'label': 'wkhtmltopdf',
             'ok': wk_ok,
             'details': wk_detail,
-            'offline_ready': offline['wkhtmltopdf_installer_exists'],
+            'offline_ready': offline.get('wkhtmltopdf_installer_exists', False),
             'install_cmd': 'install_wkhtmltopdf_offline',
         },
         {
@@ -3892,7 +4322,7 @@ def get_status():
             'label': 'VC++ 2015-2022 Redistributable (x64)',
             'ok': vc_ok,
             'details': vc_detail,
-            'offline_ready': offline['vc_redist_exists'],
+            'offline_ready': offline.get('vc_redist_exists', False),
             'install_cmd': 'install_vc_redist_offline',
         },
         {
@@ -3915,7 +4345,7 @@ def get_status():
             'id': 'wheelhouse',
             'label': 'Offline wheels (pip)',
             'ok': wheel_ok,
-            'details': f"{offline['wheels_count']} files" + ("; requirements.txt present" if offline['requirements_exists'] else ""),
+            'details': f"{offline.get('wheels_count', 0)} files" + ("; requirements.txt present" if offline.get('requirements_exists', False) else ""),
             'offline_ready': wheel_ok,
             'install_cmd': 'setup_wheels',
             'install_label': 'دانلود پکیج‌ها' if not wheel_ok else 'نصب شده',
@@ -3941,6 +4371,10 @@ def get_status():
         'wkhtmltopdf_ok': wk_ok,
         'soft_tools': soft_tools,
         'system_info': sys_info,
+        'probes': {
+            name: {key: result[key] for key in ('updated_at', 'duration_ms', 'error')}
+            for name, result in results.items()
+        },
     }
 
 
@@ -4953,9 +5387,6 @@ if __name__ == '__main__':
     os.chdir(str(web_dir))
     handler = Handler
 
-    class _ReusableThreadingTCPServer(socketserver.ThreadingTCPServer):
-        allow_reuse_address = True
-
     def _is_listening(port: int) -> bool:
         try:
             with socket.create_connection(("127.0.0.1", port), timeout=1):
@@ -4973,7 +5404,13 @@ if __name__ == '__main__':
                 pass
 
     def _run_server(port: int) -> None:
-        with _ReusableThreadingTCPServer(('127.0.0.1', port), handler) as httpd:
+        with PooledHTTPServer(('127.0.0.1', port), handler) as httpd:
+            if DATABASE_ENABLED:
+                # Keep license statuses in the local database expiring on time
+                try:
+                    start_expiry_scheduler()
+                except Exception as e:
+                    print(f"⚠️  License expiry scheduler not started: {e}")
             url = f"http://127.0.0.1:{port}"
             print(f"Serving UI on {url}")
             _open_browser(url)